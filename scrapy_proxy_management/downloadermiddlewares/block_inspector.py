@@ -2,8 +2,10 @@ import logging
 import pprint
 from typing import List
 from typing import Tuple
+from typing import Union
 
 from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest
 from scrapy.exceptions import NotConfigured
 from scrapy.http import Request
 from scrapy.http import Response
@@ -15,6 +17,7 @@ from scrapy.signals import spider_opened
 from scrapy.spiders import Spider
 from scrapy.statscollectors import StatsCollector
 from scrapy.utils.misc import load_object
+from twisted.internet.defer import Deferred
 from twisted.internet.defer import inlineCallbacks
 
 from ..settings import default_settings
@@ -52,6 +55,13 @@ class BlockInspectorMiddleware(object):
             self.settings.getlist('HTTPPROXY_PROXY_INVALIDATED_EXCEPTIONS')
         ))
 
+        self.immediate_retry: bool = self.settings.getbool(
+            'HTTPPROXY_DM_IMMEDIATE_RETRY'
+        )
+        self.immediate_retry_times: int = self.settings.getint(
+            'HTTPPROXY_DM_IMMEDIATE_RETRY_TIMES'
+        )
+
     def spider_opened(self):
         logger.info('%s is opened', self.__class__.__name__)
         logger.info(
@@ -115,6 +125,10 @@ class BlockInspectorMiddleware(object):
     def process_response(
             self, request: Request, response: Response, spider: Spider
     ):
+        if request.meta.get('_proxy_immediate_retried'):
+            # the response of the retry, already inspected for the retry
+            return response
+
         try:
             self.inspect_block(
                 request=request, response=response, spider=spider
@@ -124,7 +138,7 @@ class BlockInspectorMiddleware(object):
             results, results_deferred = yield self.send_signals(
                 request=request, response=response, exception=exc, spider=spider
             )
-            return self.recycle_request(request, spider)
+            return (yield self.retry_request(request, spider))
         else:
             return response
 
@@ -139,7 +153,42 @@ class BlockInspectorMiddleware(object):
                 request=request, exception=exception, spider=spider
             )
 
-            return self.recycle_request(request, spider)
+            return (yield self.retry_request(request, spider))
+
+    def retry_request(
+            self, request: Request, spider: Spider
+    ) -> Union[Request, Deferred]:
+        """Return the recycled request, to be scheduled again, or with
+        HTTPPROXY_DM_IMMEDIATE_RETRY download it at once through the
+        downloader, up to HTTPPROXY_DM_IMMEDIATE_RETRY_TIMES times, so it does
+        not wait behind the requests in the scheduler; drop it if it is
+        recycled HTTPPROXY_RECYCLE_TIMES times.
+
+        The response of the retry has been through all the downloader
+        middlewares, and it is returned as the response of the request, so it
+        goes through some of them again; the request is tagged with
+        '_proxy_immediate_retried' in its meta, for the middlewares to skip
+        it.
+
+        """
+        req: Request = self.recycle_request(request, spider)
+        if req is None:
+            raise IgnoreRequest('Gave up recycling {}'.format(request))
+        retries: int = req.meta.get('proxy_immediate_retries', 0)
+        if any((not self.immediate_retry,
+                retries >= self.immediate_retry_times,
+                self.crawler.engine is None)):
+            return req
+
+        # a copy of the meta, so the proxy assigned to the retry is not set on
+        # the request of the response returned
+        req = req.replace(
+            meta={**req.meta, 'proxy_immediate_retries': retries + 1}
+        )
+        request.meta['_proxy_immediate_retried'] = True
+        self.stats.inc_value('block_inspector/immediate_retry', spider=spider)
+        logger.debug('Retry %s immediately (%d)', req, retries + 1)
+        return self.crawler.engine.downloader.fetch(req, spider)
 
     @inlineCallbacks
     def send_signals(
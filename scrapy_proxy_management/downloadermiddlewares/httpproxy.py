@@ -1,6 +1,15 @@
 import logging
+from collections import deque
+from inspect import signature
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Set
+from typing import Tuple
 
+from scrapy.core.downloader import Slot
 from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest
 from scrapy.exceptions import NotConfigured
 from scrapy.http import Request
 from scrapy.http import Response
@@ -13,13 +22,20 @@ from scrapy.spiders import Spider
 from scrapy.statscollectors import StatsCollector
 from scrapy.utils.httpobj import urlparse_cached
 from scrapy.utils.misc import load_object
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.task import deferLater
+from twisted.python.failure import Failure
 
 from ..exceptions import ProxyExhaustedException
+from ..exceptions import ProxyThrottledException
 from ..settings import default_settings
 from ..signals import proxy_invalidated
 from ..storages.environment_storage import BaseStorage
 from ..strategies import BaseStrategy
 from ..utils import get_proxy
+from ..utils import get_proxy_hash
+from ..utils import get_proxy_key
 from ..utils import unfreeze_settings
 
 logger = logging.getLogger(__name__)
@@ -48,6 +64,40 @@ class HttpProxyMiddleware(object):
         self.strategy: BaseStrategy = cls_strategy.from_crawler(
             crawler=self.crawler, mw=self, storage=self.storage
         )
+        # the strategies written before the request is passed to
+        # retrieve_proxy only take (scheme, spider)
+        self.retrieve_with_request: bool = 'request' in signature(
+            self.strategy.retrieve_proxy
+        ).parameters
+
+        self.hedge_enabled: bool = self.settings.getbool(
+            'HTTPPROXY_HEDGE_ENABLED'
+        )
+        self.hedge_delay: float = self.settings.getfloat(
+            'HTTPPROXY_HEDGE_DELAY'
+        )
+        self.hedge_quantile: float = self.settings.getfloat(
+            'HTTPPROXY_HEDGE_QUANTILE'
+        )
+        self.hedge_min_samples: int = self.settings.getint(
+            'HTTPPROXY_HEDGE_MIN_SAMPLES'
+        )
+        self.hedge_window: int = self.settings.getint('HTTPPROXY_HEDGE_WINDOW')
+        self.hedge_budget: float = self.settings.getfloat(
+            'HTTPPROXY_HEDGE_BUDGET'
+        )
+        # (scheme, credential, proxy): the latest download latencies
+        self.proxies_latency: Dict[
+            Tuple[str, bytes, str], Deque[float]
+        ] = dict()
+        # the hedgeable requests and the hedges issued for them
+        self.hedge_requests: int = 0
+        self.hedges: int = 0
+        self.clock = reactor
+
+        # the schemes with proxies, even after they are exhausted, so their
+        # requests are never downloaded without a proxy
+        self.schemes: Set[str] = set()
 
     @classmethod
     def from_crawler(cls, crawler: Crawler):
@@ -66,6 +116,7 @@ class HttpProxyMiddleware(object):
 
     def open_spider(self, spider: Spider):
         self.strategy.open_spider(spider)
+        self.schemes.update(filter(lambda x: x != 'no', self.storage.proxies))
 
     def close_spider(self, spider: Spider):
         self.strategy.close_spider(spider)
@@ -83,7 +134,7 @@ class HttpProxyMiddleware(object):
             if credentials and not request.headers.get('Proxy-Authorization'):
                 request.headers['Proxy-Authorization'] = b'Basic ' + credentials
             return
-        elif not self.storage.proxies:
+        elif not self.storage.proxies and not self.schemes:
             return
 
         parsed = urlparse_cached(request)
@@ -97,35 +148,290 @@ class HttpProxyMiddleware(object):
             return
 
         if scheme in self.storage.proxies:
-            self._set_proxy(request, scheme, spider)
+            self.schemes.add(scheme)
+            if self._is_hedgeable(request):
+                return self._hedge(request, spider)
+            return self._set_proxy(request, scheme, spider)
+        elif scheme in self.schemes:
+            self._proxy_exhausted(request, scheme, spider)
         else:
             return
 
+    def process_response(
+            self, request: Request, response: Response, spider: Spider
+    ) -> Response:
+        if request.meta.get('_proxy_hedge_cancelled'):
+            # the loser of a hedge whose transfer was not aborted, discarded
+            # before the other middlewares, e.g. a redirect
+            raise IgnoreRequest('{} lost its hedge'.format(request))
+        # the response of an immediate retry is counted for the retry, not
+        # again for the blocked request
+        if all((request.meta.get('proxy'),
+                not request.meta.get('_proxy_immediate_retried'))):
+            self.strategy.process_response(request, response, spider)
+            if self.hedge_enabled and 'download_latency' in request.meta:
+                self._record_latency(request)
+        return response
+
+    def process_exception(
+            self, request: Request, exception: Exception, spider: Spider
+    ):
+        # the loser of a hedge says nothing about its proxy, and is not
+        # retried by the other middlewares
+        if request.meta.get('_proxy_hedge_cancelled'):
+            raise IgnoreRequest('{} lost its hedge'.format(request))
+        if request.meta.get('proxy'):
+            self.strategy.process_exception(request, exception, spider)
+
     def invalidate_proxy(
             self, request: Request = None, response: Response = None,
             exception: Exception = None, spider: Spider = None, **kwargs
     ):
-        self.strategy.invalidate_proxy(
-            request, response, exception, spider, **kwargs
-        )
         req = request if request else response.request
+        if any((not req.meta.get('proxy'),
+                req.meta.get('_proxy_hedge_cancelled'))):
+            return
+
         logger.debug(
             'Proxy %s is invalidated because of %s',
             req.meta['proxy'], str(exception)
         )
+        self.stats.inc_value('proxy/invalidated', spider=spider)
+        self._exclude_proxy(req.meta, get_proxy_key(req))
         self.strategy.invalidate_proxy(
             request, response, exception, spider, **kwargs
         )
 
     def _set_proxy(self, request: Request, scheme: str, spider: Spider):
         try:
-            credentials, proxy = self.strategy.retrieve_proxy(scheme, spider)
+            credentials, proxy = (
+                self.strategy.retrieve_proxy(scheme, spider, request)
+                if self.retrieve_with_request
+                else self.strategy.retrieve_proxy(scheme, spider)
+            )
         except ProxyExhaustedException as exc:
             logger.warning('%s proxy is exhausted', scheme)
-            self.strategy.proxy_exhausted(
-                request=request, scheme=scheme, spider=spider
+            self._proxy_exhausted(request, scheme, spider)
+        except ProxyThrottledException as exc:
+            # try again later, without blocking the other requests
+            logger.debug(
+                '%s proxy is throttled, retry %s in %s seconds',
+                scheme, request, exc.delay
+            )
+            self.stats.inc_value('proxy/throttled', spider=spider)
+            return deferLater(
+                reactor, exc.delay, self._set_proxy, request, scheme, spider
             )
         else:
             request.meta['proxy'] = proxy
             if credentials:
                 request.headers['Proxy-Authorization'] = b'Basic ' + credentials
+            self._set_download_slot(request, spider)
+            self.strategy.process_request(request, spider)
+            self.strategy.count_use(request, spider)
+
+    def _proxy_exhausted(self, request: Request, scheme: str, spider: Spider):
+        self.strategy.proxy_exhausted(
+            request=request, scheme=scheme, spider=spider
+        )
+        # in case the strategy does not ignore the request itself
+        raise IgnoreRequest(
+            'Proxy scheme {} is exhausted, ignore {}'.format(scheme, request)
+        )
+
+    def _exclude_proxy(self, meta: Dict, proxy: Tuple[str, bytes, str]):
+        """Add the hash of the proxy to the field 'proxy_excluded' of the
+        meta, so the proxy is skipped by the strategy for the request, keeping
+        the latest HTTPPROXY_PROXY_EXCLUDED_MAXSIZE ones."""
+        maxsize: int = self.settings.getint('HTTPPROXY_PROXY_EXCLUDED_MAXSIZE')
+        proxy_hash: int = get_proxy_hash(proxy)
+        excluded: Tuple[int, ...] = meta.get('proxy_excluded', ())
+        if maxsize <= 0 or proxy_hash in excluded:
+            return
+        meta['proxy_excluded'] = (*excluded, proxy_hash)[-maxsize:]
+
+    def _set_download_slot(self, request: Request, spider: Spider):
+        """Set the download slot of the request by its proxy, or its proxy and
+        domain, so the downloader paces the requests of each proxy, with the
+        concurrency and the delay in the meta of the proxy."""
+        mode: str = self.settings.get('HTTPPROXY_DOWNLOAD_SLOT')
+        if not mode:
+            return
+        # keep the download slot set by others, but not the one set for the
+        # previous proxy of a recycled request
+        if request.meta.get('download_slot') != request.meta.get(
+                '_proxy_download_slot'
+        ):
+            return
+
+        proxy: Tuple[str, bytes, str] = get_proxy_key(request)
+        key: str = 'proxy-{}'.format(self.storage.get_proxy_id(proxy))
+        if mode == 'proxy_domain':
+            key = '{}-{}'.format(key, urlparse_cached(request).hostname)
+        request.meta['download_slot'] = key
+        request.meta['_proxy_download_slot'] = key
+
+        engine = self.crawler.engine
+        if engine is None or key in engine.downloader.slots:
+            return
+        meta: Dict = self.storage.proxies_meta.get(proxy, {})
+        concurrency = meta.get(
+            self.settings.get('HTTPPROXY_PROXY_CONCURRENCY_FIELD')
+        )
+        delay = meta.get(self.settings.get('HTTPPROXY_PROXY_DELAY_FIELD'))
+        if concurrency is None and delay is None:
+            # created by the downloader with the default ones
+            return
+
+        downloader = engine.downloader
+        downloader.slots[key] = Slot(
+            int(concurrency) if concurrency is not None else (
+                downloader.ip_concurrency or downloader.domain_concurrency
+            ),
+            float(delay) if delay is not None else getattr(
+                spider, 'download_delay',
+                self.settings.getfloat('DOWNLOAD_DELAY')
+            ),
+            downloader.randomize_delay
+        )
+
+    def _is_hedgeable(self, request: Request) -> bool:
+        return all((
+            self.hedge_enabled,
+            request.method in ('GET', 'HEAD'),
+            not request.meta.get('dont_hedge'),
+            not request.meta.get('_proxy_hedge'),
+            self.crawler.engine is not None,
+        ))
+
+    def _record_latency(self, request: Request):
+        proxy: Tuple[str, bytes, str] = get_proxy_key(request)
+        latencies: Deque[float] = self.proxies_latency.get(proxy)
+        if latencies is None:
+            latencies = self.proxies_latency[proxy] = deque(
+                maxlen=self.hedge_window
+            )
+        latencies.append(request.meta['download_latency'])
+
+    def _get_hedge_delay(self, request: Request) -> float:
+        """Return the quantile HTTPPROXY_HEDGE_QUANTILE of the latest latencies
+        of the proxy of the request, or HTTPPROXY_HEDGE_DELAY until the proxy
+        has HTTPPROXY_HEDGE_MIN_SAMPLES of them."""
+        if not request.meta.get('proxy'):
+            return self.hedge_delay
+        latencies: Deque[float] = self.proxies_latency.get(
+            get_proxy_key(request), ()
+        )
+        if not self.hedge_quantile or len(latencies) < max(
+                self.hedge_min_samples, 1
+        ):
+            return self.hedge_delay
+        return sorted(latencies)[
+            int(self.hedge_quantile * (len(latencies) - 1))
+        ]
+
+    def _hedge(self, request: Request, spider: Spider) -> Deferred:
+        """Download a copy of the request through the engine, and another copy
+        through a different proxy if the first one is slower than the delay of
+        its proxy, within the budget HTTPPROXY_HEDGE_BUDGET of the hedgeable
+        requests; the first response wins and the other copy, the loser, is
+        tagged with '_proxy_hedge_cancelled' so its proxy is not charged.
+
+        The loser is aborted if its transfer has not started: it is dropped
+        from the queue of its download slot, and its hedge is given back to
+        the budget. A transfer already started can not be aborted, so the
+        loser keeps its place in the downloader until the transfer ends, and
+        is the extra download counted by the budget; its outcome is then
+        discarded by this middleware, before the other ones.
+
+        The request is kept out of the active requests of the downloader while
+        its copies are downloaded, so it does not take a place in
+        CONCURRENT_REQUESTS. The response returned for the request has been
+        through the downloader middlewares as the response of the copy, and
+        goes through them again as the response of the request.
+
+        """
+        self.hedge_requests += 1
+        result = Deferred()
+        downloads: Dict[str, Tuple[Deferred, Request]] = dict()
+        timers: List = list()
+
+        downloader = self.crawler.engine.downloader
+        active: Set[Request] = downloader.active
+        was_active: bool = request in active
+        active.discard(request)
+
+        def download(name: str) -> Request:
+            req: Request = request.replace(
+                meta={**request.meta, '_proxy_hedge': name}
+            )
+            if name == 'hedge' and primary.meta.get('proxy'):
+                # through another proxy than the primary one
+                self._exclude_proxy(req.meta, get_proxy_key(primary))
+            dfd: Deferred = self.crawler.engine.download(req, spider)
+            downloads[name] = (dfd, req)
+            dfd.addBoth(done, name, req)
+            return req
+
+        def done(response, name: str, req: Request):
+            if result.called:
+                # the loser, or its cancellation
+                return None
+            if isinstance(response, Failure) and any(map(
+                    lambda x: not x[0].called, downloads.values()
+            )):
+                # the other copy could still succeed
+                return None
+
+            for timer in filter(lambda x: x.active(), timers):
+                timer.cancel()
+            # the retries are spent by the copy, not again by the request
+            if 'retry_times' in req.meta:
+                request.meta['retry_times'] = req.meta['retry_times']
+            if was_active:
+                # removed by the downloader once the result is returned
+                active.add(request)
+
+            if isinstance(response, Failure):
+                result.errback(response)
+            else:
+                if name == 'hedge':
+                    self.stats.inc_value('proxy/hedge/won', spider=spider)
+                result.callback(response)
+            # after the result, so the cancellation is discarded as the loser
+            for dfd, req_ in filter(
+                    lambda x: not x[0].called, downloads.values()
+            ):
+                abort(dfd, req_)
+            return None
+
+        def abort(dfd: Deferred, req: Request):
+            req.meta['_proxy_hedge_cancelled'] = True
+            slot = downloader.slots.get(req.meta.get('download_slot'))
+            if slot is not None and req in slot.transferring:
+                self.stats.inc_value('proxy/hedge/unaborted', spider=spider)
+                return
+
+            if slot is not None:
+                for queued in list(filter(lambda x: x[0] is req, slot.queue)):
+                    slot.queue.remove(queued)
+            self.hedges -= 1
+            self.stats.inc_value('proxy/hedge/aborted', spider=spider)
+            dfd.cancel()
+
+        def hedge():
+            if result.called:
+                return
+            if self.hedges >= self.hedge_budget * self.hedge_requests:
+                self.stats.inc_value('proxy/hedge/over_budget', spider=spider)
+                return
+            self.hedges += 1
+            self.stats.inc_value('proxy/hedge/issued', spider=spider)
+            download('hedge')
+
+        primary: Request = download('primary')
+        if not result.called:
+            timers.append(self.clock.callLater(
+                self._get_hedge_delay(primary), hedge
+            ))
+        return result
@@ -14,3 +14,8 @@ class ProxyExhaustedException(Exception):
 
 class StorageNotSupportException(Exception):
     pass
+
+
+class ProxyThrottledException(Exception):
+    def __init__(self, delay):
+        self.delay = delay
@@ -3,6 +3,77 @@ HTTPPROXY_AUTH_ENCODING = 'latin-1'
 
 HTTPPROXY_PROXY_BYPASS_LRU_CACHE = 2 ** 10
 
+# the invalidated proxies are kept in a bounded container, the oldest one is
+# evicted when it is full, and each one is released after the ttl (in seconds,
+# None means never)
+HTTPPROXY_PROXIES_INVALIDATED_MAXSIZE = 2 ** 16
+HTTPPROXY_PROXIES_INVALIDATED_TTL = None
+# use a bloom filter instead, the memory is fixed by the maxsize and the error
+# rate, but the ttl applies to a whole generation of invalidated proxies
+HTTPPROXY_PROXIES_INVALIDATED_BLOOM_FILTER = False
+HTTPPROXY_PROXIES_INVALIDATED_BLOOM_FILTER_ERROR_RATE = 0.001
+
+# put the invalidated proxies in quarantine, and back into the rotation when the
+# delay is over, instead of until the next reload; the n-th strike of a proxy
+# delays it for BASE_DELAY * BACKOFF_FACTOR ** (n - 1) seconds, up to MAX_DELAY,
+# and the strikes are forgotten after STRIKE_TTL seconds without any; it is
+# rejected with the bloom filter, which could not discard a proxy
+HTTPPROXY_QUARANTINE_ENABLED = False
+HTTPPROXY_QUARANTINE_BASE_DELAY = 60
+HTTPPROXY_QUARANTINE_BACKOFF_FACTOR = 2
+HTTPPROXY_QUARANTINE_MAX_DELAY = 3600
+HTTPPROXY_QUARANTINE_STRIKE_TTL = 3600
+
+# ban the invalidated proxies only on the domain of the request, instead of
+# invalidating them on all the domains; each ban expires after the ttl (in
+# seconds, None means never), and the least recently banned domains are
+# evicted beyond the maxsize
+HTTPPROXY_BAN_PER_DOMAIN = False
+HTTPPROXY_BAN_TTL = 3600
+HTTPPROXY_BAN_DOMAIN_MAXSIZE = 2 ** 12
+# the number of the proxies tried for a request, before it waits for the bans
+# of its domain to expire, or HTTPPROXY_BAN_WAIT_DELAY seconds if they never do
+HTTPPROXY_BAN_MAX_TRIES = 8
+HTTPPROXY_BAN_WAIT_DELAY = 60
+
+# the CRC32 hashes of the proxies invalidated for a request are kept in
+# meta['proxy_excluded'], up to the latest maxsize ones, and skipped by the
+# strategies for the request and its recycled copies, before any side effect
+# of the selection if the strategy skips_proxies, or else within
+# HTTPPROXY_BAN_MAX_TRIES; an excluded proxy is reused if no other one is found
+HTTPPROXY_PROXY_EXCLUDED_MAXSIZE = 16
+
+# retire a proxy after it is used HTTPPROXY_MAX_USES times, or on a domain after
+# it is used so many times on the domain; 0 to never retire the proxies
+HTTPPROXY_MAX_USES = 0
+HTTPPROXY_MAX_USES_PER_DOMAIN = False
+# reload the proxies in a thread to replace the retired ones, if the storage
+# could supply more, e.g. MongoDB
+HTTPPROXY_MAX_USES_REFILL = True
+
+# set the download slot of a request by its 'proxy', or by its proxy and domain
+# ('proxy_domain'), so the concurrency and the delay of the downloader and
+# AutoThrottle apply to each proxy; None to keep the slots by domain
+HTTPPROXY_DOWNLOAD_SLOT = None
+# the concurrency and the delay of the slot of a proxy are the fields in its
+# meta, see HTTPPROXY_PROXIES_META, or the default ones of the downloader
+HTTPPROXY_PROXY_CONCURRENCY_FIELD = 'concurrency'
+HTTPPROXY_PROXY_DELAY_FIELD = 'download_delay'
+
+# hedge the idempotent requests (GET and HEAD, without meta['dont_hedge']): a
+# request is downloaded again through another proxy if no response arrives
+# within the quantile of the latest latencies of its proxy, or the delay (in
+# seconds) until the proxy has the min samples of the window; the first
+# response wins, the other download is dropped if still queued or else ignored
+# when it ends, and the hedges are capped by the budget, a ratio of the
+# hedgeable requests
+HTTPPROXY_HEDGE_ENABLED = False
+HTTPPROXY_HEDGE_DELAY = 5.0
+HTTPPROXY_HEDGE_QUANTILE = 0.95
+HTTPPROXY_HEDGE_MIN_SAMPLES = 20
+HTTPPROXY_HEDGE_WINDOW = 100
+HTTPPROXY_HEDGE_BUDGET = 0.05
+
 HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.default_strategy.DefaultStrategy'
 
 # ------------------------------------------------------------------------------
@@ -26,6 +97,11 @@ HTTPPROXY_PROXIES = {
     # 'no': '*'
 }
 
+# the meta of each proxy, keyed by the url in HTTPPROXY_PROXIES or in the
+# environment variables, e.g. {'https://proxy.com:3128': {'weight': 10}}; in
+# MongoDB the meta of a proxy is its document
+HTTPPROXY_PROXIES_META = {}
+
 # ------------------------------------------------------------------------------
 # MongoDB Proxy Storage
 # ------------------------------------------------------------------------------
@@ -48,12 +124,30 @@ HTTPPROXY_MONGODB_AUTHSOURCE = 'proxies'
 HTTPPROXY_MONGODB_NOT_MONGOCLIENT_PARAMETERS = {
     'collection',
     'database',
+    'exclude_chunk_size',
+    'exclude_invalidated',
     'get_proxy_from_doc',
+    'indexes',
     'not_mongoclient_parameters',
     'proxy_management_strategy',
     'proxy_retriever',
+    'query_plan_check',
+    'shared',
 }
 
+# the retriever could be "aggregate" as well, with the same keys turned into
+# the stages $match, $sort, $skip, $limit, $sample and $project, e.g. to sample
+# 500 proxies out of the 10000 best scored healthy ones:
+# HTTPPROXY_MONGODB_PROXY_RETRIEVER = {
+#     'name': 'aggregate',
+#     'filter': {'healthy': True},
+#     'sort': [('score', -1)],
+#     'limit': 10000,
+#     'sample': 500,
+#     'projection': {
+#         '_id': 1, 'scheme': 1, 'proxy': 1, 'username': 1, 'password': 1
+#     },
+# }
 HTTPPROXY_MONGODB_PROXY_RETRIEVER = {
     'name': 'find',
     'filter': None,
@@ -65,8 +159,229 @@ HTTPPROXY_MONGODB_PROXY_RETRIEVER = {
     'sort': None
 }
 
+# exclude the invalidated proxies by _id in the query of the retriever "find"
+# or "aggregate", with the $nin split into chunks
+HTTPPROXY_MONGODB_EXCLUDE_INVALIDATED = True
+HTTPPROXY_MONGODB_EXCLUDE_CHUNK_SIZE = 2 ** 10
+
+# share the MongoClient and the loaded proxies between the crawlers in one
+# process with the same MongoDB settings, e.g. in one CrawlerProcess
+HTTPPROXY_MONGODB_SHARED = False
+
+# the indexes ensured when the spider is opened, each one is a list of
+# (key, direction), or a dict with the list in 'keys' and the other options of
+# create_index, e.g. [[('healthy', 1), ('score', -1)]]
+HTTPPROXY_MONGODB_INDEXES = []
+
+# explain the query of the retriever when the spider is opened, and 'warn' or
+# 'error' (close the spider) if it is a collection scan; None to skip
+HTTPPROXY_MONGODB_QUERY_PLAN_CHECK = None
+
 HTTPPROXY_MONGODB_GET_PROXY_FROM_DOC = 'scrapy_proxy_management.storages.mongodb_storage.get_proxy_from_doc'
 
+# ------------------------------------------------------------------------------
+# Weighted Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.weighted_strategy.WeightedStrategy'
+
+# the weight is the field in the meta of the proxy, see HTTPPROXY_PROXIES_META
+HTTPPROXY_PROXY_WEIGHT_FIELD = 'weight'
+HTTPPROXY_PROXY_WEIGHT_DEFAULT = 1
+
+# ------------------------------------------------------------------------------
+# Latency Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.latency_strategy.LatencyStrategy'
+
+HTTPPROXY_LATENCY_EWMA_ALPHA = 0.3
+# the number of proxies sampled as candidates for each request
+HTTPPROXY_LATENCY_CANDIDATES = 3
+# the probability to provide any proxy instead of the best candidate
+HTTPPROXY_LATENCY_EXPLORATION = 0.05
+# the proxies with a higher error rate are only provided by exploration
+HTTPPROXY_LATENCY_MAX_ERROR_RATE = 0.5
+
+# ------------------------------------------------------------------------------
+# Bandit Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.bandit_strategy.BanditStrategy'
+
+# 'thompson' (Thompson sampling) or 'ucb1'
+HTTPPROXY_BANDIT_ALGORITHM = 'thompson'
+# the number of proxies sampled as candidates for each request
+HTTPPROXY_BANDIT_CANDIDATES = 8
+# the counts of a proxy are halved once they reach the window; 0 to keep all
+HTTPPROXY_BANDIT_WINDOW = 100
+
+# ------------------------------------------------------------------------------
+# Sticky Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.sticky_strategy.StickyStrategy'
+
+# the key of the session in the meta of the request, or the hostname is used
+HTTPPROXY_STICKY_SESSION_KEY = 'proxy_session'
+# the number of the virtual nodes of each proxy on the consistent-hash ring
+HTTPPROXY_STICKY_REPLICAS = 100
+
+# ------------------------------------------------------------------------------
+# Least Loaded Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.least_loaded_strategy.LeastLoadedStrategy'
+
+# the cap of the requests in flight is the field in the meta of the proxy, see
+# HTTPPROXY_PROXIES_META
+HTTPPROXY_PROXY_MAX_INFLIGHT_FIELD = 'max_inflight'
+HTTPPROXY_PROXY_MAX_INFLIGHT_DEFAULT = 4
+# when all the proxies are saturated, 'overcommit' the least loaded one, 'wait'
+# for HTTPPROXY_LEAST_LOADED_WAIT_DELAY seconds, or 'ignore' the request
+HTTPPROXY_LEAST_LOADED_SATURATED = 'overcommit'
+HTTPPROXY_LEAST_LOADED_WAIT_DELAY = 1.0
+
+# ------------------------------------------------------------------------------
+# Rate Limit Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.rate_limit_strategy.RateLimitStrategy'
+
+# the requests per second and the burst of each proxy, overridden by the fields
+# in the meta of the proxy, see HTTPPROXY_PROXIES_META
+HTTPPROXY_RATE_LIMIT_RATE = 1.0
+HTTPPROXY_RATE_LIMIT_BURST = 1
+HTTPPROXY_PROXY_RATE_FIELD = 'rate'
+HTTPPROXY_PROXY_BURST_FIELD = 'burst'
+# the requests per second and the burst of each proxy on each domain; None to
+# not limit the domains
+HTTPPROXY_RATE_LIMIT_DOMAIN_RATE = None
+HTTPPROXY_RATE_LIMIT_DOMAIN_BURST = 1
+HTTPPROXY_PROXY_DOMAIN_RATE_FIELD = 'domain_rate'
+HTTPPROXY_PROXY_DOMAIN_BURST_FIELD = 'domain_burst'
+# the number of the ready proxies tried for the domain of each request
+HTTPPROXY_RATE_LIMIT_CANDIDATES = 8
+# the maximum number of the buckets of (proxy, domain) kept
+HTTPPROXY_RATE_LIMIT_DOMAIN_MAXSIZE = 65536
+
+# ------------------------------------------------------------------------------
+# Circuit Breaker Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.circuit_breaker_strategy.CircuitBreakerStrategy'
+
+# the number of the latest outcomes in the sliding window of each proxy
+HTTPPROXY_CIRCUIT_BREAKER_WINDOW = 20
+# the minimum number of the outcomes in the window to open the breaker
+HTTPPROXY_CIRCUIT_BREAKER_MIN_REQUESTS = 5
+# the ratio of the failures in the window to open the breaker
+HTTPPROXY_CIRCUIT_BREAKER_FAILURE_RATIO = 0.5
+# the seconds before an open breaker is half-opened
+HTTPPROXY_CIRCUIT_BREAKER_COOLDOWN = 60
+# the number of the trial requests to close a half-open breaker
+HTTPPROXY_CIRCUIT_BREAKER_HALF_OPEN_TRIALS = 3
+# the seconds to wait for the outcomes of the trials, when no proxy is closed
+HTTPPROXY_CIRCUIT_BREAKER_WAIT_DELAY = 1.0
+# the seconds to wait for the outcomes of the trials in flight, before the
+# breaker is opened again, if a trial is dropped without any outcome
+HTTPPROXY_CIRCUIT_BREAKER_TRIAL_TIMEOUT = 180
+
+# ------------------------------------------------------------------------------
+# Tag Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.tag_strategy.TagStrategy'
+
+# the tags of a proxy are the fields in its meta, see HTTPPROXY_PROXIES_META; in
+# MongoDB they are added to the inclusion projection of
+# HTTPPROXY_MONGODB_PROXY_RETRIEVER
+HTTPPROXY_PROXY_TAG_FIELDS = ['country', 'provider', 'type']
+# the key of the tags asked in the meta of the request, e.g.
+# {'country': 'de', 'type': ['residential', 'mobile']}
+HTTPPROXY_TAG_META_KEY = 'proxy_tags'
+# 'ignore' the request, or use 'any' proxy, when no proxy has its tags
+HTTPPROXY_TAG_UNMATCHED = 'ignore'
+
+# ------------------------------------------------------------------------------
+# Provider Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.provider_strategy.ProviderStrategy'
+
+# the provider of a proxy is the field in its meta, see HTTPPROXY_PROXIES_META
+HTTPPROXY_PROXY_PROVIDER_FIELD = 'provider'
+# the shares of the requests of the providers, e.g. {'a': 3, 'b': 1, 'c': 0.5}
+HTTPPROXY_PROVIDER_SHARES = {}
+# the share of the providers not in HTTPPROXY_PROVIDER_SHARES
+HTTPPROXY_PROVIDER_SHARE_DEFAULT = 1
+
+# ------------------------------------------------------------------------------
+# Tier Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.tier_strategy.TierStrategy'
+
+# the tiers from the cheapest to the most expensive; the tier of a proxy is the
+# field in its meta, see HTTPPROXY_PROXIES_META, or the cheapest one
+HTTPPROXY_TIERS = ['datacenter', 'residential']
+HTTPPROXY_PROXY_TIER_FIELD = 'type'
+# the key of the tier of the request in its meta, as the index or the name of
+# the tier, which is escalated when its proxy is invalidated
+HTTPPROXY_TIER_META_KEY = 'proxy_tier'
+# remember the tier escalated on each domain, for the maxsize domains recently
+# escalated or requested
+HTTPPROXY_TIER_DOMAIN_MEMORY = False
+HTTPPROXY_TIER_DOMAIN_MAXSIZE = 2 ** 12
+
+# ------------------------------------------------------------------------------
+# Vector Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.vector_strategy.VectorStrategy'
+
+# it requires numpy
+# the smoothing factor of the EWMA of the latency and the success rate
+HTTPPROXY_VECTOR_EWMA_ALPHA = 0.3
+# recompute the weights of all the proxies after so many outcomes, or seconds
+HTTPPROXY_VECTOR_RESCORE_EVENTS = 1000
+HTTPPROXY_VECTOR_RESCORE_INTERVAL = 1.0
+# the number of the proxies sampled at once
+HTTPPROXY_VECTOR_BATCH = 64
+# the seconds a proxy cools down after an exception; 0 to never cool down
+HTTPPROXY_VECTOR_COOLDOWN = 30
+# the weight of a proxy used less than so many seconds ago is scaled down by the
+# time since its last use; 0 to not scale it
+HTTPPROXY_VECTOR_REUSE_INTERVAL = 0
+
+# ------------------------------------------------------------------------------
+# Pipeline Strategy
+# ------------------------------------------------------------------------------
+
+# HTTPPROXY_STRATEGY = 'scrapy_proxy_management.strategies.pipeline_strategy.PipelineStrategy'
+
+# the filters in order, the scorer and the selector of the candidates, e.g.
+# HTTPPROXY_PIPELINE_FILTERS = [
+#     'scrapy_proxy_management.strategies.pipeline_strategy.TagFilter',
+#     'scrapy_proxy_management.strategies.pipeline_strategy.CooldownFilter',
+#     'scrapy_proxy_management.strategies.pipeline_strategy.RateLimitFilter',
+# ]
+# HTTPPROXY_PIPELINE_SCORER = 'scrapy_proxy_management.strategies.pipeline_strategy.WeightScorer'
+HTTPPROXY_PIPELINE_FILTERS = []
+HTTPPROXY_PIPELINE_SCORER = None
+HTTPPROXY_PIPELINE_SELECTOR = 'scrapy_proxy_management.strategies.pipeline_strategy.weighted_selector'
+# the number of the proxies sampled as candidates for each request; the whole
+# pool is scanned when none of them passes the filters, at most once every
+# HTTPPROXY_PIPELINE_FULL_SCAN_INTERVAL seconds for each scheme
+HTTPPROXY_PIPELINE_CANDIDATES = 16
+HTTPPROXY_PIPELINE_FULL_SCAN_INTERVAL = 1.0
+# 'wait' for HTTPPROXY_PIPELINE_WAIT_DELAY seconds, or 'ignore' the request,
+# when no proxy of the pool passes the filters
+HTTPPROXY_PIPELINE_UNMATCHED = 'wait'
+HTTPPROXY_PIPELINE_WAIT_DELAY = 1.0
+# the seconds a proxy is rejected by CooldownFilter after an exception
+HTTPPROXY_PIPELINE_COOLDOWN = 30
+
 # ------------------------------------------------------------------------------
 # BLOCK INSPECTOR IN DOWNLOADER & SPIDER MIDDLEWARES
 # ------------------------------------------------------------------------------
@@ -86,6 +401,19 @@ HTTPPROXY_PROXY_SM_BLOCK_INSPECTED_SIGNALS_DEFERRED = set()
 
 HTTPPROXY_DM_RECYCLE_REQUEST = 'scrapy_proxy_management.utils.recycle_request'
 HTTPPROXY_SM_RECYCLE_REQUEST = 'scrapy_proxy_management.utils.recycle_request'
+# drop a request after it is recycled so many times, counted in
+# meta['proxy_recycle_times']; 0 to recycle it forever
+HTTPPROXY_RECYCLE_TIMES = 10
+
+# download a request blocked in the downloader middleware again at once, through
+# the downloader with another proxy, instead of scheduling it again behind the
+# other requests; after HTTPPROXY_DM_IMMEDIATE_RETRY_TIMES retries, the
+# recycled request is scheduled again. The response of the retry is returned
+# for the blocked request, so the downloader middlewares after the block
+# inspector process it twice, e.g. the downloader stats count it twice; the
+# middlewares of this package skip it by '_proxy_immediate_retried' in the meta
+HTTPPROXY_DM_IMMEDIATE_RETRY = False
+HTTPPROXY_DM_IMMEDIATE_RETRY_TIMES = 2
 
 HTTPPROXY_PROXY_INVALIDATED_STATUS_CODES = set()
 HTTPPROXY_PROXY_INVALIDATED_EXCEPTIONS = {
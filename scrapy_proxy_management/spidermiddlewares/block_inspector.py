@@ -135,9 +135,11 @@ class BlockInspectorMiddleware(object):
                 response=response, exception=exception, spider=spider
             )
 
-            return [
-                self.recycle_request(request=response.request, spider=spider)
-            ]
+            request = self.recycle_request(
+                request=response.request, spider=spider
+            )
+            # dropped if it is recycled too many times
+            return [request] if request is not None else []
 
     @inlineCallbacks
     def send_signals(
@@ -1,11 +1,11 @@
 import logging
 from abc import ABCMeta
 from abc import abstractmethod
+from typing import Any
 from typing import Dict
 from typing import Iterator
 from typing import List
 from typing import Sequence
-from typing import Set
 from typing import Tuple
 from typing import Union
 
@@ -15,10 +15,17 @@ from scrapy.signalmanager import SignalManager
 from scrapy.spiders import Spider
 from scrapy.statscollectors import StatsCollector
 
+from ..utils import get_optional_float
+from ..utils.expiring_set import ExpiringBloomFilter
+from ..utils.expiring_set import ExpiringSet
+
 logger = logging.getLogger(__name__)
 
 
 class BaseStorage(metaclass=ABCMeta):
+    # whether a reload could supply more proxies than the ones invalidated
+    refillable = False
+
     def __init__(self, crawler: Crawler, mw, auth_encoding: str):
         self.auth_encoding: str = auth_encoding
         self.crawler: Crawler = crawler
@@ -31,7 +38,12 @@ class BaseStorage(metaclass=ABCMeta):
         self.proxies_iter: Dict[
             str, Union[str, Iterator[Tuple[bytes, str]]]
         ] = dict()
-        self.proxies_invalidated: Set[Tuple[str, bytes, str]] = set()
+        self.proxies_invalidated: Union[
+            ExpiringSet, ExpiringBloomFilter
+        ] = self._get_proxies_invalidated()
+        self.proxies_meta: Dict[Tuple[str, bytes, str], Dict] = dict()
+        # the registry of the integer ids of the proxies, never reused
+        self.proxies_id: Dict[Tuple[str, bytes, str], int] = dict()
 
     @classmethod
     def from_crawler(cls, crawler: Crawler, mw, auth_encoding: str):
@@ -53,10 +65,64 @@ class BaseStorage(metaclass=ABCMeta):
     def close_spider(self, spider: Spider):
         logger.info('Proxy storage %s is closed', self.__class__.__name__)
 
+    def _get_proxies_invalidated(
+            self
+    ) -> Union[ExpiringSet, ExpiringBloomFilter]:
+        maxsize: int = self.settings.getint(
+            'HTTPPROXY_PROXIES_INVALIDATED_MAXSIZE'
+        )
+        ttl: float = get_optional_float(
+            self.settings, 'HTTPPROXY_PROXIES_INVALIDATED_TTL'
+        )
+
+        if self.settings.getbool('HTTPPROXY_PROXIES_INVALIDATED_BLOOM_FILTER'):
+            return ExpiringBloomFilter(
+                capacity=maxsize,
+                error_rate=self.settings.getfloat(
+                    'HTTPPROXY_PROXIES_INVALIDATED_BLOOM_FILTER_ERROR_RATE'
+                ),
+                ttl=ttl
+            )
+        return ExpiringSet(maxsize=maxsize, ttl=ttl)
+
+    def invalidate_proxy(self, proxy: Tuple[str, bytes, str]):
+        """Record the proxy as invalidated, so it is filtered out of the
+        reloaded proxies."""
+        self.proxies_invalidated.add(proxy)
+
+    def validate_proxy(self, proxy: Tuple[str, bytes, str]):
+        """Record the invalidated proxy as valid again, e.g. when it is
+        released from the quarantine."""
+        self.proxies_invalidated.discard(proxy)
+
+    def get_proxy_meta(self, url: str, proxy: Tuple[bytes, str]) -> Dict:
+        """Return the meta of the proxy in the settings HTTPPROXY_PROXIES_META,
+        keyed by the url as it is configured, or without the credential."""
+        proxies_meta: Dict[str, Dict] = self.settings.getdict(
+            'HTTPPROXY_PROXIES_META'
+        )
+        return proxies_meta.get(url, proxies_meta.get(proxy[1], {}))
+
+    def get_proxy_id(self, proxy: Tuple[str, bytes, str]) -> int:
+        """Return the integer id of the proxy (scheme, credential, proxy),
+        registered when it is seen at first."""
+        return self.proxies_id.setdefault(proxy, len(self.proxies_id))
+
     @abstractmethod
     def load_proxies(self) -> Dict[str, Tuple[bytes, str]]:
         pass
 
+    def query_proxies(self) -> Any:
+        """Query the proxies without changing the storage, so it could run in
+        a thread; the result is applied by apply_proxies in the reactor
+        thread."""
+        return self.load_proxies()
+
+    def apply_proxies(self, result: Any) -> Dict[str, Tuple[bytes, str]]:
+        """Apply the result of query_proxies to the storage, and return the
+        loaded proxies."""
+        return result
+
     @property
     @abstractmethod
     def proxies(self) -> Dict[str, Union[str, List[Tuple[bytes, str]]]]:
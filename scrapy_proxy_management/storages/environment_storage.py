@@ -1,6 +1,5 @@
 import logging
 import re
-from itertools import cycle
 from typing import Dict
 from typing import List
 from typing import Tuple
@@ -11,6 +10,7 @@ from scrapy.crawler import Crawler
 
 from . import BaseStorage
 from ..utils import get_proxy
+from ..utils.rotation_ring import RotationRing
 
 logger = logging.getLogger(__name__)
 
@@ -21,12 +21,17 @@ class EnvironmentStorage(BaseStorage):
 
     def load_proxies(self) -> Dict[str, Union[str, List[Tuple[bytes, str]]]]:
         proxies = {}
+        self.proxies_meta = dict()
 
         for scheme, proxy in getproxies().items():
             if scheme != 'no':
-                proxies.update({
-                    scheme: get_proxy(self.auth_encoding, proxy, scheme)
-                })
+                proxy_: Tuple[bytes, str] = get_proxy(
+                    self.auth_encoding, proxy, scheme
+                )
+                proxies.update({scheme: proxy_})
+                self.proxies_meta[(scheme, *proxy_)] = self.get_proxy_meta(
+                    proxy, proxy_
+                )
             elif scheme == 'no':
                 if proxy == '*':
                     proxies.update({scheme: proxy})
@@ -53,4 +58,7 @@ class EnvironmentStorage(BaseStorage):
         self.proxies_iter = dict()
         for key, value in proxies.items():
             if key != 'no':
-                self.proxies_iter.update({key: cycle([value])})
+                # one proxy for each scheme, or a list of them after reload
+                self.proxies_iter.update({key: RotationRing(
+                    value if isinstance(value, list) else [value]
+                )})
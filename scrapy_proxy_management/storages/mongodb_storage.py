@@ -1,19 +1,25 @@
+import json
 import logging
 import re
+import time
+from collections import OrderedDict
 from collections import defaultdict
 from functools import partial
 from itertools import starmap
 from operator import methodcaller
+from typing import Any
 from typing import Callable
 from typing import DefaultDict
 from typing import Dict
+from typing import Generator
 from typing import Iterable
 from typing import List
-from typing import Set
+from typing import Optional
 from typing import Tuple
 from typing import Union
 from urllib.parse import urlunparse
 
+from bson import SON
 from pymongo import MongoClient
 from pymongo.collection import Collection as CollectionSync
 from pymongo.database import Database as DatabaseSync
@@ -23,7 +29,9 @@ from scrapy.spiders import Spider
 from scrapy.utils.misc import load_object
 
 from . import BaseStorage
+from ..utils.expiring_set import ExpiringSet
 from ..utils import basic_auth_header
+from ..utils import get_optional_float
 from ..utils import unfreeze_settings
 
 logger = logging.getLogger(__name__)
@@ -58,7 +66,37 @@ def get_proxy_from_doc_2(
     return credentials, proxy_url
 
 
+def get_stages_from_explain(explain: Any) -> Generator[str, None, None]:
+    if isinstance(explain, dict):
+        if 'stage' in explain:
+            yield explain['stage']
+        for key, value in explain.items():
+            if key != 'rejectedPlans':
+                yield from get_stages_from_explain(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from get_stages_from_explain(value)
+
+
+class SharedConnection(object):
+    """A MongoClient and the last proxies loaded through it, shared by the
+    storages with the same settings in one process."""
+
+    def __init__(self, conn: MongoClient):
+        self.conn: MongoClient = conn
+        self.refcount: int = 0
+
+        self.generation: int = 0
+        self.proxies: Dict[str, Union[str, List[Tuple[bytes, str]]]] = None
+        self.proxies_meta: Dict[Tuple[str, bytes, str], Dict] = None
+
+
+shared_connections: Dict[str, SharedConnection] = dict()
+
+
 class MongoDBSyncStorage(BaseStorage):
+    refillable = True
+
     def __init__(self, crawler: Crawler, auth_encoding: str, mw):
         super().__init__(crawler, auth_encoding, mw)
 
@@ -73,21 +111,53 @@ class MongoDBSyncStorage(BaseStorage):
         self.db: DatabaseSync = None
         self.coll: CollectionSync = None
 
-        self._proxy_retriever: methodcaller = methodcaller(
-            self.mongodb_settings['proxy_retriever'].pop('name'),
-            **self.mongodb_settings['proxy_retriever']
+        self._proxy_retriever_args: Dict = dict(
+            self.mongodb_settings['proxy_retriever']
+        )
+        self._proxy_retriever_name: str = self._proxy_retriever_args.pop(
+            'name'
+        )
+        self._proxy_retriever_args['projection'] = self._project_tag_fields(
+            self._proxy_retriever_args.get('projection')
         )
         self._get_proxy_from_doc: Callable = partial(
             load_object(self.mongodb_settings['get_proxy_from_doc']),
             auth_encoding=self.auth_encoding
         )
 
-        self.proxies_invalidated: Set[Tuple[str, bytes, str]] = set()
+        # (scheme, credential, proxy): its _id, kept for the invalidated
+        # proxies, as the meta of a proxy is dropped by the reload excluding it
+        self.proxies_invalidated_id: OrderedDict = OrderedDict()
+        # the _id of the invalidated proxies, excluded in the query on reload
+        self.proxies_invalidated_ids: ExpiringSet = ExpiringSet(
+            maxsize=self.settings.getint(
+                'HTTPPROXY_PROXIES_INVALIDATED_MAXSIZE'
+            ),
+            ttl=get_optional_float(
+                self.settings, 'HTTPPROXY_PROXIES_INVALIDATED_TTL'
+            )
+        )
+
+        self._shared: SharedConnection = None
+        self._shared_key: str = None
+        self._generation: int = 0
 
     def open_spider(self, spider: Spider):
-        self.conn = MongoClient(**{
-            **self._prepare_conn_args(), 'appname': spider.name
-        })
+        if self.mongodb_settings.get('shared'):
+            self._shared_key = self._get_shared_key()
+            if self._shared_key not in shared_connections:
+                shared_connections[self._shared_key] = SharedConnection(
+                    MongoClient(**{
+                        **self._prepare_conn_args(), 'appname': spider.name
+                    })
+                )
+            self._shared = shared_connections[self._shared_key]
+            self._shared.refcount += 1
+            self.conn = self._shared.conn
+        else:
+            self.conn = MongoClient(**{
+                **self._prepare_conn_args(), 'appname': spider.name
+            })
 
         self.uri = urlunparse((
             'mongodb', ':'.join(map(lambda x: str(x), self.conn.address)),
@@ -109,6 +179,11 @@ class MongoDBSyncStorage(BaseStorage):
                 self.mongodb_settings['authsource'],
             )
 
+        if self.mongodb_settings.get('indexes'):
+            self._create_indexes()
+        if self.mongodb_settings.get('query_plan_check'):
+            self._check_query_plan(spider)
+
         self.proxies = self.load_proxies()
 
         for scheme, proxies in self.proxies.items():
@@ -122,12 +197,80 @@ class MongoDBSyncStorage(BaseStorage):
             )
 
     def close_spider(self, spider: Spider):
-        self.conn.close()
+        if self._shared is not None:
+            self._shared.refcount -= 1
+            if self._shared.refcount <= 0:
+                shared_connections.pop(self._shared_key, None)
+                self.conn.close()
+            self._shared = None
+        else:
+            self.conn.close()
         logger.info('%s (%s) is closed', self.__class__.__name__, self.uri)
 
+    def invalidate_proxy(self, proxy: Tuple[str, bytes, str]):
+        super().invalidate_proxy(proxy)
+        _id = self.proxies_meta.get(proxy, {}).get('_id')
+        if _id is None:
+            return
+
+        self.proxies_invalidated_ids.add(_id)
+        self.proxies_invalidated_id[proxy] = _id
+        self.proxies_invalidated_id.move_to_end(proxy)
+        maxsize: int = self.proxies_invalidated_ids.maxsize
+        if maxsize:
+            while len(self.proxies_invalidated_id) > maxsize:
+                self.proxies_invalidated_id.popitem(last=False)
+
+    def validate_proxy(self, proxy: Tuple[str, bytes, str]):
+        super().validate_proxy(proxy)
+        # it is retrieved again from the next reload
+        _id = self.proxies_invalidated_id.pop(proxy, None)
+        if _id is not None:
+            self.proxies_invalidated_ids.discard(_id)
+
     def load_proxies(self) -> Dict[str, Union[str, List[Tuple[bytes, str]]]]:
+        return self.apply_proxies(self.query_proxies())
+
+    def query_proxies(self) -> Optional[Tuple[Dict, Dict, float]]:
+        # only query the database when no other storage sharing the connection
+        # has loaded a newer snapshot since the last load of this storage
+        shared: SharedConnection = self._shared
+        if shared is not None and shared.generation != self._generation:
+            return None
+        return self._query_proxies()
+
+    def apply_proxies(
+            self, result: Optional[Tuple[Dict, Dict, float]]
+    ) -> Dict[str, Union[str, List[Tuple[bytes, str]]]]:
+        if result is not None:
+            self.mw.stats.set_value('proxy/mongodb/load_time', result[2])
+
+        if self._shared is None:
+            self.proxies_meta = result[1]
+            return result[0]
+
+        # the snapshot of the query is dropped if a newer one is loaded by
+        # another storage in the meantime
+        if result is not None and self._shared.generation == self._generation:
+            self._shared.proxies, self._shared.proxies_meta = result[:2]
+            self._shared.generation += 1
+        self.proxies_meta = self._shared.proxies_meta
+        self._generation = self._shared.generation
+
+        # the lists are copied, so the changes of one storage do not leak
+        # into the others sharing the snapshot
+        return dict(map(
+            lambda x: (x[0], list(x[1]) if isinstance(x[1], list) else x[1]),
+            self._shared.proxies.items()
+        ))
+
+    def _query_proxies(self) -> Tuple[Dict, Dict, float]:
+        """Return the proxies, their meta and the load time, without touching
+        the storage, as it could run in a thread."""
         proxies: DefaultDict = defaultdict(list)
+        proxies_meta: Dict[Tuple[str, bytes, str], Dict] = dict()
 
+        start_time: float = time.monotonic()
         docs: Iterable[Dict] = self._proxy_retriever(self.coll)
 
         for doc in docs:
@@ -135,6 +278,7 @@ class MongoDBSyncStorage(BaseStorage):
             if scheme != 'no':
                 proxy: Tuple[bytes, str] = self._get_proxy_from_doc(doc, '')
                 proxies[scheme].append(proxy)
+                proxies_meta[(scheme, *proxy)] = doc
             elif scheme == 'no':
                 if doc['proxy'] == '*':
                     proxy: str = doc['proxy']
@@ -150,7 +294,7 @@ class MongoDBSyncStorage(BaseStorage):
         if 'no' in proxies and '*' in proxies['no']:
             proxies.update({'no': '*'})
 
-        return dict(proxies)
+        return dict(proxies), proxies_meta, time.monotonic() - start_time
 
     @property
     def proxies(self) -> Dict[str, Union[str, List[Tuple[bytes, str]]]]:
@@ -165,6 +309,164 @@ class MongoDBSyncStorage(BaseStorage):
             if key != 'no':
                 self.proxies_iter.update({key: iter(value)})
 
+    def _proxy_retriever(self, coll: CollectionSync) -> Iterable[Dict]:
+        return methodcaller(
+            self._proxy_retriever_name, **self._get_proxy_retriever_args()
+        )(coll)
+
+    def _get_proxy_retriever_args(self) -> Dict:
+        kwargs: Dict = dict(self._proxy_retriever_args)
+        if self._proxy_retriever_name == 'find':
+            kwargs['filter'] = self._exclude_invalidated(kwargs.get('filter'))
+        elif self._proxy_retriever_name == 'aggregate':
+            kwargs['pipeline'] = self._build_pipeline(kwargs)
+
+        return kwargs
+
+    def _project_tag_fields(
+            self, projection: Union[Dict, List[str]] = None
+    ) -> Union[Dict, List[str]]:
+        """Add the fields HTTPPROXY_PROXY_TAG_FIELDS to an inclusion
+        projection, as the tags are read from the meta of the proxies."""
+        fields: List[str] = self.settings.getlist('HTTPPROXY_PROXY_TAG_FIELDS')
+        if isinstance(projection, (list, tuple)):
+            return [*projection, *filter(
+                lambda x: x not in projection, fields
+            )]
+        if not projection or not any(map(
+                lambda x: x[0] != '_id' and x[1], projection.items()
+        )):
+            # no projection, or an exclusion one
+            return projection
+        return {**dict.fromkeys(fields, 1), **projection}
+
+    def _create_indexes(self):
+        for index in self.mongodb_settings['indexes']:
+            if isinstance(index, dict):
+                index = dict(index)
+                keys = index.pop('keys')
+            else:
+                keys, index = index, dict()
+            keys = [(key, direction) for key, direction in keys]
+
+            name: str = self.coll.create_index(keys, **index)
+            logger.info(
+                '%s (%s) ensures the index %s',
+                self.__class__.__name__, self.uri, name
+            )
+
+    def _check_query_plan(self, spider: Spider):
+        kwargs: Dict = self._get_proxy_retriever_args()
+        if self._proxy_retriever_name == 'find':
+            explain: Dict = self.coll.find(**kwargs).explain()
+        elif self._proxy_retriever_name == 'aggregate':
+            explain: Dict = self.db.command(
+                'aggregate', self.coll.name, pipeline=kwargs['pipeline'],
+                explain=True
+            )
+        else:
+            logger.warning(
+                'The query plan of the proxy retriever %s can not be checked',
+                self._proxy_retriever_name
+            )
+            return
+
+        stages: List[str] = list(get_stages_from_explain(explain))
+        self.mw.stats.set_value('proxy/mongodb/query_plan', ','.join(stages))
+        logger.info(
+            '%s (%s) queries proxies with the plan: %s',
+            self.__class__.__name__, self.uri, ' > '.join(stages)
+        )
+
+        if 'COLLSCAN' not in stages:
+            return
+        if self.mongodb_settings['query_plan_check'] == 'error':
+            logger.critical(
+                '%s (%s) queries proxies with a collection scan, stop the '
+                'spider now', self.__class__.__name__, self.uri
+            )
+            # an exception raised in the handlers of spider_opened would be
+            # only logged
+            self.crawler.engine.close_spider(
+                spider, reason='proxy_query_collection_scan'
+            )
+            return
+        logger.warning(
+            '%s (%s) queries proxies with a collection scan, the settings '
+            'HTTPPROXY_MONGODB_PROXY_RETRIEVER may not be indexed',
+            self.__class__.__name__, self.uri
+        )
+
+    def _build_pipeline(self, kwargs: Dict) -> List[Dict]:
+        """Build the pipeline of the retriever "aggregate" from the keys in
+        the style of "find", and pop them from the kwargs.
+
+        The stages are: $match (filter), $sort (sort), $skip (skip), $limit
+        (limit), $sample (sample), $project (projection), and the stages in
+        the pipeline are appended at the end.
+
+        """
+        pipeline: List[Dict] = list()
+
+        match: Dict = self._exclude_invalidated(kwargs.pop('filter', None))
+        if match:
+            pipeline.append({'$match': match})
+
+        sort = kwargs.pop('sort', None)
+        if sort:
+            pipeline.append({'$sort': SON(
+                sort.items() if isinstance(sort, dict) else sort
+            )})
+
+        for key, stage in (('skip', '$skip'), ('limit', '$limit')):
+            value: int = kwargs.pop(key, 0)
+            if value:
+                pipeline.append({stage: value})
+
+        sample: int = kwargs.pop('sample', 0)
+        if sample:
+            pipeline.append({'$sample': {'size': sample}})
+
+        projection: Dict = kwargs.pop('projection', None)
+        if projection:
+            pipeline.append({'$project': projection})
+
+        pipeline.extend(kwargs.pop('pipeline', None) or [])
+
+        return pipeline
+
+    def _exclude_invalidated(self, filter_: Dict = None) -> Dict:
+        # the invalidated proxies differ in each storage sharing the snapshot
+        if any((not self.mongodb_settings.get('exclude_invalidated'),
+                self._shared is not None)):
+            return filter_
+
+        ids: List = list(self.proxies_invalidated_ids)
+        if not ids:
+            return filter_
+
+        # split the $nin into chunks to keep each array in the query small
+        chunk_size: int = self.mongodb_settings['exclude_chunk_size']
+        conditions: List[Dict] = [
+            {'_id': {'$nin': ids[i:i + chunk_size]}}
+            for i in range(0, len(ids), chunk_size)
+        ]
+        if filter_:
+            conditions.insert(0, filter_)
+
+        return conditions[0] if len(conditions) == 1 else {'$and': conditions}
+
+    def _get_shared_key(self) -> str:
+        settings: Dict = {
+            **self._prepare_conn_args(),
+            'auth_encoding': self.auth_encoding,
+            **{key: self.mongodb_settings[key] for key in (
+                'collection', 'database', 'get_proxy_from_doc',
+                'proxy_retriever'
+            )}
+        }
+        return json.dumps(settings, sort_keys=True, default=repr)
+
     def _prepare_conn_args(self) -> Dict:
         return dict(filter(
             lambda x: x[0] not in self.not_mongoclient_parameters,
@@ -1,6 +1,5 @@
 import logging
 import re
-from itertools import cycle
 from typing import Dict
 from typing import List
 from typing import Tuple
@@ -10,6 +9,7 @@ from scrapy.crawler import Crawler
 
 from . import BaseStorage
 from ..utils import get_proxy
+from ..utils.rotation_ring import RotationRing
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +20,7 @@ class SettingsStorage(BaseStorage):
 
     def load_proxies(self) -> Dict[str, Union[str, List[Tuple[bytes, str]]]]:
         proxies = {}
+        self.proxies_meta = dict()
 
         for scheme, proxies_ in self.settings['HTTPPROXY_PROXIES'].items():
             if scheme != 'no':
@@ -29,6 +30,10 @@ class SettingsStorage(BaseStorage):
                         proxies_
                     ))
                 })
+                for url, proxy in zip(proxies_, proxies[scheme]):
+                    self.proxies_meta[(scheme, *proxy)] = self.get_proxy_meta(
+                        url, proxy
+                    )
             elif scheme == 'no':
                 if isinstance(proxies_, list) and '*' in proxies_:
                     proxies.update({scheme: '*'})
@@ -57,4 +62,4 @@ class SettingsStorage(BaseStorage):
         self.proxies_iter = dict()
         for key, value in proxies.items():
             if key != 'no':
-                self.proxies_iter.update({key: cycle(value)})
+                self.proxies_iter.update({key: RotationRing(value)})
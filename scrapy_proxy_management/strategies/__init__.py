@@ -1,30 +1,49 @@
 import logging
 from abc import ABCMeta
 from abc import abstractmethod
+from collections import defaultdict
 from functools import lru_cache
+from functools import partial
+from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Tuple
 from typing import Union
 from urllib.parse import splitport
 
 from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest
 from scrapy.http import Request
 from scrapy.http import Response
 from scrapy.settings import Settings
 from scrapy.signalmanager import SignalManager
 from scrapy.spiders import Spider
 from scrapy.statscollectors import StatsCollector
+from scrapy.utils.httpobj import urlparse_cached
 from scrapy.utils.misc import load_object
+from twisted.internet.defer import Deferred
+from twisted.internet.threads import deferToThread
 
+from ..exceptions import ProxyExhaustedException
+from ..exceptions import ProxyThrottledException
 from ..exceptions import StorageNotSupportException
 from ..storages import BaseStorage
+from ..utils import get_optional_float
+from ..utils import get_proxy_hash
+from ..utils import get_proxy_key
+from ..utils.ban_matrix import BanMatrix
+from ..utils.quarantine import Quarantine
 
 logger = logging.getLogger(__name__)
 
 
 class BaseStrategy(metaclass=ABCMeta):
     supported_storage = ()
+    # whether the retrieval of the proxies takes the predicate of the proxies
+    # skipped for the request, see skip_banned
+    skips_proxies = False
 
     def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
         self.crawler: Crawler = crawler
@@ -35,6 +54,58 @@ class BaseStrategy(metaclass=ABCMeta):
 
         self.storage: BaseStorage = storage
 
+        self.quarantine: Quarantine = (
+            Quarantine(
+                base_delay=self.settings.getfloat(
+                    'HTTPPROXY_QUARANTINE_BASE_DELAY'
+                ),
+                factor=self.settings.getfloat(
+                    'HTTPPROXY_QUARANTINE_BACKOFF_FACTOR'
+                ),
+                max_delay=get_optional_float(
+                    self.settings, 'HTTPPROXY_QUARANTINE_MAX_DELAY'
+                ),
+                strike_ttl=get_optional_float(
+                    self.settings, 'HTTPPROXY_QUARANTINE_STRIKE_TTL'
+                ),
+            )
+            if self.settings.getbool('HTTPPROXY_QUARANTINE_ENABLED') else None
+        )
+        # a proxy released from the quarantine could not be discarded from
+        # the bloom filter
+        if all((self.quarantine is not None, self.settings.getbool(
+                'HTTPPROXY_PROXIES_INVALIDATED_BLOOM_FILTER'
+        ))):
+            raise ValueError(
+                'HTTPPROXY_QUARANTINE_ENABLED does not work with '
+                'HTTPPROXY_PROXIES_INVALIDATED_BLOOM_FILTER'
+            )
+        self.ban_wait_delay: float = self.settings.getfloat(
+            'HTTPPROXY_BAN_WAIT_DELAY'
+        )
+        self.bans: BanMatrix = (
+            BanMatrix(
+                maxsize=self.settings.getint('HTTPPROXY_BAN_DOMAIN_MAXSIZE'),
+                ttl=get_optional_float(self.settings, 'HTTPPROXY_BAN_TTL'),
+            )
+            if self.settings.getbool('HTTPPROXY_BAN_PER_DOMAIN') else None
+        )
+
+        self.max_uses: int = self.settings.getint('HTTPPROXY_MAX_USES')
+        self.max_uses_per_domain: bool = self.settings.getbool(
+            'HTTPPROXY_MAX_USES_PER_DOMAIN'
+        )
+        # proxy, or (proxy, domain): the number of the uses
+        self.proxies_uses: Dict[Any, int] = dict()
+        # the proxies retired on each domain, which never expire
+        self.retired: BanMatrix = (
+            BanMatrix(
+                maxsize=self.settings.getint('HTTPPROXY_BAN_DOMAIN_MAXSIZE')
+            )
+            if self.max_uses and self.max_uses_per_domain else None
+        )
+        self.refilling: Deferred = None
+
     @classmethod
     def from_crawler(cls, crawler: Crawler, mw, storage: BaseStorage):
         supported_storage = tuple(map(
@@ -70,8 +141,260 @@ class BaseStrategy(metaclass=ABCMeta):
     ):
         raise NotImplementedError
 
+    def process_request(self, request: Request, spider: Spider):
+        """Called with the request just assigned a proxy."""
+
+    def process_response(
+            self, request: Request, response: Response, spider: Spider
+    ):
+        """Called with the response downloaded through a proxy."""
+
+    def process_exception(
+            self, request: Request, exception: Exception, spider: Spider
+    ):
+        """Called with the exception raised downloading through a proxy."""
+
     def proxy_exhausted(self, request: Request, scheme: str, spider: Spider):
-        raise NotImplementedError
+        logger.warning(
+            'Proxy scheme %s is exhausted, ignore current request and stop the '
+            'spider now',
+            scheme
+        )
+        self.crawler.engine.close_spider(
+            spider, reason='Proxy scheme {} is exhausted'.format(scheme)
+        )
+        raise IgnoreRequest
+
+    def quarantine_proxy(
+            self, proxy: Tuple[str, bytes, str], spider: Spider
+    ):
+        """Put the invalidated proxy in quarantine, if it is enabled."""
+        if self.quarantine is None:
+            return
+
+        delay: float = self.quarantine.add(proxy)
+        logger.debug('Proxy %s is quarantined for %s seconds', proxy[2], delay)
+        self.stats.inc_value('proxy/quarantine/added', spider=spider)
+
+    def release_quarantine(self, spider: Spider):
+        """Put back the proxies whose quarantine is over."""
+        if self.quarantine is None:
+            return
+
+        for proxy in self.quarantine.release():
+            self.storage.validate_proxy(proxy)
+            self.restore_proxy(proxy)
+            self.stats.inc_value('proxy/quarantine/released', spider=spider)
+
+    def check_quarantine(self, scheme: str):
+        """Wait for the proxies of the scheme in quarantine, instead of being
+        exhausted."""
+        if self.quarantine is None:
+            return
+
+        release_at: float = self.quarantine.next_release(
+            lambda x: x[0] == scheme
+        )
+        if release_at is not None:
+            raise ProxyThrottledException(
+                max(release_at - self.quarantine.timer(), 0.0)
+            )
+
+    def restore_proxy(self, proxy: Tuple[str, bytes, str]):
+        """Called with the proxy released from the quarantine."""
+
+    def discard_proxy(self, proxy: Tuple[str, bytes, str]):
+        """Invalidate the proxy and take it out of the rotation; by default,
+        it is taken out of the proxies of the storage, which the strategies
+        keeping a rotation of their own should override."""
+        self.storage.invalidate_proxy(proxy)
+
+        proxies = self.storage.proxies.get(proxy[0])
+        if isinstance(proxies, list) and proxy[1:] in proxies:
+            self.storage.proxies = {
+                **self.storage.proxies,
+                proxy[0]: list(filter(lambda x: x != proxy[1:], proxies))
+            }
+
+    def count_use(self, request: Request, spider: Spider):
+        """Count the use of the proxy just assigned to the request, or to the
+        request on its domain, and retire the proxy once it reaches
+        HTTPPROXY_MAX_USES."""
+        if not self.max_uses:
+            return
+
+        proxy: Tuple[str, bytes, str] = get_proxy_key(request)
+        domain: str = None
+        key = proxy
+        if self.max_uses_per_domain:
+            domain = urlparse_cached(request).hostname
+            key = (proxy, domain)
+
+        uses: int = self.proxies_uses.get(key, 0) + 1
+        if uses < self.max_uses:
+            self.proxies_uses[key] = uses
+            return
+
+        self.proxies_uses.pop(key, None)
+        self.stats.inc_value('proxy/max_uses/retired', spider=spider)
+        if domain is not None:
+            logger.debug('Proxy %s is retired on %s', proxy[2], domain)
+            self.retired.ban(domain, self.storage.get_proxy_id(proxy))
+        else:
+            logger.debug('Proxy %s is retired', proxy[2])
+            self.discard_proxy(proxy)
+        self.refill_proxies(spider)
+
+    def refill_proxies(self, spider: Spider):
+        """Reload the proxies in a thread, to replace the retired ones, if the
+        storage could supply more."""
+        if any((not self.storage.refillable,
+                not self.settings.getbool('HTTPPROXY_MAX_USES_REFILL'),
+                self.refilling is not None)):
+            return
+
+        def refilled(result: Any):
+            # applied in the reactor thread, only the query runs in a thread
+            proxies: Dict[str, Union[str, List[Tuple[bytes, str]]]] = (
+                self.storage.apply_proxies(result)
+            )
+            self.update_proxies(self.filter_proxies(proxies))
+            self.stats.inc_value('proxy/max_uses/refilled', spider=spider)
+
+        def reset(result):
+            self.refilling = None
+            return result
+
+        self.refilling = deferToThread(self.storage.query_proxies)
+        self.refilling.addCallback(refilled)
+        self.refilling.addErrback(
+            lambda x: logger.error('Failed to refill the proxies: %s', x.value)
+        )
+        self.refilling.addBoth(reset)
+
+    def update_proxies(
+            self, proxies: Dict[str, Union[str, List[Tuple[bytes, str]]]]
+    ):
+        """Replace the proxies by the reloaded ones."""
+        self.storage.proxies = proxies
+
+    def ban_proxy(self, request: Request, spider: Spider) -> bool:
+        """Ban the proxy of the request only on the domain of the request, if
+        the bans per domain are enabled, instead of invalidating it."""
+        if self.bans is None:
+            return False
+
+        proxy: Tuple[str, bytes, str] = get_proxy_key(request)
+        domain: str = urlparse_cached(request).hostname
+        logger.debug('Proxy %s is banned on %s', proxy[2], domain)
+        self.bans.ban(domain, self.storage.get_proxy_id(proxy))
+        self.stats.inc_value('proxy/ban/banned', spider=spider)
+        return True
+
+    def skip_banned(
+            self, scheme: str, request: Request, spider: Spider,
+            retrieve: Callable[..., Tuple[bytes, str]], tries: int
+    ) -> Tuple[bytes, str]:
+        """Retrieve a proxy by the callable which is not banned on the domain
+        of the request, nor excluded by the field 'proxy_excluded' of its meta;
+        wait for the bans of the domain to expire if all the proxies are
+        banned, or reuse an excluded one if none of them is banned; the request
+        is ignored if all the proxies are retired on the domain, as they never
+        expire.
+
+        If the strategy skips_proxies, the callable takes the predicate of the
+        skipped proxies, and returns None if all of them are skipped, so they
+        are skipped before any side effect of the retrieval; otherwise it is
+        called up to the tries, until its proxy is not skipped.
+
+        """
+        if request is None:
+            return retrieve()
+        excluded: Tuple[int, ...] = request.meta.get('proxy_excluded', ())
+        if self.bans is None and self.retired is None and not excluded:
+            return retrieve()
+
+        domain: str = urlparse_cached(request).hostname
+
+        # whether a proxy is skipped by a ban, which expires, or all of them
+        # are skipped as retired
+        expiring: List[bool] = [False]
+
+        def banned(proxy: Tuple[bytes, str]) -> bool:
+            proxy_id: int = self.storage.get_proxy_id((scheme, *proxy))
+            if self.bans is not None and self.bans.is_banned(domain, proxy_id):
+                expiring[0] = True
+                return True
+            return (
+                self.retired is not None
+                and self.retired.is_banned(domain, proxy_id)
+            )
+
+        def skipped(proxy: Tuple[bytes, str]) -> bool:
+            if banned(proxy):
+                self.stats.inc_value('proxy/ban/skipped', spider=spider)
+                return True
+            if excluded and get_proxy_hash((scheme, *proxy)) in excluded:
+                self.stats.inc_value('proxy/excluded/skipped', spider=spider)
+                return True
+            return False
+
+        fallback: Tuple[bytes, str] = None
+        if self.skips_proxies:
+            proxy: Tuple[bytes, str] = retrieve(skipped)
+            if proxy is not None:
+                return proxy
+            if excluded:
+                fallback = retrieve(banned)
+        else:
+            for _ in range(max(tries, 1)):
+                proxy = retrieve()
+                if not skipped(proxy):
+                    return proxy
+                if not banned(proxy):
+                    fallback = fallback or proxy
+
+        if fallback is not None:
+            self.stats.inc_value('proxy/excluded/reused', spider=spider)
+            return fallback
+        if not expiring[0] and self.retired is not None and (
+                self.retired.count(domain)
+                >= len(self.storage.proxies.get(scheme, ()))
+        ):
+            # waiting is useless, but more proxies could be refilled
+            self.stats.inc_value('proxy/max_uses/all_retired', spider=spider)
+            self.refill_proxies(spider)
+            raise IgnoreRequest(
+                'All the {} proxies are retired on {}'.format(scheme, domain)
+            )
+        self.stats.inc_value('proxy/ban/all_banned', spider=spider)
+        raise ProxyThrottledException(
+            (self.bans is not None and self.bans.expire_in(domain))
+            or self.ban_wait_delay
+        )
+
+    def reload_proxies(
+            self, spider: Spider
+    ) -> Dict[str, Union[str, List[Tuple[bytes, str]]]]:
+        return self.filter_proxies(self.storage.load_proxies())
+
+    def filter_proxies(
+            self, orig_proxies: Dict[str, Union[str, List[Tuple[bytes, str]]]]
+    ) -> Dict[str, Union[str, List[Tuple[bytes, str]]]]:
+        """Return the loaded proxies without the invalidated ones."""
+        proxies = defaultdict(list)
+        if 'no' in orig_proxies:
+            proxies.update({'no': orig_proxies.pop('no')})
+
+        for key, value in orig_proxies.items():
+            # the environment storage keeps only one proxy for each scheme
+            if isinstance(value, tuple):
+                value = [value]
+            for value_ in value:
+                if (key, *value_) not in self.storage.proxies_invalidated:
+                    proxies[key].append(value_)
+
+        return dict(proxies)
 
     def proxy_bypass(
             self, host: str,
@@ -108,5 +431,138 @@ class BaseStrategy(metaclass=ABCMeta):
         return False
 
     @abstractmethod
-    def retrieve_proxy(self, scheme: str, spider: Spider):
+    def retrieve_proxy(
+            self, scheme: str, spider: Spider, request: Request = None
+    ):
         pass
+
+
+class BasePoolStrategy(BaseStrategy):
+    """The base of the strategies keeping the proxies of each scheme in a pool
+    of their own, which is rebuilt when the proxies are reloaded."""
+
+    supported_storage = (
+        'scrapy_proxy_management.storages.environment_storage.EnvironmentStorage',
+        'scrapy_proxy_management.storages.mongodb_storage.MongoDBSyncStorage',
+        'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+    )
+
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        self.pools: Dict[str, Any] = dict()
+
+    def open_spider(self, spider: Spider):
+        super().open_spider(spider)
+        self.build_pools(self.storage.proxies)
+
+    def build_pools(
+            self, proxies: Dict[str, Union[str, List[Tuple[bytes, str]]]]
+    ):
+        self.pools = dict()
+        for scheme, proxies_ in proxies.items():
+            if scheme == 'no':
+                continue
+            # the environment storage keeps only one proxy for each scheme
+            if isinstance(proxies_, tuple):
+                proxies_ = [proxies_]
+            self.pools[scheme] = self.build_pool(scheme, proxies_)
+
+    def invalidate_proxy(
+            self, request: Request = None, response: Response = None,
+            exception: Exception = None, spider: Spider = None, **kwargs
+    ):
+        req = request if request else response.request
+        if self.ban_proxy(req, spider):
+            return
+
+        proxy: Tuple[str, bytes, str] = get_proxy_key(req)
+        self.discard_proxy(proxy)
+        self.quarantine_proxy(proxy, spider)
+
+    def discard_proxy(self, proxy: Tuple[str, bytes, str]):
+        self.storage.invalidate_proxy(proxy)
+        if proxy[0] in self.pools:
+            self.remove_proxy(proxy[0], proxy[1:])
+
+    def update_proxies(
+            self, proxies: Dict[str, Union[str, List[Tuple[bytes, str]]]]
+    ):
+        super().update_proxies(proxies)
+        self.build_pools(self.storage.proxies)
+
+    def retrieve_proxy(
+            self, scheme: str, spider: Spider, request: Request = None
+    ):
+        self.release_quarantine(spider)
+        return self.skip_banned(
+            scheme, request, spider,
+            lambda *args: self._retrieve_proxy(scheme, spider, request, *args),
+            self.settings.getint('HTTPPROXY_BAN_MAX_TRIES')
+        )
+
+    def _retrieve_proxy(
+            self, scheme: str, spider: Spider, request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        select: Callable[..., Tuple[bytes, str]] = self.select_proxy
+        if skipped is not None:
+            select = partial(select, skipped=skipped)
+        try:
+            return select(scheme, self.pools[scheme], spider, request)
+        except ProxyExhaustedException:
+            proxies = self.reload_proxies(spider)
+            if scheme not in proxies:
+                # keep the scheme, to wait for its proxies in quarantine
+                self.check_quarantine(scheme)
+            self.storage.proxies = proxies
+            self.build_pools(self.storage.proxies)
+            if scheme not in self.pools:
+                raise
+            return select(scheme, self.pools[scheme], spider, request)
+
+    def restore_proxy(self, proxy: Tuple[str, bytes, str]):
+        if proxy[0] in self.pools:
+            self.add_proxy(proxy[0], proxy[1:])
+        else:
+            self.storage.proxies = {
+                **self.storage.proxies, proxy[0]: [proxy[1:]]
+            }
+            self.pools[proxy[0]] = self.build_pool(proxy[0], [proxy[1:]])
+
+    def add_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        """Put back the proxy into the pool, by rebuilding the pool without the
+        invalidated proxies; override it if the pool could add a proxy."""
+        proxies = self.storage.proxies.get(scheme, [])
+        if isinstance(proxies, tuple):
+            proxies = [proxies]
+        self.pools[scheme] = self.build_pool(scheme, list(filter(
+            lambda x: (scheme, *x) not in self.storage.proxies_invalidated,
+            proxies
+        )))
+
+    def get_proxy_meta(self, scheme: str, proxy: Tuple[bytes, str]) -> Dict:
+        return self.storage.proxies_meta.get((scheme, *proxy), {})
+
+    @abstractmethod
+    def build_pool(self, scheme: str, proxies: List[Tuple[bytes, str]]) -> Any:
+        pass
+
+    @abstractmethod
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        pass
+
+    @abstractmethod
+    def select_proxy(
+            self, scheme: str, pool: Any, spider: Spider,
+            request: Request = None
+    ) -> Tuple[bytes, str]:
+        """Return a proxy from the pool, or raise ProxyExhaustedException if
+        the pool is empty.
+
+        If the strategy skips_proxies, it takes the keyword argument skipped,
+        the predicate of the proxies skipped for the request, to be checked
+        before any side effect of the selection, and returns None if all of
+        them are skipped.
+
+        """
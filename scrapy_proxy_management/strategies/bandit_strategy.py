@@ -0,0 +1,162 @@
+import logging
+import math
+import random
+from itertools import islice
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.spiders import Spider
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..storages import BaseStorage
+from ..utils import get_proxy_key
+from ..utils.indexed_set import IndexedSet
+
+logger = logging.getLogger(__name__)
+
+
+class BanditStrategy(BasePoolStrategy):
+    """Treat each proxy as an arm of a multi-armed bandit, rewarded by the
+    successful responses and punished by the blocks and the exceptions.
+
+    Each time a few candidates are sampled from the pool, and the best one by
+    Thompson sampling or UCB1 is provided. An invalidated proxy is not removed,
+    but counted as a failure. The counts of a proxy are halved once they reach
+    the window, so the strategy follows the proxies whose success rate changes.
+
+    """
+
+    skips_proxies = True
+
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        # an invalidated proxy is kept in the pool, so it is never quarantined
+        if self.quarantine is not None:
+            raise ValueError(
+                'HTTPPROXY_QUARANTINE_ENABLED is not supported by {}'.format(
+                    type(self).__name__
+                )
+            )
+
+        self.algorithm: str = self.settings.get('HTTPPROXY_BANDIT_ALGORITHM')
+        if self.algorithm not in ('thompson', 'ucb1'):
+            raise ValueError(
+                'Unknown bandit algorithm: {}'.format(self.algorithm)
+            )
+        self.candidates: int = self.settings.getint(
+            'HTTPPROXY_BANDIT_CANDIDATES'
+        )
+        self.window: int = self.settings.getint('HTTPPROXY_BANDIT_WINDOW')
+        self.error_status_codes = set(map(int, self.settings.getlist(
+            'HTTPPROXY_PROXY_INVALIDATED_STATUS_CODES'
+        )))
+
+        # (scheme, credential, proxy): [successes, failures]
+        self.proxies_counts: Dict[Tuple[str, bytes, str], List[float]] = dict()
+        self.total_counts: float = 0.0
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> IndexedSet:
+        return IndexedSet(proxies)
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+        counts: List[float] = self.proxies_counts.pop((scheme, *proxy), None)
+        if counts:
+            self.total_counts -= sum(counts)
+
+    def select_proxy(
+            self, scheme: str, pool: IndexedSet, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        if not pool:
+            raise ProxyExhaustedException
+
+        get_score = (
+            self._get_thompson_score if self.algorithm == 'thompson'
+            else self._get_ucb1_score
+        )
+        candidates: List[Tuple[bytes, str]] = pool.sample(self.candidates)
+        if skipped is not None:
+            # the skipped proxies are not counted in the candidates
+            candidates = list(islice(filter(
+                lambda x: not skipped(x), pool.sample(self.candidates + max(
+                    self.settings.getint('HTTPPROXY_BAN_MAX_TRIES'), 1
+                ))
+            ), self.candidates))
+        return max(
+            candidates, key=lambda x: get_score((scheme, *x)), default=None
+        )
+
+    def _get_thompson_score(self, proxy: Tuple[str, bytes, str]) -> float:
+        successes, failures = self.proxies_counts.get(proxy, (0.0, 0.0))
+        return random.betavariate(successes + 1, failures + 1)
+
+    def _get_ucb1_score(self, proxy: Tuple[str, bytes, str]) -> float:
+        successes, failures = self.proxies_counts.get(proxy, (0.0, 0.0))
+        pulls: float = successes + failures
+        if not pulls:
+            return float('inf')
+        return successes / pulls + math.sqrt(
+            2 * math.log(max(self.total_counts, 1.0)) / pulls
+        )
+
+    def _update(self, proxy: Tuple[str, bytes, str], success: bool):
+        if proxy[1:] not in self.pools.get(proxy[0], ()):
+            return
+
+        counts: List[float] = self.proxies_counts.setdefault(proxy, [0.0, 0.0])
+        counts[0 if success else 1] += 1
+        self.total_counts += 1
+
+        if self.window and sum(counts) >= self.window:
+            self.total_counts -= sum(counts) / 2
+            counts[0] /= 2
+            counts[1] /= 2
+
+    def invalidate_proxy(
+            self, request: Request = None, response: Response = None,
+            exception: Exception = None, spider: Spider = None, **kwargs
+    ):
+        req = request if request else response.request
+        proxy: Tuple[str, bytes, str] = get_proxy_key(req)
+
+        # the response of a block may be counted as a success already
+        if req.meta.pop('_proxy_bandit_success', False):
+            counts: List[float] = self.proxies_counts.get(proxy)
+            if counts and counts[0] >= 1:
+                counts[0] -= 1
+                self.total_counts -= 1
+
+        self.stats.inc_value('proxy/bandit/failure', spider=spider)
+        self._update(proxy, success=False)
+        self.ban_proxy(req, spider)
+
+    def process_response(
+            self, request: Request, response: Response, spider: Spider
+    ):
+        success: bool = response.status not in self.error_status_codes
+        if success:
+            request.meta['_proxy_bandit_success'] = True
+
+        self.stats.inc_value(
+            'proxy/bandit/{}'.format('success' if success else 'failure'),
+            spider=spider
+        )
+        self._update(get_proxy_key(request), success=success)
+
+    def process_exception(
+            self, request: Request, exception: Exception, spider: Spider
+    ):
+        self.stats.inc_value('proxy/bandit/failure', spider=spider)
+        self._update(get_proxy_key(request), success=False)
@@ -0,0 +1,260 @@
+import heapq
+import logging
+import time
+from collections import defaultdict
+from itertools import count
+from typing import Callable
+from typing import DefaultDict
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.spiders import Spider
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..exceptions import ProxyThrottledException
+from ..storages import BaseStorage
+from ..utils import get_proxy_key
+from ..utils.circuit_breaker import CLOSED
+from ..utils.circuit_breaker import CircuitBreaker
+from ..utils.circuit_breaker import HALF_OPEN
+from ..utils.circuit_breaker import OPEN
+from ..utils.indexed_set import IndexedSet
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreakerStrategy(BasePoolStrategy):
+    """Keep a circuit breaker for each proxy, instead of removing a proxy on
+    its first failure.
+
+    A proxy is taken out of the pool when its breaker is opened by the
+    failures in the sliding window, and put back half-opened after the
+    cooldown, for a limited number of trials deciding to close or open it
+    again. The invalidated proxies are counted as failures, so the transient
+    failures do not shrink the pool.
+
+    """
+
+    skips_proxies = True
+
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        # an invalidated proxy is counted as a failure of its breaker, which
+        # takes it out for the cooldown instead of the quarantine
+        if self.quarantine is not None:
+            raise ValueError(
+                'HTTPPROXY_QUARANTINE_ENABLED is not supported by {}'.format(
+                    type(self).__name__
+                )
+            )
+
+        self.timer = time.monotonic
+
+        self.window: int = self.settings.getint(
+            'HTTPPROXY_CIRCUIT_BREAKER_WINDOW'
+        )
+        self.min_requests: int = self.settings.getint(
+            'HTTPPROXY_CIRCUIT_BREAKER_MIN_REQUESTS'
+        )
+        self.failure_ratio: float = self.settings.getfloat(
+            'HTTPPROXY_CIRCUIT_BREAKER_FAILURE_RATIO'
+        )
+        self.cooldown: float = self.settings.getfloat(
+            'HTTPPROXY_CIRCUIT_BREAKER_COOLDOWN'
+        )
+        self.trials: int = self.settings.getint(
+            'HTTPPROXY_CIRCUIT_BREAKER_HALF_OPEN_TRIALS'
+        )
+        self.wait_delay: float = self.settings.getfloat(
+            'HTTPPROXY_CIRCUIT_BREAKER_WAIT_DELAY'
+        )
+        self.trial_timeout: float = self.settings.getfloat(
+            'HTTPPROXY_CIRCUIT_BREAKER_TRIAL_TIMEOUT'
+        )
+        self.error_status_codes = set(map(int, self.settings.getlist(
+            'HTTPPROXY_PROXY_INVALIDATED_STATUS_CODES'
+        )))
+
+        # (scheme, credential, proxy): breaker
+        self.breakers: Dict[Tuple[str, bytes, str], CircuitBreaker] = dict()
+        # (the time to half-open, sequence, (scheme, credential, proxy))
+        self.cooldowns: List[Tuple[float, int, Tuple]] = list()
+        self.cooldowns_seq: Iterator[int] = count()
+        # (scheme, credential, proxy): the time its trials in flight time out,
+        # and the heap of them, as (time, sequence, (scheme, credential,
+        # proxy)), checked against the dict when popped
+        self.trials_until: Dict[Tuple[str, bytes, str], float] = dict()
+        self.trials_timeouts: List[Tuple[float, int, Tuple]] = list()
+
+        # scheme: the number of the half-open breakers
+        self.half_open_count: DefaultDict[str, int] = defaultdict(int)
+        self.open_count: int = 0
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> IndexedSet:
+        for proxy in proxies:
+            if (scheme, *proxy) not in self.breakers:
+                self.breakers[(scheme, *proxy)] = CircuitBreaker(
+                    self.window, self.min_requests, self.failure_ratio,
+                    self.trials
+                )
+
+        # the proxies still in cooldown are put back when it is over
+        return IndexedSet(filter(
+            lambda x: self.breakers[(scheme, *x)].state == CLOSED, proxies
+        ))
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+        breaker: CircuitBreaker = self.breakers.pop((scheme, *proxy), None)
+        if breaker is not None:
+            self._count_state(scheme, breaker.state, -1)
+        self.trials_until.pop((scheme, *proxy), None)
+
+    def select_proxy(
+            self, scheme: str, pool: IndexedSet, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        self._release_cooldowns(spider)
+
+        if not pool:
+            self._wait(scheme)
+
+        if skipped is None:
+            proxy: Tuple[bytes, str] = pool.choice()
+        else:
+            # skipped before a trial of a half-open breaker is taken
+            proxy = next(filter(lambda x: not skipped(x), pool.sample(max(
+                self.settings.getint('HTTPPROXY_BAN_MAX_TRIES'), 1
+            ))), None)
+            if proxy is None:
+                return None
+        breaker: CircuitBreaker = self.breakers[(scheme, *proxy)]
+        breaker.allow()
+        if breaker.state == HALF_OPEN and not breaker.trials_left:
+            # no more trials until the outcomes of the ones in flight, or
+            # until they time out, if a trial never reports its outcome
+            pool.discard(proxy)
+            until: float = self.timer() + self.trial_timeout
+            self.trials_until[(scheme, *proxy)] = until
+            heapq.heappush(self.trials_timeouts, (
+                until, next(self.cooldowns_seq), (scheme, *proxy)
+            ))
+        return proxy
+
+    def _wait(self, scheme: str):
+        delays: List[float] = list(map(
+            lambda x: max(x[0] - self.timer(), 0.0),
+            filter(lambda x: x[2][0] == scheme, self.cooldowns)
+        ))
+        if self.half_open_count[scheme]:
+            # the outcomes of the trials in flight are waited for
+            delays.append(self.wait_delay)
+
+        if not delays:
+            raise ProxyExhaustedException
+        raise ProxyThrottledException(min(delays))
+
+    def _release_cooldowns(self, spider: Spider):
+        now: float = self.timer()
+        while self.cooldowns and self.cooldowns[0][0] <= now:
+            _, _, proxy = heapq.heappop(self.cooldowns)
+            breaker: CircuitBreaker = self.breakers.get(proxy)
+            if breaker is None or breaker.state != OPEN:
+                continue
+
+            breaker.half_open()
+            self._transited(proxy, OPEN, HALF_OPEN, spider)
+            pool: IndexedSet = self.pools.get(proxy[0])
+            if pool is not None:
+                pool.add(proxy[1:])
+
+        # the trials without outcomes, e.g. ignored, open the breaker again
+        while self.trials_timeouts and self.trials_timeouts[0][0] <= now:
+            until, _, proxy = heapq.heappop(self.trials_timeouts)
+            if self.trials_until.get(proxy) != until:
+                continue
+            logger.debug('Trials of proxy %s time out', proxy[2])
+            self.stats.inc_value(
+                'proxy/circuit_breaker/trial_timeout', spider=spider
+            )
+            self._record(proxy, False, spider)
+
+    def _record(self, proxy: Tuple[str, bytes, str], success: bool, spider):
+        breaker: CircuitBreaker = self.breakers.get(proxy)
+        if breaker is None:
+            return
+
+        previous: str = breaker.state
+        state: str = breaker.record(success)
+        if state is None:
+            return
+
+        self.trials_until.pop(proxy, None)
+        self._transited(proxy, previous, state, spider)
+        pool: IndexedSet = self.pools.get(proxy[0])
+        if state == OPEN:
+            heapq.heappush(self.cooldowns, (
+                self.timer() + self.cooldown, next(self.cooldowns_seq), proxy
+            ))
+            if pool is not None:
+                pool.discard(proxy[1:])
+        elif pool is not None:
+            pool.add(proxy[1:])
+
+    def _transited(
+            self, proxy: Tuple[str, bytes, str], previous: str, state: str,
+            spider
+    ):
+        logger.debug('Circuit breaker of proxy %s is %s', proxy[2], state)
+        self._count_state(proxy[0], previous, -1)
+        self._count_state(proxy[0], state, 1)
+        self.stats.inc_value(
+            'proxy/circuit_breaker/{}'.format(state), spider=spider
+        )
+        self.stats.set_value(
+            'proxy/circuit_breaker/open_count', self.open_count, spider=spider
+        )
+
+    def _count_state(self, scheme: str, state: str, n: int):
+        if state == OPEN:
+            self.open_count += n
+        elif state == HALF_OPEN:
+            self.half_open_count[scheme] += n
+
+    def invalidate_proxy(
+            self, request: Request = None, response: Response = None,
+            exception: Exception = None, spider: Spider = None, **kwargs
+    ):
+        req = request if request else response.request
+        # the response of a block may be counted as a success already
+        if req.meta.pop('_proxy_circuit_breaker_success', False):
+            breaker = self.breakers.get(get_proxy_key(req))
+            if breaker is not None and True in breaker.outcomes:
+                breaker.outcomes.remove(True)
+
+        self._record(get_proxy_key(req), False, spider)
+        self.ban_proxy(req, spider)
+
+    def process_response(
+            self, request: Request, response: Response, spider: Spider
+    ):
+        success: bool = response.status not in self.error_status_codes
+        if success:
+            request.meta['_proxy_circuit_breaker_success'] = True
+        self._record(get_proxy_key(request), success, spider)
+
+    def process_exception(
+            self, request: Request, exception: Exception, spider: Spider
+    ):
+        self._record(get_proxy_key(request), False, spider)
@@ -1,20 +1,86 @@
 import logging
-import re
+from typing import Callable
+from typing import Optional
+from typing import Tuple
 
+from scrapy.http import Request
+from scrapy.http import Response
 from scrapy.spiders import Spider
 
 from . import BaseStrategy
+from ..exceptions import ProxyExhaustedException
+from ..utils import get_proxy_key
+from ..utils.rotation_ring import RotationRing
 
 logger = logging.getLogger(__name__)
 
-pattern_credential = re.compile(rb'^Basic\s(?P<credential>.*)')
-
 
 class DefaultStrategy(BaseStrategy):
     supported_storage = (
         'scrapy_proxy_management.storages.environment_storage.EnvironmentStorage',
         'scrapy_proxy_management.storages.settings_storage.SettingsStorage'
     )
+    skips_proxies = True
+
+    def invalidate_proxy(
+            self, request: Request = None, response: Response = None,
+            exception: Exception = None, spider: Spider = None, **kwargs
+    ):
+        req = request if request else response.request
+        if self.ban_proxy(req, spider):
+            return
+
+        proxy: Tuple[str, bytes, str] = get_proxy_key(req)
+        self.discard_proxy(proxy)
+        self.quarantine_proxy(proxy, spider)
+
+    def discard_proxy(self, proxy: Tuple[str, bytes, str]):
+        self.storage.invalidate_proxy(proxy)
+
+        proxies_iter: RotationRing = self.storage.proxies_iter.get(proxy[0])
+        if proxies_iter is not None:
+            proxies_iter.discard(proxy[1:])
+
+    def restore_proxy(self, proxy: Tuple[str, bytes, str]):
+        proxies_iter: RotationRing = self.storage.proxies_iter.get(proxy[0])
+        if proxies_iter is not None:
+            proxies_iter.add(proxy[1:])
+        else:
+            self.storage.proxies = {
+                **self.storage.proxies, proxy[0]: [proxy[1:]]
+            }
+
+    def retrieve_proxy(
+            self, scheme: str, spider: Spider, request: Request = None
+    ):
+        self.release_quarantine(spider)
+        return self.skip_banned(
+            scheme, request, spider,
+            lambda *args: self._retrieve_proxy(scheme, spider, *args),
+            len(self.storage.proxies_iter.get(scheme, ()))
+        )
+
+    def _retrieve_proxy(
+            self, scheme: str, spider: Spider,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        def retrieve(
+                proxies_iter: RotationRing
+        ) -> Optional[Tuple[bytes, str]]:
+            if skipped is None:
+                return next(proxies_iter)
+            # the skipped proxies are not rotated
+            return proxies_iter.next_matching(lambda x: not skipped(x))
 
-    def retrieve_proxy(self, scheme: str, spider: Spider):
-        return next(self.storage.proxies_iter[scheme])
+        try:
+            return retrieve(self.storage.proxies_iter[scheme])
+        except StopIteration as exc:
+            proxies = self.reload_proxies(spider)
+            if scheme not in proxies:
+                # keep the scheme, to wait for its proxies in quarantine
+                self.check_quarantine(scheme)
+            self.storage.proxies = proxies
+            if scheme in self.storage.proxies:
+                return retrieve(self.storage.proxies_iter[scheme])
+            else:
+                raise ProxyExhaustedException from exc
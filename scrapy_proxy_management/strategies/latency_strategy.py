@@ -0,0 +1,138 @@
+import logging
+import random
+from itertools import islice
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.spiders import Spider
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..storages import BaseStorage
+from ..utils import get_proxy_key
+from ..utils.indexed_set import IndexedSet
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyStrategy(BasePoolStrategy):
+    """Prefer the fastest healthy proxies, by the exponentially weighted moving
+    average (EWMA) of the download latency and the error rate of each proxy.
+
+    Each time a few candidates are sampled from the pool, and the one with the
+    least expected latency of a successful download (latency / success rate)
+    is provided; the proxies never used are tried first. With the probability
+    of exploration any proxy is provided, so the unhealthy ones could recover.
+
+    """
+
+    skips_proxies = True
+
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        self.alpha: float = self.settings.getfloat(
+            'HTTPPROXY_LATENCY_EWMA_ALPHA'
+        )
+        self.candidates: int = self.settings.getint(
+            'HTTPPROXY_LATENCY_CANDIDATES'
+        )
+        self.exploration: float = self.settings.getfloat(
+            'HTTPPROXY_LATENCY_EXPLORATION'
+        )
+        self.max_error_rate: float = self.settings.getfloat(
+            'HTTPPROXY_LATENCY_MAX_ERROR_RATE'
+        )
+        self.error_status_codes = set(map(int, self.settings.getlist(
+            'HTTPPROXY_PROXY_INVALIDATED_STATUS_CODES'
+        )))
+
+        # (scheme, credential, proxy): [latency EWMA, error rate EWMA]
+        self.proxies_ewma: Dict[Tuple[str, bytes, str], List[float]] = dict()
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> IndexedSet:
+        return IndexedSet(proxies)
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+        self.proxies_ewma.pop((scheme, *proxy), None)
+
+    def add_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].add(proxy)
+
+    def select_proxy(
+            self, scheme: str, pool: IndexedSet, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        if not pool:
+            raise ProxyExhaustedException
+
+        tries: int = max(self.settings.getint('HTTPPROXY_BAN_MAX_TRIES'), 1)
+        if random.random() < self.exploration:
+            self.stats.inc_value('proxy/latency/exploration', spider=spider)
+            if skipped is None:
+                return pool.choice()
+            return next(filter(
+                lambda x: not skipped(x), pool.sample(tries)
+            ), None)
+
+        candidates: List[Tuple[bytes, str]] = pool.sample(self.candidates)
+        if skipped is not None:
+            # the skipped proxies are not counted in the candidates
+            candidates = list(islice(filter(
+                lambda x: not skipped(x), pool.sample(self.candidates + tries)
+            ), self.candidates))
+        return min(
+            candidates, key=lambda x: self._get_score((scheme, *x)),
+            default=None
+        )
+
+    def _get_score(self, proxy: Tuple[str, bytes, str]) -> float:
+        try:
+            latency, error_rate = self.proxies_ewma[proxy]
+        except KeyError:
+            return 0.0
+
+        if error_rate > self.max_error_rate:
+            return float('inf')
+        return latency / max(1.0 - error_rate, 1e-6)
+
+    def _update(
+            self, proxy: Tuple[str, bytes, str], latency: float = None,
+            error: bool = False
+    ):
+        if proxy[1:] not in self.pools.get(proxy[0], ()):
+            return
+
+        try:
+            ewma: List[float] = self.proxies_ewma[proxy]
+        except KeyError:
+            self.proxies_ewma[proxy] = [latency or 0.0, float(error)]
+            return
+
+        if latency is not None:
+            ewma[0] += self.alpha * (latency - ewma[0])
+        ewma[1] += self.alpha * (float(error) - ewma[1])
+
+    def process_response(
+            self, request: Request, response: Response, spider: Spider
+    ):
+        self._update(
+            get_proxy_key(request),
+            latency=request.meta.get('download_latency'),
+            error=response.status in self.error_status_codes
+        )
+
+    def process_exception(
+            self, request: Request, exception: Exception, spider: Spider
+    ):
+        self._update(get_proxy_key(request), error=True)
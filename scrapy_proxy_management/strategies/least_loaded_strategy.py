@@ -0,0 +1,152 @@
+import logging
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.spiders import Spider
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..exceptions import ProxyThrottledException
+from ..storages import BaseStorage
+from ..utils import get_proxy_key
+from ..utils.indexed_heap import IndexedMinHeap
+
+logger = logging.getLogger(__name__)
+
+
+class LeastLoadedStrategy(BasePoolStrategy):
+    """Provide the proxy with the least requests in flight relative to its
+    cap, from a min-heap of the proxies by load in O(log n).
+
+    The cap of a proxy is the field HTTPPROXY_PROXY_MAX_INFLIGHT_FIELD in its
+    meta, or HTTPPROXY_PROXY_MAX_INFLIGHT_DEFAULT. A request is counted in
+    flight from the proxy is assigned until its response or exception. When
+    all the proxies are saturated, HTTPPROXY_LEAST_LOADED_SATURATED decides to
+    overcommit the least loaded one, wait, or ignore the request.
+
+    """
+
+    skips_proxies = True
+
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        self.saturated: str = self.settings.get(
+            'HTTPPROXY_LEAST_LOADED_SATURATED'
+        )
+        if self.saturated not in ('overcommit', 'wait', 'ignore'):
+            raise ValueError(
+                'Unknown saturated policy: {}'.format(self.saturated)
+            )
+        self.wait_delay: float = self.settings.getfloat(
+            'HTTPPROXY_LEAST_LOADED_WAIT_DELAY'
+        )
+
+        # (scheme, credential, proxy): the number of the requests in flight
+        self.proxies_inflight: Dict[Tuple[str, bytes, str], int] = dict()
+        self.proxies_cap: Dict[Tuple[str, bytes, str], int] = dict()
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> IndexedMinHeap:
+        cap_field: str = self.settings.get('HTTPPROXY_PROXY_MAX_INFLIGHT_FIELD')
+        cap_default: int = self.settings.getint(
+            'HTTPPROXY_PROXY_MAX_INFLIGHT_DEFAULT'
+        )
+
+        for proxy in proxies:
+            self.proxies_cap[(scheme, *proxy)] = max(int(
+                self.get_proxy_meta(scheme, proxy).get(cap_field, cap_default)
+            ), 1)
+
+        return IndexedMinHeap(map(
+            lambda x: (x, self._get_load((scheme, *x))), proxies
+        ))
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+
+    def add_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        if (scheme, *proxy) in self.proxies_cap:
+            self.pools[scheme].push(proxy, self._get_load((scheme, *proxy)))
+
+    def select_proxy(
+            self, scheme: str, pool: IndexedMinHeap, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        if not pool:
+            raise ProxyExhaustedException
+
+        # the skipped proxies are passed over in the order of their loads
+        ordered = pool.iter_sorted()
+        if skipped is not None:
+            ordered = filter(lambda x: not skipped(x[1]), ordered)
+        load, proxy = next(ordered, (None, None))
+        if proxy is None:
+            return None
+
+        if load >= 1:
+            self.stats.inc_value(
+                'proxy/least_loaded/saturated', spider=spider
+            )
+            if self.saturated == 'wait':
+                raise ProxyThrottledException(self.wait_delay)
+            elif self.saturated == 'ignore':
+                raise IgnoreRequest(
+                    'All the {} proxies are saturated'.format(scheme)
+                )
+
+        return proxy
+
+    def _get_load(self, proxy: Tuple[str, bytes, str]) -> float:
+        return self.proxies_inflight.get(proxy, 0) / self.proxies_cap[proxy]
+
+    def _update(self, proxy: Tuple[str, bytes, str], delta: int):
+        inflight: int = max(self.proxies_inflight.get(proxy, 0) + delta, 0)
+        if inflight:
+            self.proxies_inflight[proxy] = inflight
+        else:
+            self.proxies_inflight.pop(proxy, None)
+
+        pool: IndexedMinHeap = self.pools.get(proxy[0])
+        if pool is not None and proxy[1:] in pool:
+            pool.update(proxy[1:], self._get_load(proxy))
+
+    def _release(self, request: Request):
+        # the key is kept in the meta, so a request is released only once,
+        # even if it is recycled before its response reaches here
+        proxy = request.meta.pop('_proxy_inflight', None)
+        if proxy is not None:
+            self._update(tuple(proxy), -1)
+
+    def process_request(self, request: Request, spider: Spider):
+        self._release(request)
+
+        proxy: Tuple[str, bytes, str] = get_proxy_key(request)
+        request.meta['_proxy_inflight'] = proxy
+        self._update(proxy, 1)
+
+    def process_response(
+            self, request: Request, response: Response, spider: Spider
+    ):
+        self._release(request)
+
+    def process_exception(
+            self, request: Request, exception: Exception, spider: Spider
+    ):
+        self._release(request)
+
+    def invalidate_proxy(
+            self, request: Request = None, response: Response = None,
+            exception: Exception = None, spider: Spider = None, **kwargs
+    ):
+        super().invalidate_proxy(request, response, exception, spider, **kwargs)
+        self._release(request if request else response.request)
@@ -1,72 +1,83 @@
 import logging
-import re
-from collections import defaultdict
-from urllib.parse import urlparse
+from typing import Dict
+from typing import Tuple
 
-from scrapy.exceptions import IgnoreRequest
+from scrapy.crawler import Crawler
 from scrapy.http import Request
 from scrapy.http import Response
 from scrapy.spiders import Spider
 
 from . import BaseStrategy
 from ..exceptions import ProxyExhaustedException
+from ..exceptions import ProxyThrottledException
+from ..storages import BaseStorage
+from ..utils import get_proxy_key
 
 logger = logging.getLogger(__name__)
 
-pattern_credential = re.compile(rb'^Basic\s(?P<credential>.*)')
-
 
 class MongoDBStrategy(BaseStrategy):
     supported_storage = (
         'scrapy_proxy_management.storages.mongodb_storage.MongoDBSyncStorage',
     )
 
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        # scheme: the time its earliest proxy is released from the quarantine,
+        # before which the query is not run again, as all of its proxies are
+        # in quarantine
+        self.quarantined_until: Dict[str, float] = dict()
+
     def invalidate_proxy(
             self, request: Request = None, response: Response = None,
             exception: Exception = None, spider: Spider = None, **kwargs
     ):
         req = request if request else response.request
+        if self.ban_proxy(req, spider):
+            return
 
-        scheme: str = urlparse(req.url).scheme
-        if 'Proxy-Authorization' in req.headers:
-            credential: bytes = pattern_credential.match(
-                req.headers['Proxy-Authorization']
-            ).group('credential')
-        else:
-            credential = None
-        proxy: str = req.meta['proxy']
+        proxy: Tuple[str, bytes, str] = get_proxy_key(req)
+        self.discard_proxy(proxy)
+        self.quarantine_proxy(proxy, spider)
 
-        self.storage.proxies_invalidated.add((scheme, credential, proxy))
+    def discard_proxy(self, proxy: Tuple[str, bytes, str]):
+        # excluded in the query of the next reload by the storage
+        self.storage.invalidate_proxy(proxy)
 
-    def proxy_exhausted(self, request: Request, scheme: str, spider: Spider):
-        logger.warning(
-            'Proxy scheme %s is exhausted, ignore current request and stop the '
-            'spider now',
-            scheme
-        )
-        self.crawler.engine.close_spider(
-            spider, reason='Proxy scheme {} is exhausted'.format(scheme)
+    def retrieve_proxy(
+            self, scheme: str, spider: Spider, request: Request = None
+    ):
+        self.release_quarantine(spider)
+        return self.skip_banned(
+            scheme, request, spider,
+            lambda: self._retrieve_proxy(scheme, spider),
+            self.settings.getint('HTTPPROXY_BAN_MAX_TRIES')
         )
-        raise IgnoreRequest
 
-    def reload_proxies(self, spider: Spider):
-        orig_proxies = self.storage.load_proxies()
-        proxies = defaultdict(list)
-        if 'no' in orig_proxies:
-            proxies.update({'no': orig_proxies.pop('no')})
-
-        for key, value in orig_proxies.items():
-            for value_ in value:
-                if (key, *value_) not in self.storage.proxies_invalidated:
-                    proxies[key].append(value_)
-
-        return dict(proxies)
-
-    def retrieve_proxy(self, scheme: str, spider: Spider):
+    def _retrieve_proxy(
+            self, scheme: str, spider: Spider
+    ) -> Tuple[bytes, str]:
         try:
             return next(self.storage.proxies_iter[scheme])
         except StopIteration as exc:
-            self.storage.proxies = self.storage.load_proxies()
+            release_at: float = self.quarantined_until.get(scheme)
+            if release_at is not None:
+                now: float = self.quarantine.timer()
+                if release_at > now:
+                    raise ProxyThrottledException(release_at - now)
+                del self.quarantined_until[scheme]
+
+            proxies = self.reload_proxies(spider)
+            if scheme not in proxies and self.quarantine is not None:
+                # keep the scheme, to wait for its proxies in quarantine
+                release_at = self.quarantine.next_release(
+                    lambda x: x[0] == scheme
+                )
+                if release_at is not None:
+                    self.quarantined_until[scheme] = release_at
+                self.check_quarantine(scheme)
+            self.storage.proxies = proxies
             if scheme in self.storage.proxies:
                 return next(self.storage.proxies_iter[scheme])
             else:
@@ -0,0 +1,356 @@
+import logging
+import random
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.spiders import Spider
+from scrapy.utils.misc import load_object
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..exceptions import ProxyThrottledException
+from ..storages import BaseStorage
+from ..utils import get_proxy_key
+from ..utils.indexed_set import IndexedSet
+from ..utils.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineStrategy(BasePoolStrategy):
+    """Provide the proxies through a pipeline of stages configured in the
+    settings: the candidates sampled from the pool, or from the whole pool if
+    none of them passes (at most once every
+    HTTPPROXY_PIPELINE_FULL_SCAN_INTERVAL seconds), pass the filters
+    HTTPPROXY_PIPELINE_FILTERS in order, are scored by
+    HTTPPROXY_PIPELINE_SCORER, and one of them is chosen by
+    HTTPPROXY_PIPELINE_SELECTOR.
+
+    A filter or a scorer is loaded from its path and called with the strategy
+    to build the stage, a callable of (scheme, proxy, request) returning if
+    the proxy is kept, or its score; a stage could also have the hooks
+    process_request, process_response and process_exception of the strategy.
+    The selector is a callable of (proxies, scores), where the scores are
+    None without a scorer. The stages are bound into one selection function
+    when the strategy is created.
+
+    """
+
+    skips_proxies = True
+
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        self.candidates: int = self.settings.getint(
+            'HTTPPROXY_PIPELINE_CANDIDATES'
+        )
+        self.unmatched: str = self.settings.get('HTTPPROXY_PIPELINE_UNMATCHED')
+        if self.unmatched not in ('wait', 'ignore'):
+            raise ValueError(
+                'Unknown unmatched policy: {}'.format(self.unmatched)
+            )
+        self.wait_delay: float = self.settings.getfloat(
+            'HTTPPROXY_PIPELINE_WAIT_DELAY'
+        )
+        self.full_scan_interval: float = self.settings.getfloat(
+            'HTTPPROXY_PIPELINE_FULL_SCAN_INTERVAL'
+        )
+        self.timer: Callable[[], float] = time.monotonic
+
+        paths: List[str] = self.settings.getlist('HTTPPROXY_PIPELINE_FILTERS')
+        self.filters_name: List[str] = list(map(
+            lambda x: x.rsplit('.', 1)[-1], paths
+        ))
+        self.filters: List[Callable] = list(map(
+            lambda x: load_object(x)(self), paths
+        ))
+        scorer: str = self.settings.get('HTTPPROXY_PIPELINE_SCORER')
+        self.scorer: Optional[Callable] = (
+            load_object(scorer)(self) if scorer else None
+        )
+        self.selector: Callable = load_object(
+            self.settings.get('HTTPPROXY_PIPELINE_SELECTOR')
+        )
+
+        stages: List[Callable] = [*self.filters, self.scorer]
+        self.hooks: Dict[str, List[Callable]] = dict(map(
+            lambda x: (x, list(map(
+                lambda y: getattr(y, x),
+                filter(lambda y: hasattr(y, x), stages)
+            ))),
+            ('process_request', 'process_response', 'process_exception')
+        ))
+
+        # scheme: the time of its last full scan
+        self.scanned_at: Dict[str, float] = dict()
+        self.select: Callable = self.build_select()
+
+    def build_select(self) -> Callable:
+        """Return the selection function of the stages, with all of them bound
+        as its locals, so no stage is looked up for each request."""
+        filters: Tuple[Tuple[Callable, str], ...] = tuple(zip(
+            self.filters, map(
+                lambda x: 'proxy/pipeline/{}/rejected'.format(x),
+                self.filters_name
+            )
+        ))
+        scorer: Optional[Callable] = self.scorer
+        selector: Callable = self.selector
+        candidates: int = self.candidates
+        full_scan_interval: float = self.full_scan_interval
+        scanned_at: Dict[str, float] = self.scanned_at
+        inc_value: Callable = self.stats.inc_value
+        unmatched: Callable = self.unmatched_proxy
+
+        def passes(
+                scheme: str, proxy: Tuple[bytes, str], request: Request,
+                spider: Spider = None
+        ) -> bool:
+            # a candidate passes the filters in order, until one rejects it,
+            # counted only with the spider
+            for f, key in filters:
+                if not f(scheme, proxy, request):
+                    if spider is not None:
+                        inc_value(key, spider=spider)
+                    return False
+            return True
+
+        def select(
+                scheme: str, pool: IndexedSet, request: Request,
+                spider: Spider,
+                skipped: Callable[[Tuple[bytes, str]], bool] = None
+        ) -> Optional[Tuple[bytes, str]]:
+            sample: List[Tuple[bytes, str]] = pool.sample(candidates)
+            if skipped is not None:
+                sample = [x for x in sample if not skipped(x)]
+            kept: List[Tuple[bytes, str]] = [
+                x for x in sample if passes(scheme, x, request, spider)
+            ]
+
+            now: float = self.timer()
+            if all((not kept, len(pool) > candidates,
+                    now - scanned_at.get(scheme, float('-inf'))
+                    >= full_scan_interval)):
+                # the few proxies passing the filters could be missed by the
+                # sample, so the whole pool is scanned before it is unmatched,
+                # without counting its rejections
+                scanned_at[scheme] = now
+                inc_value('proxy/pipeline/full_scan', spider=spider)
+                sample = (
+                    list(pool) if skipped is None
+                    else [x for x in pool if not skipped(x)]
+                )
+                kept = [x for x in sample if passes(scheme, x, request)]
+                if len(kept) > candidates:
+                    kept = random.sample(kept, candidates)
+            if not sample:
+                # all the proxies are skipped for the request
+                return None
+            if not kept:
+                unmatched(scheme, request, spider)
+
+            if scorer is None:
+                return selector(kept, None)
+            return selector(kept, [scorer(scheme, x, request) for x in kept])
+
+        return select
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> IndexedSet:
+        return IndexedSet(proxies)
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+
+    def add_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].add(proxy)
+
+    def select_proxy(
+            self, scheme: str, pool: IndexedSet, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        if not pool:
+            raise ProxyExhaustedException
+
+        return self.select(scheme, pool, request, spider, skipped)
+
+    def unmatched_proxy(self, scheme: str, request: Request, spider: Spider):
+        """Wait or ignore the request by HTTPPROXY_PIPELINE_UNMATCHED, if none
+        of the proxies passes the pipeline."""
+        self.stats.inc_value('proxy/pipeline/unmatched', spider=spider)
+        if self.unmatched == 'wait':
+            raise ProxyThrottledException(self.wait_delay)
+        raise IgnoreRequest(
+            'No {} proxy passes the pipeline for {}'.format(scheme, request)
+        )
+
+    def process_request(self, request: Request, spider: Spider):
+        for hook in self.hooks['process_request']:
+            hook(request, spider)
+
+    def process_response(
+            self, request: Request, response: Response, spider: Spider
+    ):
+        for hook in self.hooks['process_response']:
+            hook(request, response, spider)
+
+    def process_exception(
+            self, request: Request, exception: Exception, spider: Spider
+    ):
+        for hook in self.hooks['process_exception']:
+            hook(request, exception, spider)
+
+
+class TagFilter(object):
+    """Keep the proxies with the tags in the field HTTPPROXY_TAG_META_KEY of
+    the meta of the request, see TagStrategy."""
+
+    def __init__(self, strategy: PipelineStrategy):
+        self.strategy: PipelineStrategy = strategy
+        self.key: str = strategy.settings.get('HTTPPROXY_TAG_META_KEY')
+
+    def __call__(
+            self, scheme: str, proxy: Tuple[bytes, str], request: Request
+    ) -> bool:
+        tags: Dict = request.meta.get(self.key) if request else None
+        if not tags:
+            return True
+
+        meta: Dict = self.strategy.get_proxy_meta(scheme, proxy)
+        for field, values in tags.items():
+            value = meta.get(field)
+            if not isinstance(value, (list, tuple, set)):
+                value = [value]
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            if not set(map(str, value)) & set(map(str, values)):
+                return False
+        return True
+
+
+class CooldownFilter(object):
+    """Reject the proxies for HTTPPROXY_PIPELINE_COOLDOWN seconds after an
+    exception through them."""
+
+    def __init__(self, strategy: PipelineStrategy):
+        self.strategy: PipelineStrategy = strategy
+        self.cooldown: float = strategy.settings.getfloat(
+            'HTTPPROXY_PIPELINE_COOLDOWN'
+        )
+        # (scheme, credential, proxy): the end of the cooldown
+        self.proxies_until: Dict[Tuple[str, bytes, str], float] = dict()
+
+    def __call__(
+            self, scheme: str, proxy: Tuple[bytes, str], request: Request
+    ) -> bool:
+        until: float = self.proxies_until.get((scheme, *proxy))
+        if until is None:
+            return True
+        if until > self.strategy.timer():
+            return False
+        del self.proxies_until[(scheme, *proxy)]
+        return True
+
+    def process_exception(
+            self, request: Request, exception: Exception, spider: Spider
+    ):
+        self.proxies_until[get_proxy_key(request)] = (
+            self.strategy.timer() + self.cooldown
+        )
+
+
+class RateLimitFilter(object):
+    """Reject the proxies without a token in their buckets, limited by the
+    fields HTTPPROXY_PROXY_RATE_FIELD and HTTPPROXY_PROXY_BURST_FIELD in their
+    meta, or HTTPPROXY_RATE_LIMIT_RATE and HTTPPROXY_RATE_LIMIT_BURST, see
+    RateLimitStrategy; a token is consumed when the proxy is assigned."""
+
+    def __init__(self, strategy: PipelineStrategy):
+        self.strategy: PipelineStrategy = strategy
+        self.proxies_bucket: Dict[Tuple[str, bytes, str], TokenBucket] = dict()
+
+    def __call__(
+            self, scheme: str, proxy: Tuple[bytes, str], request: Request
+    ) -> bool:
+        now: float = self.strategy.timer()
+        return self._get_bucket((scheme, *proxy), now).next_available(
+            now
+        ) <= now
+
+    def process_request(self, request: Request, spider: Spider):
+        now: float = self.strategy.timer()
+        self._get_bucket(get_proxy_key(request), now).consume(now)
+
+    def _get_bucket(
+            self, proxy: Tuple[str, bytes, str], now: float
+    ) -> TokenBucket:
+        try:
+            return self.proxies_bucket[proxy]
+        except KeyError:
+            pass
+
+        settings = self.strategy.settings
+        meta: Dict = self.strategy.get_proxy_meta(proxy[0], proxy[1:])
+        bucket = self.proxies_bucket[proxy] = TokenBucket(
+            meta.get(
+                settings.get('HTTPPROXY_PROXY_RATE_FIELD'),
+                settings.get('HTTPPROXY_RATE_LIMIT_RATE')
+            ),
+            max(float(meta.get(
+                settings.get('HTTPPROXY_PROXY_BURST_FIELD'),
+                settings.getfloat('HTTPPROXY_RATE_LIMIT_BURST')
+            )), 1.0),
+            now
+        )
+        return bucket
+
+
+class WeightScorer(object):
+    """Score the proxies by the field HTTPPROXY_PROXY_WEIGHT_FIELD in their
+    meta, or HTTPPROXY_PROXY_WEIGHT_DEFAULT, see WeightedStrategy."""
+
+    def __init__(self, strategy: PipelineStrategy):
+        self.strategy: PipelineStrategy = strategy
+        self.field: str = strategy.settings.get('HTTPPROXY_PROXY_WEIGHT_FIELD')
+        self.default: float = strategy.settings.getfloat(
+            'HTTPPROXY_PROXY_WEIGHT_DEFAULT'
+        )
+
+    def __call__(
+            self, scheme: str, proxy: Tuple[bytes, str], request: Request
+    ) -> float:
+        return float(self.strategy.get_proxy_meta(scheme, proxy).get(
+            self.field, self.default
+        ))
+
+
+def random_selector(
+        proxies: List[Tuple[bytes, str]], scores: List[float] = None
+) -> Tuple[bytes, str]:
+    return random.choice(proxies)
+
+
+def max_selector(
+        proxies: List[Tuple[bytes, str]], scores: List[float] = None
+) -> Tuple[bytes, str]:
+    if scores is None:
+        return proxies[0]
+    return proxies[max(range(len(proxies)), key=scores.__getitem__)]
+
+
+def weighted_selector(
+        proxies: List[Tuple[bytes, str]], scores: List[float] = None
+) -> Tuple[bytes, str]:
+    if scores is None or sum(scores) <= 0:
+        return random.choice(proxies)
+    return random.choices(proxies, weights=scores)[0]
@@ -0,0 +1,88 @@
+import logging
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.http import Request
+from scrapy.spiders import Spider
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..storages import BaseStorage
+from ..utils.deficit_round_robin import DeficitRoundRobin
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderStrategy(BasePoolStrategy):
+    """Rotate the proxies across the providers by their shares, with deficit
+    round robin, and then across the proxies of each provider.
+
+    The provider of a proxy is the field HTTPPROXY_PROXY_PROVIDER_FIELD in its
+    meta, and its share is in HTTPPROXY_PROVIDER_SHARES, or
+    HTTPPROXY_PROVIDER_SHARE_DEFAULT, so the requests are spread by the shares
+    of the providers instead of their numbers of proxies.
+
+    """
+
+    skips_proxies = True
+
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        self.shares: Dict[str, float] = dict(map(
+            lambda x: (x[0], float(x[1])),
+            self.settings.getdict('HTTPPROXY_PROVIDER_SHARES').items()
+        ))
+        self.share_default: float = self.settings.getfloat(
+            'HTTPPROXY_PROVIDER_SHARE_DEFAULT'
+        )
+        if any(map(lambda x: x <= 0, [*self.shares.values(),
+                                      self.share_default])):
+            raise ValueError('The shares of the providers must be positive')
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> DeficitRoundRobin:
+        pool = DeficitRoundRobin(self.shares, self.share_default)
+        for proxy in proxies:
+            self.add_proxy_to_pool(scheme, pool, proxy)
+        return pool
+
+    def add_proxy_to_pool(
+            self, scheme: str, pool: DeficitRoundRobin,
+            proxy: Tuple[bytes, str]
+    ):
+        pool.add(proxy, self.get_proxy_meta(scheme, proxy).get(
+            self.settings.get('HTTPPROXY_PROXY_PROVIDER_FIELD')
+        ))
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+
+    def add_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.add_proxy_to_pool(scheme, self.pools[scheme], proxy)
+
+    def select_proxy(
+            self, scheme: str, pool: DeficitRoundRobin, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        try:
+            if skipped is None:
+                proxy: Tuple[bytes, str] = next(pool)
+            else:
+                # the skipped proxies are not rotated, nor spend the credits
+                proxy = pool.next_matching(lambda x: not skipped(x))
+        except StopIteration as exc:
+            raise ProxyExhaustedException from exc
+        if proxy is None:
+            return None
+
+        self.stats.inc_value(
+            'proxy/provider/{}'.format(pool.groups[proxy]), spider=spider
+        )
+        return proxy
@@ -0,0 +1,182 @@
+import logging
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.http import Request
+from scrapy.spiders import Spider
+from scrapy.utils.httpobj import urlparse_cached
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..exceptions import ProxyThrottledException
+from ..storages import BaseStorage
+from ..utils.indexed_heap import IndexedMinHeap
+from ..utils.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitStrategy(BasePoolStrategy):
+    """Keep each proxy, and each proxy on each domain, under its rate limit
+    by token buckets, instead of a global DOWNLOAD_DELAY.
+
+    The proxies are kept in a min-heap by the time their next token is
+    available, so the proxies ready now are found at the top of the heap. A
+    ready proxy is skipped if its bucket of the domain of the request is
+    empty; if none of them could be provided, the request waits for the
+    earliest one by ProxyThrottledException. The proxies skipped for the
+    request are skipped before their tokens are consumed.
+
+    """
+
+    skips_proxies = True
+
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        self.timer = time.monotonic
+
+        self.rate_field: str = self.settings.get('HTTPPROXY_PROXY_RATE_FIELD')
+        self.burst_field: str = self.settings.get('HTTPPROXY_PROXY_BURST_FIELD')
+        self.domain_rate_field: str = self.settings.get(
+            'HTTPPROXY_PROXY_DOMAIN_RATE_FIELD'
+        )
+        self.domain_burst_field: str = self.settings.get(
+            'HTTPPROXY_PROXY_DOMAIN_BURST_FIELD'
+        )
+        self.candidates: int = self.settings.getint(
+            'HTTPPROXY_RATE_LIMIT_CANDIDATES'
+        )
+        self.domain_maxsize: int = self.settings.getint(
+            'HTTPPROXY_RATE_LIMIT_DOMAIN_MAXSIZE'
+        )
+
+        # (scheme, credential, proxy): bucket
+        self.proxies_bucket: Dict[Tuple[str, bytes, str], TokenBucket] = dict()
+        # ((scheme, credential, proxy), domain): bucket, the least recently
+        # used ones are dropped beyond the maxsize
+        self.domains_bucket: OrderedDict = OrderedDict()
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> IndexedMinHeap:
+        now: float = self.timer()
+        return IndexedMinHeap(map(
+            lambda x: (x, self._get_bucket(scheme, x).next_available(now)),
+            proxies
+        ))
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+
+    def add_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].push(
+            proxy, self._get_bucket(scheme, proxy).next_available(self.timer())
+        )
+
+    def _get_bucket(self, scheme: str, proxy: Tuple[bytes, str]) -> TokenBucket:
+        # the bucket of a removed proxy is kept, so it is not refilled at once
+        # when the proxy is put back
+        try:
+            return self.proxies_bucket[(scheme, *proxy)]
+        except KeyError:
+            pass
+
+        rate, burst = self._get_limit(
+            scheme, proxy, self.rate_field, self.burst_field,
+            'HTTPPROXY_RATE_LIMIT_RATE', 'HTTPPROXY_RATE_LIMIT_BURST'
+        )
+        bucket = self.proxies_bucket[(scheme, *proxy)] = TokenBucket(
+            rate, burst, self.timer()
+        )
+        return bucket
+
+    def select_proxy(
+            self, scheme: str, pool: IndexedMinHeap, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        if not pool:
+            raise ProxyExhaustedException
+
+        now: float = self.timer()
+        domain: str = urlparse_cached(request).hostname if request else None
+        # the earliest time a proxy could be provided, if none of the ready
+        # proxies could be provided for the domain now
+        available_at: float = pool.peek()[0]
+        if available_at <= now:
+            available_at = float('inf')
+
+        # the skipped proxies are not counted in the candidates
+        ready = pool.iter_until(now)
+        found: int = 0
+        if skipped is not None:
+            ready = filter(lambda x: not skipped(x[1]), ready)
+        for _, proxy in islice(ready, self.candidates):
+            found += 1
+            key: Tuple[str, bytes, str] = (scheme, *proxy)
+
+            domain_bucket: TokenBucket = self._get_domain_bucket(key, domain)
+            if domain_bucket is not None and not domain_bucket.consume(now):
+                available_at = min(
+                    available_at, domain_bucket.next_available(now)
+                )
+                continue
+
+            bucket: TokenBucket = self.proxies_bucket[key]
+            bucket.consume(now)
+            pool.update(proxy, bucket.next_available(now))
+            return proxy
+
+        if all((skipped is not None, not found,
+                available_at == float('inf'))):
+            # all the ready proxies are skipped
+            return None
+        self.stats.inc_value('proxy/rate_limit/throttled', spider=spider)
+        raise ProxyThrottledException(max(available_at - now, 0.0))
+
+    def _get_limit(
+            self, scheme: str, proxy: Tuple[bytes, str], rate_field: str,
+            burst_field: str, rate_setting: str, burst_setting: str
+    ) -> Tuple[float, float]:
+        meta: Dict = self.get_proxy_meta(scheme, proxy)
+        rate = meta.get(rate_field, self.settings.get(rate_setting))
+        burst = meta.get(burst_field, self.settings.get(burst_setting))
+        return (
+            float(rate) if rate is not None else None,
+            max(float(burst), 1.0)
+        )
+
+    def _get_domain_bucket(
+            self, proxy: Tuple[str, bytes, str], domain: str
+    ) -> TokenBucket:
+        if domain is None:
+            return None
+
+        try:
+            self.domains_bucket.move_to_end((proxy, domain))
+            return self.domains_bucket[(proxy, domain)]
+        except KeyError:
+            pass
+
+        rate, burst = self._get_limit(
+            proxy[0], proxy[1:], self.domain_rate_field,
+            self.domain_burst_field, 'HTTPPROXY_RATE_LIMIT_DOMAIN_RATE',
+            'HTTPPROXY_RATE_LIMIT_DOMAIN_BURST'
+        )
+        if rate is None:
+            return None
+
+        bucket = self.domains_bucket[(proxy, domain)] = TokenBucket(
+            rate, burst, self.timer()
+        )
+        if len(self.domains_bucket) > self.domain_maxsize:
+            self.domains_bucket.popitem(last=False)
+        return bucket
@@ -0,0 +1,61 @@
+import logging
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from scrapy.http import Request
+from scrapy.spiders import Spider
+from scrapy.utils.httpobj import urlparse_cached
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..utils.hash_ring import HashRing
+
+logger = logging.getLogger(__name__)
+
+
+class StickyStrategy(BasePoolStrategy):
+    """Stick the requests of the same session to the same proxy, by mapping
+    the session key onto a consistent-hash ring of the proxies.
+
+    The session key is the field HTTPPROXY_STICKY_SESSION_KEY in the meta of
+    the request, or the hostname of the request. When a proxy is invalidated,
+    only the sessions on it are moved to the other proxies.
+
+    """
+
+    skips_proxies = True
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> HashRing:
+        return HashRing(
+            proxies, self.settings.getint('HTTPPROXY_STICKY_REPLICAS')
+        )
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+
+    def add_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].add(proxy)
+
+    def select_proxy(
+            self, scheme: str, pool: HashRing, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        if not pool:
+            raise ProxyExhaustedException
+
+        if request is None:
+            return pool.choice()
+        key: str = str(
+            request.meta.get(self.settings.get('HTTPPROXY_STICKY_SESSION_KEY'))
+            or urlparse_cached(request).hostname
+        )
+        if skipped is None:
+            return pool.get(key)
+        # the session is moved to the next proxies on the ring, while its
+        # proxy is skipped for the request
+        return next(filter(lambda x: not skipped(x), pool.walk(key)), None)
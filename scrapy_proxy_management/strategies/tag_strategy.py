@@ -0,0 +1,75 @@
+import logging
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Request
+from scrapy.spiders import Spider
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..utils.tag_index import TagIndex
+
+logger = logging.getLogger(__name__)
+
+
+class TagStrategy(BasePoolStrategy):
+    """Provide the proxies with the tags asked by the request, e.g. the
+    country, the provider or the type of the proxy.
+
+    The tags of a proxy are the fields HTTPPROXY_PROXY_TAG_FIELDS in its meta,
+    indexed into a bitset of the proxies for each tag. The tags of a request
+    are the dict in the field HTTPPROXY_TAG_META_KEY of its meta, e.g.
+    ``{'country': 'de', 'type': ['residential', 'mobile']}``, and its proxy is
+    chosen randomly in the intersection of the bitsets of the tags.
+
+    """
+
+    skips_proxies = True
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> TagIndex:
+        pool = TagIndex(self.settings.getlist('HTTPPROXY_PROXY_TAG_FIELDS'))
+        for proxy in proxies:
+            pool.add(proxy, self.get_proxy_meta(scheme, proxy))
+        return pool
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+
+    def add_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].add(proxy, self.get_proxy_meta(scheme, proxy))
+
+    def select_proxy(
+            self, scheme: str, pool: TagIndex, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        if not pool.alive:
+            raise ProxyExhaustedException
+
+        tags: Dict = None
+        if request is not None:
+            tags = request.meta.get(self.settings.get('HTTPPROXY_TAG_META_KEY'))
+        bits: int = pool.match(tags)
+        if not bits:
+            self.stats.inc_value('proxy/tag/unmatched', spider=spider)
+            if self.settings.get('HTTPPROXY_TAG_UNMATCHED') != 'any':
+                raise IgnoreRequest(
+                    'No {} proxy has the tags {}'.format(scheme, tags)
+                )
+            logger.debug('No %s proxy has the tags %s', scheme, tags)
+            bits = pool.alive
+
+        if skipped is None:
+            return pool.choice(bits)
+        # the draws are taken lazily, until a proxy is not skipped
+        return next(filter(lambda x: not skipped(x), map(
+            lambda x: pool.choice(bits), range(max(
+                self.settings.getint('HTTPPROXY_BAN_MAX_TRIES'), 1
+            ))
+        )), None)
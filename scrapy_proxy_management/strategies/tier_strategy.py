@@ -0,0 +1,165 @@
+import logging
+from collections import OrderedDict
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from scrapy.crawler import Crawler
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.spiders import Spider
+from scrapy.utils.httpobj import urlparse_cached
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..storages import BaseStorage
+from ..utils import get_proxy_key
+from ..utils.rotation_ring import RotationRing
+
+logger = logging.getLogger(__name__)
+
+
+class TierStrategy(BasePoolStrategy):
+    """Rotate the proxies of the cheapest tier, and escalate a request to the
+    next tier when its proxy is invalidated, so only the hard targets use the
+    expensive proxies.
+
+    The tiers are HTTPPROXY_TIERS, from the cheapest to the most expensive,
+    and the tier of a proxy is the field HTTPPROXY_PROXY_TIER_FIELD in its
+    meta. The tier of a request is kept in the field HTTPPROXY_TIER_META_KEY
+    of its meta, which is shared by the recycled request, and with
+    HTTPPROXY_TIER_DOMAIN_MEMORY the tier escalated on a domain is remembered
+    for the following requests of the domain.
+
+    """
+
+    skips_proxies = True
+
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        self.tiers: List[str] = self.settings.getlist('HTTPPROXY_TIERS')
+        if not self.tiers:
+            raise ValueError('HTTPPROXY_TIERS must not be empty')
+        self.tier_field: str = self.settings.get('HTTPPROXY_PROXY_TIER_FIELD')
+        self.tier_key: str = self.settings.get('HTTPPROXY_TIER_META_KEY')
+
+        # domain: the index of the tier escalated on it, least recently used
+        # first
+        self.domains_tier: OrderedDict = (
+            OrderedDict()
+            if self.settings.getbool('HTTPPROXY_TIER_DOMAIN_MEMORY') else None
+        )
+        self.domains_maxsize: int = self.settings.getint(
+            'HTTPPROXY_TIER_DOMAIN_MAXSIZE'
+        )
+
+    def get_proxy_tier(self, scheme: str, proxy: Tuple[bytes, str]) -> int:
+        """Return the index of the tier of the proxy, the cheapest one if its
+        tier is not in HTTPPROXY_TIERS."""
+        tier = self.get_proxy_meta(scheme, proxy).get(self.tier_field)
+        return self.tiers.index(tier) if tier in self.tiers else 0
+
+    def get_request_tier(self, request: Request) -> int:
+        tier: Union[int, str] = request.meta.get(self.tier_key, 0)
+        if isinstance(tier, str):
+            tier = self.tiers.index(tier) if tier in self.tiers else 0
+
+        if self.domains_tier is not None:
+            domain: str = urlparse_cached(request).hostname
+            if domain in self.domains_tier:
+                self.domains_tier.move_to_end(domain)
+                tier = max(tier, self.domains_tier[domain])
+        return tier
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> List[RotationRing]:
+        pool: List[RotationRing] = list(map(
+            lambda x: RotationRing(), range(len(self.tiers))
+        ))
+        for proxy in proxies:
+            pool[self.get_proxy_tier(scheme, proxy)].add(proxy)
+        return pool
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme][self.get_proxy_tier(scheme, proxy)].discard(proxy)
+
+    def add_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme][self.get_proxy_tier(scheme, proxy)].add(proxy)
+
+    def select_proxy(
+            self, scheme: str, pool: List[RotationRing], spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        tier: int = 0 if request is None else self.get_request_tier(request)
+
+        # the tier of the request, or the next tiers, or the previous tiers if
+        # the expensive ones are exhausted
+        for i in [*range(tier, len(pool)), *range(tier - 1, -1, -1)]:
+            if pool[i]:
+                if skipped is None:
+                    return next(pool[i])
+                # the skipped proxies are not rotated, and the request stays on
+                # the tier
+                return pool[i].next_matching(lambda x: not skipped(x))
+        raise ProxyExhaustedException
+
+    def process_request(self, request: Request, spider: Spider):
+        self.stats.inc_value(
+            'proxy/tier/{}/requests'.format(self._get_tier_name(request)),
+            spider=spider
+        )
+
+    def process_response(
+            self, request: Request, response: Response, spider: Spider
+    ):
+        self.stats.inc_value(
+            'proxy/tier/{}/bytes'.format(self._get_tier_name(request)),
+            len(response.body), spider=spider
+        )
+
+    def invalidate_proxy(
+            self, request: Request = None, response: Response = None,
+            exception: Exception = None, spider: Spider = None, **kwargs
+    ):
+        req = request if request else response.request
+        self.stats.inc_value(
+            'proxy/tier/{}/blocked'.format(self._get_tier_name(req)),
+            spider=spider
+        )
+
+        # escalate from the tier of the proxy, which could be higher than the
+        # tier of the request when the cheaper tiers are exhausted
+        proxy: Tuple[str, bytes, str] = get_proxy_key(req)
+        tier: int = max(
+            self.get_request_tier(req),
+            self.get_proxy_tier(proxy[0], proxy[1:])
+        )
+        if tier + 1 < len(self.tiers):
+            req.meta[self.tier_key] = tier + 1
+            self.stats.inc_value('proxy/tier/escalated', spider=spider)
+            logger.debug(
+                'Request %s is escalated to the tier %s',
+                req, self.tiers[tier + 1]
+            )
+            if self.domains_tier is not None:
+                self._remember_tier(urlparse_cached(req).hostname, tier + 1)
+
+        super().invalidate_proxy(
+            request=request, response=response, exception=exception,
+            spider=spider, **kwargs
+        )
+
+    def _remember_tier(self, domain: str, tier: int):
+        self.domains_tier[domain] = max(tier, self.domains_tier.get(domain, 0))
+        self.domains_tier.move_to_end(domain)
+        while len(self.domains_tier) > self.domains_maxsize:
+            self.domains_tier.popitem(last=False)
+
+    def _get_tier_name(self, request: Request) -> str:
+        proxy: Tuple[str, bytes, str] = get_proxy_key(request)
+        return self.tiers[self.get_proxy_tier(proxy[0], proxy[1:])]
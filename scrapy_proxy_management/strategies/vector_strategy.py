@@ -0,0 +1,184 @@
+import logging
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from scrapy.crawler import Crawler
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.spiders import Spider
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..exceptions import ProxyThrottledException
+from ..storages import BaseStorage
+from ..utils import get_proxy_key
+from ..utils.vector_pool import VectorPool
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStrategy(BasePoolStrategy):
+    """Provide the proxies randomly by their health, scored by vectorized
+    NumPy expressions over the whole pool, for the pools of millions of
+    proxies.
+
+    The health of each proxy (the EWMA of the latency and the success rate,
+    the time of the last use and of the end of the cooldown after an
+    exception) is kept in NumPy arrays, and the weights of all the proxies are
+    recomputed every HTTPPROXY_VECTOR_RESCORE_EVENTS outcomes or
+    HTTPPROXY_VECTOR_RESCORE_INTERVAL seconds. The proxies are sampled from
+    the cumulative weights in batches of HTTPPROXY_VECTOR_BATCH, and a sampled
+    proxy removed or cooling down since the last rescore is skipped, and so is
+    a sampled proxy skipped for the request, before it is used.
+
+    """
+
+    skips_proxies = True
+
+    def __init__(self, crawler: Crawler, mw, storage: BaseStorage):
+        super().__init__(crawler, mw, storage)
+
+        self.alpha: float = self.settings.getfloat(
+            'HTTPPROXY_VECTOR_EWMA_ALPHA'
+        )
+        self.rescore_events: int = self.settings.getint(
+            'HTTPPROXY_VECTOR_RESCORE_EVENTS'
+        )
+        self.rescore_interval: float = self.settings.getfloat(
+            'HTTPPROXY_VECTOR_RESCORE_INTERVAL'
+        )
+        self.batch: int = self.settings.getint('HTTPPROXY_VECTOR_BATCH')
+        self.cooldown: float = self.settings.getfloat(
+            'HTTPPROXY_VECTOR_COOLDOWN'
+        )
+        self.reuse_interval: float = self.settings.getfloat(
+            'HTTPPROXY_VECTOR_REUSE_INTERVAL'
+        )
+        self.error_status_codes = set(map(int, self.settings.getlist(
+            'HTTPPROXY_PROXY_INVALIDATED_STATUS_CODES'
+        )))
+        self.timer: Callable[[], float] = time.monotonic
+
+        # scheme: the sampled proxies not provided yet
+        self.picks: Dict[str, List[Tuple[bytes, str]]] = dict()
+        # scheme: [the outcomes since the last rescore, the time of it]
+        self.rescores: Dict[str, List[float]] = dict()
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> VectorPool:
+        pool = VectorPool(proxies, self.alpha, self.reuse_interval)
+        self._rescore(scheme, pool)
+        return pool
+
+    def build_pools(
+            self, proxies: Dict[str, Union[str, List[Tuple[bytes, str]]]]
+    ):
+        # the pools are updated in place on reload, so the health of the
+        # proxies reloaded again is kept
+        pools: Dict[str, VectorPool] = self.pools
+        self.pools = dict()
+        for scheme, proxies_ in proxies.items():
+            if scheme == 'no':
+                continue
+            if isinstance(proxies_, tuple):
+                proxies_ = [proxies_]
+            pool: VectorPool = pools.get(scheme)
+            if pool is None:
+                self.pools[scheme] = self.build_pool(scheme, proxies_)
+                continue
+            pool.update(proxies_)
+            self._rescore(scheme, pool)
+            self.pools[scheme] = pool
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+
+    def add_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].add(proxy)
+        # rescored on the next selection
+        self.rescores[scheme][0] = self.rescore_events
+
+    def select_proxy(
+            self, scheme: str, pool: VectorPool, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        if not len(pool):
+            raise ProxyExhaustedException
+
+        now: float = self.timer()
+        events, rescored_at = self.rescores[scheme]
+        if any((events >= self.rescore_events,
+                now - rescored_at >= self.rescore_interval)):
+            self._rescore(scheme, pool)
+            self.stats.inc_value('proxy/vector/rescored', spider=spider)
+
+        # rescore once, if all the picks are stale
+        skips: int = 0
+        for i in range(2):
+            picks: List[Tuple[bytes, str]] = self.picks[scheme]
+            while True:
+                if not picks:
+                    try:
+                        picks.extend(pool.sample(self.batch))
+                    except IndexError:
+                        break
+                proxy: Tuple[bytes, str] = picks.pop()
+                if not pool.is_ready(proxy, now):
+                    self.stats.inc_value('proxy/vector/stale', spider=spider)
+                elif skipped is not None and skipped(proxy):
+                    skips += 1
+                else:
+                    pool.use(proxy, now)
+                    return proxy
+                if not picks:
+                    break
+            if i == 0:
+                self._rescore(scheme, pool)
+
+        if skips:
+            # the ready proxies sampled are all skipped
+            return None
+        # all the proxies are cooling down
+        raise ProxyThrottledException(max(pool.next_ready() - now, 0.0))
+
+    def process_response(
+            self, request: Request, response: Response, spider: Spider
+    ):
+        self._record(
+            get_proxy_key(request),
+            response.status not in self.error_status_codes,
+            request.meta.get('download_latency')
+        )
+
+    def process_exception(
+            self, request: Request, exception: Exception, spider: Spider
+    ):
+        proxy: Tuple[str, bytes, str] = get_proxy_key(request)
+        self._record(proxy, False)
+        if self.cooldown > 0 and proxy[0] in self.pools:
+            self.pools[proxy[0]].cooldown(
+                proxy[1:], self.timer() + self.cooldown
+            )
+
+    def _record(
+            self, proxy: Tuple[str, bytes, str], success: bool,
+            latency: float = None
+    ):
+        pool: VectorPool = self.pools.get(proxy[0])
+        if pool is None:
+            return
+        pool.record(proxy[1:], success, latency)
+        self.rescores[proxy[0]][0] += 1
+
+    def _rescore(self, scheme: str, pool: VectorPool):
+        now: float = self.timer()
+        pool.rescore(now)
+        self.picks[scheme] = list()
+        self.rescores[scheme] = [0, now]
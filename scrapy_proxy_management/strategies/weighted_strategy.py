@@ -0,0 +1,60 @@
+import logging
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from scrapy.http import Request
+from scrapy.spiders import Spider
+
+from . import BasePoolStrategy
+from ..exceptions import ProxyExhaustedException
+from ..utils.alias_table import AliasTable
+
+logger = logging.getLogger(__name__)
+
+
+class WeightedStrategy(BasePoolStrategy):
+    """Provide the proxies randomly by weight, in O(1) with an alias table.
+
+    The weight of a proxy is the field HTTPPROXY_PROXY_WEIGHT_FIELD in its
+    meta, or HTTPPROXY_PROXY_WEIGHT_DEFAULT.
+
+    """
+
+    skips_proxies = True
+
+    def build_pool(
+            self, scheme: str, proxies: List[Tuple[bytes, str]]
+    ) -> AliasTable:
+        weight_field: str = self.settings.get('HTTPPROXY_PROXY_WEIGHT_FIELD')
+        weight_default: float = self.settings.getfloat(
+            'HTTPPROXY_PROXY_WEIGHT_DEFAULT'
+        )
+
+        return AliasTable(proxies, map(
+            lambda x: float(self.get_proxy_meta(scheme, x).get(
+                weight_field, weight_default
+            )),
+            proxies
+        ))
+
+    def remove_proxy(self, scheme: str, proxy: Tuple[bytes, str]):
+        self.pools[scheme].discard(proxy)
+
+    def select_proxy(
+            self, scheme: str, pool: AliasTable, spider: Spider,
+            request: Request = None,
+            skipped: Callable[[Tuple[bytes, str]], bool] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        try:
+            if skipped is None:
+                return pool.sample()
+            # the draws are taken lazily, until a proxy is not skipped
+            return next(filter(lambda x: not skipped(x), map(
+                lambda x: pool.sample(), range(max(
+                    self.settings.getint('HTTPPROXY_BAN_MAX_TRIES'), 1
+                ))
+            )), None)
+        except IndexError as exc:
+            raise ProxyExhaustedException from exc
@@ -1,8 +1,12 @@
 import base64
+import logging
+import re
+import zlib
 from contextlib import contextmanager
 from copy import copy
 from typing import Any
 from typing import Generator
+from typing import Optional
 from typing import Tuple
 from urllib.parse import unquote
 from urllib.parse import urlunparse
@@ -12,9 +16,14 @@ from scrapy.http import Request
 from scrapy.http import Response
 from scrapy.settings import Settings
 from scrapy.spiders import Spider
+from scrapy.utils.httpobj import urlparse_cached
 
 from .inspect_google_recaptcha import inspect_google_recaptcha
 
+logger = logging.getLogger(__name__)
+
+pattern_credential = re.compile(rb'^Basic\s(?P<credential>.*)')
+
 
 @contextmanager
 def unfreeze_settings(settings: Settings):
@@ -26,6 +35,15 @@ def unfreeze_settings(settings: Settings):
         settings.frozen = original_status
 
 
+def get_optional_float(settings: Settings, name: str) -> Optional[float]:
+    """Return the setting as a float, e.g. a ttl set as a string from the
+    command line, or None if it is not set."""
+    value = settings.get(name)
+    if value is None or value == '' or value == 'None':
+        return None
+    return settings.getfloat(name)
+
+
 def basic_auth_header(
         username: str, password: str, auth_encoding: str
 ) -> bytes:
@@ -47,6 +65,32 @@ def get_proxy(auth_encoding, url: str, orig_type: str) -> Tuple[bytes, str]:
     return credentials, proxy_url
 
 
+def get_proxy_key(request: Request) -> Tuple[str, bytes, str]:
+    """Return the proxy assigned to the request, as (scheme, credential,
+    proxy), the same as the invalidated proxies in the storage."""
+    scheme: str = urlparse_cached(request).scheme
+    if 'Proxy-Authorization' in request.headers:
+        credential: bytes = pattern_credential.match(
+            request.headers['Proxy-Authorization']
+        ).group('credential')
+    else:
+        credential = None
+    proxy: str = request.meta['proxy']
+
+    return scheme, credential, proxy
+
+
+def get_proxy_hash(proxy: Tuple[str, bytes, str]) -> int:
+    """Return the CRC32 of the proxy, as (scheme, credential, proxy), which
+    is stable across the processes, unlike the proxy ids of the storage, so it
+    still refers to the proxy in the meta of a request resumed from JOBDIR; a
+    collision only skips another proxy for the request."""
+    scheme, credential, url = proxy
+    return zlib.crc32(b' '.join((
+        scheme.encode(), credential or b'', url.encode()
+    )))
+
+
 def inspect_block(
         block_inspector_mw,
         request: Request = None,
@@ -80,9 +124,23 @@ def _inspect_block(
 
 def recycle_request(
         block_inspector_mw, request: Request, spider: Spider
-) -> Request:
+) -> Optional[Request]:
+    """Return a copy of the request without its proxy, to be downloaded again,
+    or None to drop it when it is recycled HTTPPROXY_RECYCLE_TIMES times."""
+    times: int = request.meta.get('proxy_recycle_times', 0)
+    max_times: int = block_inspector_mw.settings.getint(
+        'HTTPPROXY_RECYCLE_TIMES'
+    )
+    if max_times and times >= max_times:
+        logger.debug('Gave up recycling %s (recycled %d times)', request, times)
+        block_inspector_mw.stats.inc_value(
+            'block_inspector/recycle/exhausted', spider=spider
+        )
+        return None
+
     # req = deepcopy(request)
     req = copy(request)
+    req.meta['proxy_recycle_times'] = times + 1
     try:
         req.meta.pop('proxy')
     except KeyError as exc:
@@ -0,0 +1,97 @@
+import random
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import List
+
+
+class AliasTable(object):
+    """Sample the items by weight in O(1) with the alias method (Vose).
+
+    A discarded item is only marked, and rejected when it is sampled; the
+    table is rebuilt without the discarded items once they carry half of the
+    weight, so the expected number of tries of a sample is at most two.
+
+    """
+
+    def __init__(
+            self, items: Iterable[Hashable], weights: Iterable[float],
+            random_: Callable[[], float] = random.random
+    ):
+        self.random: Callable[[], float] = random_
+
+        self.items: List[Hashable] = list()
+        self.weights: List[float] = list()
+        for item, weight in zip(items, weights):
+            if weight > 0:
+                self.items.append(item)
+                self.weights.append(float(weight))
+
+        self._build()
+
+    def _build(self):
+        self.index: Dict[Hashable, int] = {
+            item: i for i, item in enumerate(self.items)
+        }
+        self.removed: List[bool] = [False] * len(self.items)
+        self.total_weight: float = sum(self.weights)
+        self.removed_weight: float = 0.0
+        self.removed_count: int = 0
+
+        size: int = len(self.items)
+        self.prob: List[float] = [1.0] * size
+        self.alias: List[int] = list(range(size))
+        if not size:
+            return
+
+        scaled: List[float] = [
+            weight * size / self.total_weight for weight in self.weights
+        ]
+        small: List[int] = [i for i, p in enumerate(scaled) if p < 1.0]
+        large: List[int] = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def _compact(self):
+        alive: List[int] = [
+            i for i, removed in enumerate(self.removed) if not removed
+        ]
+        self.items = [self.items[i] for i in alive]
+        self.weights = [self.weights[i] for i in alive]
+        self._build()
+
+    def sample(self) -> Hashable:
+        if not len(self):
+            raise IndexError('sample from an empty alias table')
+
+        size: int = len(self.items)
+        while True:
+            u: float = self.random() * size
+            i: int = int(u)
+            pick: int = i if u - i < self.prob[i] else self.alias[i]
+            if not self.removed[pick]:
+                return self.items[pick]
+
+    def discard(self, item: Hashable):
+        i: int = self.index.get(item)
+        if i is None or self.removed[i]:
+            return
+
+        self.removed[i] = True
+        self.removed_weight += self.weights[i]
+        self.removed_count += 1
+        if self.removed_weight * 2 >= self.total_weight:
+            self._compact()
+
+    def __contains__(self, item: Hashable) -> bool:
+        i: int = self.index.get(item)
+        return i is not None and not self.removed[i]
+
+    def __len__(self) -> int:
+        return len(self.items) - self.removed_count
@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+from typing import Callable
+from typing import Dict
+from typing import Optional
+
+
+class BanMatrix(object):
+    """A sparse matrix of the bans of (proxy id, domain), kept as a dict of
+    the banned proxy ids for each domain, so a ban is checked in O(1).
+
+    Each ban expires after the ttl, the bans of a domain are kept in the order
+    of their expiry to be cleared from the front, and the least recently
+    banned domains are evicted beyond the maxsize.
+
+    """
+
+    def __init__(
+            self, maxsize: int = None, ttl: float = None,
+            timer: Callable[[], float] = time.monotonic
+    ):
+        self.maxsize: Optional[int] = maxsize
+        self.ttl: Optional[float] = ttl
+        self.timer: Callable[[], float] = timer
+
+        # domain: {proxy id: expire_at} in the order of expire_at
+        self._data: OrderedDict = OrderedDict()
+
+    def ban(self, domain: str, proxy_id: int):
+        expiries: Dict[int, Optional[float]] = self._get(domain)
+        if expiries is None:
+            expiries = self._data[domain] = dict()
+        else:
+            self._data.move_to_end(domain)
+
+        # moved to the end, as it is the latest ban
+        expiries.pop(proxy_id, None)
+        expiries[proxy_id] = self.timer() + self.ttl if self.ttl else None
+
+        if self.maxsize:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def is_banned(self, domain: str, proxy_id: int) -> bool:
+        expiries: Dict[int, Optional[float]] = self._get(domain)
+        return expiries is not None and proxy_id in expiries
+
+    def count(self, domain: str) -> int:
+        """Return the number of the proxies banned on the domain."""
+        expiries: Dict[int, Optional[float]] = self._get(domain)
+        return len(expiries) if expiries is not None else 0
+
+    def expire_in(self, domain: str) -> Optional[float]:
+        """Return the seconds before the earliest ban of the domain
+        expires."""
+        expiries: Dict[int, Optional[float]] = self._get(domain)
+        if expiries is None or self.ttl is None:
+            return None
+        return max(next(iter(expiries.values())) - self.timer(), 0.0)
+
+    def _get(self, domain: str) -> Optional[Dict[int, Optional[float]]]:
+        expiries: Dict[int, Optional[float]] = self._data.get(domain)
+        if expiries is None or self.ttl is None:
+            return expiries
+
+        now: float = self.timer()
+        while expiries:
+            proxy_id, expire_at = next(iter(expiries.items()))
+            if expire_at > now:
+                return expiries
+            del expiries[proxy_id]
+
+        del self._data[domain]
+        return None
+
+    def __contains__(self, domain: str) -> bool:
+        return self._get(domain) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,79 @@
+from collections import deque
+from typing import Deque
+from typing import Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker(object):
+    """The circuit breaker of a proxy.
+
+    It is closed at first, and opened once the ratio of the failures in the
+    sliding window of the latest outcomes reaches the failure ratio. After a
+    cooldown (kept by the caller) it is half-opened, allowing a limited number
+    of trials: it is closed if all of them succeed, or opened again on any
+    failure.
+
+    """
+
+    __slots__ = (
+        'state', 'outcomes', 'failures', 'min_requests', 'failure_ratio',
+        'trials', 'trials_left', 'trials_succeeded'
+    )
+
+    def __init__(
+            self, window: int, min_requests: int, failure_ratio: float,
+            trials: int
+    ):
+        self.state: str = CLOSED
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.failures: int = 0
+        self.min_requests: int = min_requests
+        self.failure_ratio: float = failure_ratio
+        self.trials: int = max(trials, 1)
+        self.trials_left: int = 0
+        self.trials_succeeded: int = 0
+
+    def allow(self) -> bool:
+        """Return if a request is allowed, counting the trials when it is
+        half-opened."""
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self.trials_left > 0:
+            self.trials_left -= 1
+            return True
+        return False
+
+    def half_open(self):
+        self.state = HALF_OPEN
+        self.trials_left = self.trials
+        self.trials_succeeded = 0
+
+    def record(self, success: bool) -> Optional[str]:
+        """Record the outcome of a request, and return the new state if it is
+        changed."""
+        if self.state == CLOSED:
+            if len(self.outcomes) == self.outcomes.maxlen:
+                self.failures -= not self.outcomes[0]
+            self.outcomes.append(success)
+            self.failures += not success
+
+            if all((
+                    len(self.outcomes) >= self.min_requests,
+                    self.failures >= self.failure_ratio * len(self.outcomes)
+            )):
+                return self._transit(OPEN)
+        elif self.state == HALF_OPEN:
+            if not success:
+                return self._transit(OPEN)
+            self.trials_succeeded += 1
+            if self.trials_succeeded >= self.trials:
+                return self._transit(CLOSED)
+
+    def _transit(self, state: str) -> str:
+        self.state = state
+        self.outcomes.clear()
+        self.failures = 0
+        return state
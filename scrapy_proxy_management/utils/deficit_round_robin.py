@@ -0,0 +1,115 @@
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Optional
+from typing import Set
+
+from .rotation_ring import RotationRing
+
+
+class DeficitRoundRobin(object):
+    """Provide the items of several groups one by one endlessly, rotating
+    across the groups by their quanta with deficit round robin, and across
+    the items within a group with a rotation ring.
+
+    On its turn a group is credited its quantum, and provides an item for
+    each whole credit it has; the fraction is carried to its next turn, so a
+    group of quantum 2.5 provides 5 items every 2 rounds, whatever the number
+    of its items. A group without items is skipped and its credit is reset.
+
+    """
+
+    def __init__(self, quanta: Dict[Hashable, float] = None,
+                 default_quantum: float = 1.0):
+        self.quanta: Dict[Hashable, float] = dict(quanta or {})
+        self.default_quantum: float = default_quantum
+
+        self.rings: Dict[Hashable, RotationRing] = dict()
+        self.groups: Dict[Hashable, Hashable] = dict()
+        self.deficits: Dict[Hashable, float] = dict()
+        self.active: RotationRing = RotationRing()
+        self.current: Optional[Hashable] = None
+
+    def add(self, item: Hashable, group: Hashable = None):
+        if item in self.groups:
+            return
+
+        self.groups[item] = group
+        ring: RotationRing = self.rings.get(group)
+        if ring is None:
+            ring = self.rings[group] = RotationRing()
+        ring.add(item)
+        if group not in self.active:
+            self.active.add(group)
+            self.deficits[group] = 0.0
+
+    def discard(self, item: Hashable):
+        if item not in self.groups:
+            return
+
+        group: Hashable = self.groups.pop(item)
+        ring: RotationRing = self.rings[group]
+        ring.discard(item)
+        if not ring:
+            self.active.discard(group)
+            self.deficits[group] = 0.0
+            if self.current == group:
+                self.current = None
+
+    def __next__(self) -> Hashable:
+        if not self.active:
+            raise StopIteration
+
+        while True:
+            if self.current is None:
+                self.current = next(self.active)
+                self.deficits[self.current] += self.quanta.get(
+                    self.current, self.default_quantum
+                )
+            if self.deficits[self.current] >= 1:
+                self.deficits[self.current] -= 1
+                return next(self.rings[self.current])
+            self.current = None
+
+    def next_matching(
+            self, predicate: Callable[[Hashable], bool]
+    ) -> Optional[Hashable]:
+        """Return the next item for which the predicate is true, as __next__,
+        or None if there is none; a group without such item is passed over on
+        its turn, keeping its credit, and its ring is not rotated."""
+        if not self.active:
+            raise StopIteration
+
+        passed: Set[Hashable] = set()
+        while len(passed) < len(self.active):
+            if self.current is None:
+                self.current = next(self.active)
+                if self.current in passed:
+                    self.current = None
+                    continue
+                quantum: float = self.quanta.get(
+                    self.current, self.default_quantum
+                )
+                self.deficits[self.current] += quantum
+                if quantum <= 0 and self.deficits[self.current] < 1:
+                    # never credited enough to provide an item
+                    passed.add(self.current)
+            if self.deficits[self.current] >= 1:
+                item: Optional[Hashable] = self.rings[
+                    self.current
+                ].next_matching(predicate)
+                if item is not None:
+                    self.deficits[self.current] -= 1
+                    return item
+                passed.add(self.current)
+            self.current = None
+        return None
+
+    def __iter__(self) -> 'DeficitRoundRobin':
+        return self
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.groups
+
+    def __len__(self) -> int:
+        return len(self.groups)
@@ -0,0 +1,178 @@
+import math
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Callable
+from typing import Hashable
+from typing import Iterator
+from typing import Optional
+
+
+class ExpiringSet(object):
+    """A set bounded in size, whose members could expire after a while.
+
+    The members are kept in insertion order, so when the set is full the
+    oldest member is evicted, and the expired members at the head are purged
+    when a new member is added.
+
+    """
+
+    def __init__(
+            self, maxsize: int = None, ttl: float = None,
+            timer: Callable[[], float] = time.monotonic
+    ):
+        self.maxsize: Optional[int] = maxsize
+        self.ttl: Optional[float] = ttl
+        self.timer: Callable[[], float] = timer
+
+        self._data: OrderedDict = OrderedDict()
+
+    def add(self, item: Hashable, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        now = self.timer()
+
+        if item in self._data:
+            self._data.move_to_end(item)
+        self._data[item] = now + ttl if ttl else None
+
+        self._purge_head(now)
+        if self.maxsize:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, item: Hashable):
+        self._data.pop(item, None)
+
+    def purge(self):
+        now = self.timer()
+        for item, expire_at in list(self._data.items()):
+            if expire_at is not None and expire_at <= now:
+                del self._data[item]
+
+    def clear(self):
+        self._data.clear()
+
+    def _purge_head(self, now: float):
+        while self._data:
+            item, expire_at = next(iter(self._data.items()))
+            if expire_at is None or expire_at > now:
+                break
+            del self._data[item]
+
+    def __contains__(self, item: Hashable) -> bool:
+        try:
+            expire_at = self._data[item]
+        except KeyError:
+            return False
+
+        if expire_at is not None and expire_at <= self.timer():
+            del self._data[item]
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[Hashable]:
+        now = self.timer()
+        for item, expire_at in list(self._data.items()):
+            if expire_at is None or expire_at > now:
+                yield item
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class BloomFilter(object):
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+
+        self.num_bits: int = max(1, int(math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        )))
+        self.num_hashes: int = max(1, int(round(
+            self.num_bits / capacity * math.log(2)
+        )))
+
+        self.bits: bytearray = bytearray((self.num_bits + 7) // 8)
+        self.count: int = 0
+
+    def _indexes(self, item: Hashable) -> Iterator[int]:
+        digest = blake2b(repr(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: Hashable):
+        for index in self._indexes(item):
+            self.bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def __contains__(self, item: Hashable) -> bool:
+        return all(map(
+            lambda x: self.bits[x >> 3] & (1 << (x & 7)),
+            self._indexes(item)
+        ))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class ExpiringBloomFilter(object):
+    """A Bloom filter of two generations, which keeps the memory flat.
+
+    The current generation is rotated to the previous one when it is full or
+    older than the ttl, so a member is forgotten after one to two ttl. The ttl
+    applies per generation, not per member.
+
+    """
+
+    def __init__(
+            self, capacity: int, error_rate: float, ttl: float = None,
+            timer: Callable[[], float] = time.monotonic
+    ):
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+        self.ttl: Optional[float] = ttl
+        self.timer: Callable[[], float] = timer
+
+        self._current: BloomFilter = BloomFilter(capacity, error_rate)
+        self._previous: BloomFilter = BloomFilter(capacity, error_rate)
+        self._rotated_at: float = self.timer()
+
+    def _rotate(self):
+        now = self.timer()
+        if self.ttl and now - self._rotated_at >= 2 * self.ttl:
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._previous = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = now
+        elif any((
+                len(self._current) >= self.capacity,
+                self.ttl and now - self._rotated_at >= self.ttl
+        )):
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = now
+
+    def add(self, item: Hashable, ttl: float = None):
+        self._rotate()
+        if item not in self._current:
+            self._current.add(item)
+
+    def discard(self, item: Hashable):
+        # a member can not be removed from a bloom filter, it just expires
+        pass
+
+    def purge(self):
+        self._rotate()
+
+    def clear(self):
+        self._current = BloomFilter(self.capacity, self.error_rate)
+        self._previous = BloomFilter(self.capacity, self.error_rate)
+        self._rotated_at = self.timer()
+
+    def __contains__(self, item: Hashable) -> bool:
+        self._rotate()
+        return item in self._current or item in self._previous
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
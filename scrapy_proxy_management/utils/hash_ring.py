@@ -0,0 +1,86 @@
+import hashlib
+import random
+from bisect import bisect
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Set
+
+
+def hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing(object):
+    """A consistent-hash ring of items, each one placed on the ring as a number
+    of virtual nodes, so a key is mapped to the first node clockwise in
+    O(log n) and only the keys of a removed item are moved.
+
+    A removed item is only marked as dead, and its nodes are skipped by the
+    lookups; the ring is rebuilt once more than half of the items are dead.
+
+    """
+
+    def __init__(self, items: Iterable[Hashable] = (), replicas: int = 100):
+        self.replicas: int = replicas
+        self.alive: Dict[Hashable, None] = dict.fromkeys(items)
+        self.dead: Set[Hashable] = set()
+        self.hashes: List[int] = list()
+        self.nodes: List[Hashable] = list()
+
+        self.rebuild()
+
+    def rebuild(self):
+        self.dead.clear()
+        ring = sorted(
+            (hash_key('{!r}-{}'.format(item, i)), item)
+            for item in self.alive
+            for i in range(self.replicas)
+        )
+        self.hashes = list(map(lambda x: x[0], ring))
+        self.nodes = list(map(lambda x: x[1], ring))
+
+    def add(self, item: Hashable):
+        if item in self.alive:
+            return
+        self.alive[item] = None
+        if item in self.dead:
+            self.dead.discard(item)
+        else:
+            self.rebuild()
+
+    def discard(self, item: Hashable):
+        if item not in self.alive:
+            return
+        del self.alive[item]
+        self.dead.add(item)
+        if len(self.dead) > len(self.alive):
+            self.rebuild()
+
+    def get(self, key: str) -> Hashable:
+        if not self.alive:
+            raise IndexError('get from an empty ring')
+
+        return next(self.walk(key))
+
+    def walk(self, key: str) -> Iterator[Hashable]:
+        """Iterate the alive items clockwise from the key, each one once, so
+        the key is moved to the next items if its item is not taken."""
+        seen: Set[Hashable] = set()
+        i: int = bisect(self.hashes, hash_key(key))
+        for j in range(len(self.nodes)):
+            node: Hashable = self.nodes[(i + j) % len(self.nodes)]
+            if node not in self.dead and node not in seen:
+                seen.add(node)
+                yield node
+
+    def choice(self) -> Hashable:
+        return self.get(str(random.random()))
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.alive
+
+    def __len__(self) -> int:
+        return len(self.alive)
@@ -0,0 +1,121 @@
+import heapq
+from collections import deque
+from typing import Deque
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+
+class IndexedMinHeap(object):
+    """A binary min-heap of items by priority, with the position of each item
+    indexed, so the priority of an item could be changed, or an item could be
+    removed, in O(log n)."""
+
+    def __init__(self, items: Iterable[Tuple[Hashable, float]] = ()):
+        self.heap: List[List] = list()
+        self.index: Dict[Hashable, int] = dict()
+
+        for item, priority in items:
+            self.push(item, priority)
+
+    def push(self, item: Hashable, priority: float):
+        if item in self.index:
+            self.update(item, priority)
+            return
+
+        self.index[item] = len(self.heap)
+        self.heap.append([priority, item])
+        self._sift_up(len(self.heap) - 1)
+
+    def update(self, item: Hashable, priority: float):
+        i: int = self.index[item]
+        old: float = self.heap[i][0]
+        self.heap[i][0] = priority
+        if priority < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def discard(self, item: Hashable):
+        i: int = self.index.pop(item, None)
+        if i is None:
+            return
+
+        last: List = self.heap.pop()
+        if i < len(self.heap):
+            self.heap[i] = last
+            self.index[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self.index[last[1]])
+
+    def peek(self) -> Tuple[float, Hashable]:
+        if not self.heap:
+            raise IndexError('peek from an empty heap')
+        return tuple(self.heap[0])
+
+    def priority(self, item: Hashable) -> float:
+        return self.heap[self.index[item]][0]
+
+    def iter_until(self, priority: float) -> Iterator[Tuple[float, Hashable]]:
+        """Iterate the items with a priority not greater than the given one,
+        only visiting the subtrees of the heap they are in, by breadth first.
+        The heap should not be changed during the iteration."""
+        queue: Deque[int] = deque([0] if self.heap else [])
+        while queue:
+            i: int = queue.popleft()
+            if self.heap[i][0] > priority:
+                continue
+            yield tuple(self.heap[i])
+            queue.extend(filter(
+                lambda x: x < len(self.heap), (2 * i + 1, 2 * i + 2)
+            ))
+
+    def iter_sorted(self) -> Iterator[Tuple[float, Hashable]]:
+        """Iterate the items by priority, with a heap of the children of the
+        visited nodes, so the first k items are visited in O(k log k).
+        The heap should not be changed during the iteration."""
+        frontier: List[Tuple[float, int]] = (
+            [(self.heap[0][0], 0)] if self.heap else []
+        )
+        while frontier:
+            _, i = heapq.heappop(frontier)
+            yield tuple(self.heap[i])
+            for j in filter(
+                    lambda x: x < len(self.heap), (2 * i + 1, 2 * i + 2)
+            ):
+                heapq.heappush(frontier, (self.heap[j][0], j))
+
+    def _swap(self, i: int, j: int):
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.index[self.heap[i][1]] = i
+        self.index[self.heap[j][1]] = j
+
+    def _sift_up(self, i: int):
+        while i:
+            parent: int = (i - 1) // 2
+            if self.heap[i][0] >= self.heap[parent][0]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int):
+        size: int = len(self.heap)
+        while True:
+            smallest: int = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if (child < size
+                        and self.heap[child][0] < self.heap[smallest][0]):
+                    smallest = child
+            if smallest == i:
+                break
+            self._swap(i, smallest)
+            i = smallest
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.index
+
+    def __len__(self) -> int:
+        return len(self.heap)
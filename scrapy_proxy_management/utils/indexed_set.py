@@ -0,0 +1,51 @@
+import random
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import Iterator
+from typing import List
+
+
+class IndexedSet(object):
+    """A set whose items are also kept in an array, so an item could be added,
+    removed (by swapping with the last one) or chosen randomly in O(1)."""
+
+    def __init__(self, items: Iterable[Hashable] = ()):
+        self.items: List[Hashable] = list()
+        self.index: Dict[Hashable, int] = dict()
+
+        for item in items:
+            self.add(item)
+
+    def add(self, item: Hashable):
+        if item not in self.index:
+            self.index[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item: Hashable):
+        i: int = self.index.pop(item, None)
+        if i is None:
+            return
+
+        last: Hashable = self.items.pop()
+        if i < len(self.items):
+            self.items[i] = last
+            self.index[last] = i
+
+    def choice(self) -> Hashable:
+        return random.choice(self.items)
+
+    def sample(self, k: int) -> List[Hashable]:
+        return random.sample(self.items, min(k, len(self.items)))
+
+    def __getitem__(self, i: int) -> Hashable:
+        return self.items[i]
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.index
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
@@ -0,0 +1,104 @@
+import heapq
+import time
+from itertools import count
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+class Quarantine(object):
+    """Keep the items in quarantine for a delay growing exponentially with
+    their strikes, in a timer heap released lazily.
+
+    The n-th strike of an item delays it for base_delay * factor ** (n - 1)
+    seconds, up to max_delay; the strikes of an item are forgotten after
+    strike_ttl seconds without any strike. An item striking again while in
+    quarantine is only rescheduled, its outdated entry in the heap is skipped
+    when it is popped. The strikes are kept in the order of their last strike,
+    so the forgotten ones are pruned from the front.
+
+    """
+
+    def __init__(
+            self, base_delay: float, factor: float = 2,
+            max_delay: float = None, strike_ttl: float = None,
+            timer: Callable[[], float] = time.monotonic
+    ):
+        self.base_delay: float = base_delay
+        self.factor: float = factor
+        self.max_delay: Optional[float] = max_delay
+        self.strike_ttl: Optional[float] = strike_ttl
+        self.timer: Callable[[], float] = timer
+
+        self.heap: List[Tuple[float, int, Hashable]] = list()
+        self.seq: Iterator[int] = count()
+        # item: the time to release
+        self.release_at: Dict[Hashable, float] = dict()
+        # item: [the number of strikes, the time of the last strike], in the
+        # order of the last strike
+        self.strikes: Dict[Hashable, List] = dict()
+
+    def add(self, item: Hashable) -> float:
+        """Strike the item and put it in quarantine, return the delay."""
+        now: float = self.timer()
+        self.prune(now)
+
+        # moved to the end, as it is the latest strike
+        strikes: List = self.strikes.pop(item, [0, now])
+        strikes[0] += 1
+        strikes[1] = now
+        self.strikes[item] = strikes
+
+        delay: float = self.base_delay * self.factor ** (strikes[0] - 1)
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+
+        self.release_at[item] = now + delay
+        heapq.heappush(self.heap, (now + delay, next(self.seq), item))
+        return delay
+
+    def release(self) -> List[Hashable]:
+        """Pop the items whose delay is over."""
+        now: float = self.timer()
+        self.prune(now)
+        released: List[Hashable] = list()
+        while self.heap and self.heap[0][0] <= now:
+            release_at, _, item = heapq.heappop(self.heap)
+            if self.release_at.get(item) == release_at:
+                del self.release_at[item]
+                released.append(item)
+        return released
+
+    def prune(self, now: float):
+        """Forget the strikes older than strike_ttl seconds."""
+        if self.strike_ttl is None:
+            return
+
+        while self.strikes:
+            item, strikes = next(iter(self.strikes.items()))
+            if now - strikes[1] <= self.strike_ttl:
+                break
+            del self.strikes[item]
+
+    def next_release(
+            self, predicate: Callable[[Hashable], bool] = None
+    ) -> Optional[float]:
+        """Return the earliest time an item (matching the predicate) is
+        released, or None if there is none."""
+        return min(
+            (
+                release_at for item, release_at in self.release_at.items()
+                if predicate is None or predicate(item)
+            ),
+            default=None
+        )
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.release_at
+
+    def __len__(self) -> int:
+        return len(self.release_at)
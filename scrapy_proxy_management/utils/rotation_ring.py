@@ -0,0 +1,117 @@
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+
+class RotationRing(object):
+    """A ring of items provided one by one endlessly, like itertools.cycle,
+    but an item could be removed or reinserted in O(1).
+
+    The items are kept in an array of slots linked as a doubly linked ring,
+    and the slots of the removed items are reused through a free list. A new
+    or reinserted item is placed just before the cursor, so it is provided
+    at the end of the current round, and the rotation is not restarted.
+
+    """
+
+    def __init__(self, items: Iterable[Hashable] = ()):
+        self.items: List[Optional[Hashable]] = list()
+        self.next: List[int] = list()
+        self.prev: List[int] = list()
+        self.index: Dict[Hashable, int] = dict()
+        self.free: List[int] = list()
+        self.cursor: Optional[int] = None
+
+        for item in items:
+            self.add(item)
+
+    def add(self, item: Hashable):
+        if item in self.index:
+            return
+
+        if self.free:
+            slot: int = self.free.pop()
+            self.items[slot] = item
+        else:
+            slot: int = len(self.items)
+            self.items.append(item)
+            self.next.append(slot)
+            self.prev.append(slot)
+        self.index[item] = slot
+
+        if self.cursor is None:
+            self.next[slot] = self.prev[slot] = self.cursor = slot
+        else:
+            self._link(slot)
+
+    def discard(self, item: Hashable):
+        slot: int = self.index.pop(item, None)
+        if slot is None:
+            return
+
+        if self.next[slot] == slot:
+            self.cursor = None
+        else:
+            prev, next_ = self.prev[slot], self.next[slot]
+            self.next[prev] = next_
+            self.prev[next_] = prev
+            if self.cursor == slot:
+                self.cursor = next_
+
+        self.items[slot] = None
+        self.free.append(slot)
+
+    def next_matching(
+            self, predicate: Callable[[Hashable], bool]
+    ) -> Optional[Hashable]:
+        """Return the first item from the cursor for which the predicate is
+        true, or None if there is none; the items before it keep their places
+        at the cursor, and it is moved just before the cursor, as if it was
+        provided by __next__."""
+        if self.cursor is None:
+            raise StopIteration
+
+        slot: int = self.cursor
+        for _ in range(len(self.index)):
+            if predicate(self.items[slot]):
+                break
+            slot = self.next[slot]
+        else:
+            return None
+
+        if slot == self.cursor:
+            self.cursor = self.next[slot]
+        else:
+            prev, next_ = self.prev[slot], self.next[slot]
+            self.next[prev] = next_
+            self.prev[next_] = prev
+            self._link(slot)
+        return self.items[slot]
+
+    def _link(self, slot: int):
+        """Link the slot just before the cursor."""
+        prev: int = self.prev[self.cursor]
+        self.next[prev] = slot
+        self.prev[slot] = prev
+        self.next[slot] = self.cursor
+        self.prev[self.cursor] = slot
+
+    def __next__(self) -> Hashable:
+        if self.cursor is None:
+            raise StopIteration
+
+        slot: int = self.cursor
+        self.cursor = self.next[slot]
+        return self.items[slot]
+
+    def __iter__(self) -> 'RotationRing':
+        return self
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
@@ -0,0 +1,95 @@
+import random
+from collections import defaultdict
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import List
+from typing import Tuple
+from typing import Union
+
+
+class TagIndex(object):
+    """An inverted index from the tags, as (field, value), to the bitset (int)
+    of the ids of the items with the tag, so the items matching some tags are
+    found by the intersection of the bitsets, without scanning the items.
+
+    A removed item only has its bit cleared in the bitset of the alive items,
+    and its id is reused if it is added again.
+
+    """
+
+    def __init__(self, fields: Iterable[str] = ()):
+        self.fields: List[str] = list(fields)
+
+        self.items: List[Hashable] = list()
+        self.ids: Dict[Hashable, int] = dict()
+        self.index: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.alive: int = 0
+
+    def add(self, item: Hashable, meta: Dict = None):
+        """Add the item with the tags in the fields of its meta; a field could
+        be a value or a list of values."""
+        try:
+            self.alive |= 1 << self.ids[item]
+            return
+        except KeyError:
+            pass
+
+        i: int = len(self.items)
+        self.ids[item] = i
+        self.items.append(item)
+        self.alive |= 1 << i
+
+        for field in self.fields:
+            values = (meta or {}).get(field)
+            if values is None:
+                continue
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            for value in values:
+                self.index[(field, str(value))] |= 1 << i
+
+    def discard(self, item: Hashable):
+        i: int = self.ids.get(item)
+        if i is not None:
+            self.alive &= ~(1 << i)
+
+    def match(self, tags: Dict[str, Union[str, List[str]]] = None) -> int:
+        """Return the bitset of the alive items with all the tags; a tag could
+        be a list of values, any of which is matched."""
+        bits: int = self.alive
+        for field, values in (tags or {}).items():
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            union: int = 0
+            for value in values:
+                union |= self.index.get((field, str(value)), 0)
+            bits &= union
+            if not bits:
+                break
+        return bits
+
+    def choice(self, bits: int, tries: int = 8) -> Hashable:
+        """Return an item in the bitset uniformly: a random id is taken if it
+        is in the bitset, up to the tries, then the item of a random rank
+        among the set bits."""
+        if not bits:
+            raise IndexError('choice from an empty bitset')
+
+        length: int = bits.bit_length()
+        for _ in range(tries):
+            i: int = random.randrange(length)
+            if bits >> i & 1:
+                return self.items[i]
+
+        # the bitset is sparse, so clear the lowest set bits up to the rank
+        for _ in range(random.randrange(bin(bits).count('1'))):
+            bits &= bits - 1
+        return self.items[(bits & -bits).bit_length() - 1]
+
+    def __contains__(self, item: Hashable) -> bool:
+        i: int = self.ids.get(item)
+        return i is not None and bool(self.alive >> i & 1)
+
+    def __len__(self) -> int:
+        return bin(self.alive).count('1')
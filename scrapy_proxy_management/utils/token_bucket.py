@@ -0,0 +1,42 @@
+from typing import Optional
+
+
+class TokenBucket(object):
+    """A token bucket refilled at the rate (tokens per second) up to the
+    burst, computed lazily from the time it is last touched; a rate of None or
+    0 means no limit."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: Optional[float], burst: float, now: float):
+        self.rate: Optional[float] = (
+            float(rate) if rate is not None else 0.0
+        ) or None
+        if self.rate is not None and self.rate < 0:
+            raise ValueError('The rate must not be negative: {}'.format(rate))
+        self.burst: float = burst
+        self.tokens: float = burst
+        self.updated: float = now
+
+    def refill(self, now: float):
+        if self.rate is None:
+            self.tokens = self.burst
+        elif now > self.updated:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+    def consume(self, now: float, tokens: float = 1) -> bool:
+        self.refill(now)
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+    def next_available(self, now: float, tokens: float = 1) -> float:
+        """Return the time when the tokens are available."""
+        self.refill(now)
+        if self.tokens >= tokens:
+            return now
+        return now + (tokens - self.tokens) / self.rate
@@ -0,0 +1,180 @@
+from typing import Dict
+from typing import Hashable
+from typing import List
+
+import numpy as np
+
+
+class VectorPool(object):
+    """A pool of items with their health features kept in NumPy arrays by the
+    id of each item: the EWMA of the latency and the success rate, the time of
+    the last use and the time until which the item cools down.
+
+    The weights of the items are recomputed by vectorized expressions only in
+    rescore, into cumulative weights, from which the items are sampled with
+    searchsorted, so a pick costs O(log n) however large the pool is. The
+    weight of an item is its expected successes per second (success rate /
+    latency), scaled down while it was used less than the reuse interval ago,
+    and zero while it is removed or cooling down.
+
+    The removed items keep their slots, to be revived with their features if
+    they are added again, until the removed ones outnumber the alive ones and
+    rescore compacts the arrays, so it stays proportional to the pool.
+
+    """
+
+    def __init__(
+            self, items: List[Hashable] = (), alpha: float = 0.3,
+            reuse_interval: float = 0.0, capacity: int = 1024
+    ):
+        self.alpha: float = alpha
+        self.reuse_interval: float = reuse_interval
+
+        self.items: List[Hashable] = list()
+        self.ids: Dict[Hashable, int] = dict()
+        self.size: int = 0
+
+        capacity = max(capacity, len(items), 1)
+        self.alive: np.ndarray = np.zeros(capacity, dtype=bool)
+        # NaN before the first latency, replaced by the mean of the others
+        self.latency: np.ndarray = np.full(capacity, np.nan)
+        self.success: np.ndarray = np.ones(capacity)
+        self.last_used: np.ndarray = np.full(capacity, -np.inf)
+        self.cooldown_until: np.ndarray = np.full(capacity, -np.inf)
+
+        self.cumulative: np.ndarray = np.zeros(0)
+        self.total: float = 0.0
+
+        for item in items:
+            self.add(item)
+
+    def add(self, item: Hashable):
+        i: int = self.ids.get(item, -1)
+        if i < 0:
+            i = len(self.items)
+            if i == len(self.alive):
+                self._grow()
+            self.items.append(item)
+            self.ids[item] = i
+        if not self.alive[i]:
+            self.alive[i] = True
+            self.size += 1
+
+    def discard(self, item: Hashable):
+        i: int = self.ids.get(item, -1)
+        if i >= 0 and self.alive[i]:
+            self.alive[i] = False
+            self.size -= 1
+
+    def update(self, items: List[Hashable]):
+        """Replace the alive items by the given ones in place: the rows of the
+        items are kept with their health, the new items are added as rows,
+        and the rows of the others are removed."""
+        self.alive[:] = False
+        self.size = 0
+        for item in items:
+            self.add(item)
+
+    def record(self, item: Hashable, success: bool, latency: float = None):
+        i: int = self.ids.get(item, -1)
+        if i < 0:
+            return
+
+        if latency is not None:
+            if np.isnan(self.latency[i]):
+                self.latency[i] = latency
+            else:
+                self.latency[i] += self.alpha * (latency - self.latency[i])
+        self.success[i] += self.alpha * (float(success) - self.success[i])
+
+    def use(self, item: Hashable, now: float):
+        i: int = self.ids.get(item, -1)
+        if i >= 0:
+            self.last_used[i] = now
+
+    def cooldown(self, item: Hashable, until: float):
+        i: int = self.ids.get(item, -1)
+        if i >= 0:
+            self.cooldown_until[i] = until
+
+    def is_ready(self, item: Hashable, now: float) -> bool:
+        i: int = self.ids.get(item, -1)
+        return i >= 0 and bool(self.alive[i]) and self.cooldown_until[i] <= now
+
+    def rescore(self, now: float):
+        if len(self.items) - self.size > self.size:
+            self._compact()
+
+        n: int = len(self.items)
+        latency: np.ndarray = self.latency[:n]
+        known: np.ndarray = ~np.isnan(latency)
+        default: float = float(latency[known].mean()) if known.any() else 1.0
+        latency = np.where(known, latency, default)
+
+        weights: np.ndarray = (
+            np.maximum(self.success[:n], 1e-6) / np.maximum(latency, 1e-3)
+        )
+        if self.reuse_interval > 0:
+            weights *= np.clip(
+                (now - self.last_used[:n]) / self.reuse_interval, 0.01, 1.0
+            )
+        weights[~self.alive[:n] | (self.cooldown_until[:n] > now)] = 0.0
+
+        self.cumulative = np.cumsum(weights)
+        self.total = float(self.cumulative[-1]) if n else 0.0
+
+    def sample(self, size: int = 1) -> List[Hashable]:
+        """Return the items sampled by their weights at the last rescore."""
+        if self.total <= 0:
+            raise IndexError('sample from a pool without weights')
+
+        ids: np.ndarray = np.searchsorted(
+            self.cumulative, np.random.random(size) * self.total, side='right'
+        )
+        return list(map(
+            lambda x: self.items[x],
+            np.minimum(ids, len(self.cumulative) - 1).tolist()
+        ))
+
+    def next_ready(self) -> float:
+        """Return the earliest end of the cooldowns of the items."""
+        n: int = len(self.items)
+        return float(np.min(self.cooldown_until[:n][self.alive[:n]]))
+
+    def _grow(self):
+        size: int = len(self.alive)
+        self.alive = np.concatenate((self.alive, np.zeros(size, dtype=bool)))
+        self.latency = np.concatenate((self.latency, np.full(size, np.nan)))
+        self.success = np.concatenate((self.success, np.ones(size)))
+        self.last_used = np.concatenate(
+            (self.last_used, np.full(size, -np.inf))
+        )
+        self.cooldown_until = np.concatenate(
+            (self.cooldown_until, np.full(size, -np.inf))
+        )
+
+    def _compact(self):
+        """Drop the slots of the removed items, and renumber the alive
+        ones."""
+        keep: np.ndarray = np.flatnonzero(self.alive[:len(self.items)])
+        capacity: int = max(2 * len(keep), 1)
+
+        def compacted(array: np.ndarray, fill) -> np.ndarray:
+            result: np.ndarray = np.full(capacity, fill, dtype=array.dtype)
+            result[:len(keep)] = array[keep]
+            return result
+
+        self.items = list(map(lambda x: self.items[x], keep.tolist()))
+        self.ids = dict(map(lambda x: (x[1], x[0]), enumerate(self.items)))
+        self.alive = compacted(self.alive, False)
+        self.latency = compacted(self.latency, np.nan)
+        self.success = compacted(self.success, 1.0)
+        self.last_used = compacted(self.last_used, -np.inf)
+        self.cooldown_until = compacted(self.cooldown_until, -np.inf)
+
+    def __contains__(self, item: Hashable) -> bool:
+        i: int = self.ids.get(item, -1)
+        return i >= 0 and bool(self.alive[i])
+
+    def __len__(self) -> int:
+        return self.size
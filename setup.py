@@ -15,6 +15,7 @@ setup(
         exclude=('tests', 'tests.*')
     ),
     install_requires=[
+        'numpy',
         'scrapy',
         'twisted',
     ],
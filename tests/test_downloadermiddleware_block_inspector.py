@@ -0,0 +1,105 @@
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.spiders import Spider
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import Deferred
+from twisted.internet.error import ConnectionRefusedError
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.downloadermiddlewares.block_inspector import \
+    BlockInspectorMiddleware
+from scrapy_proxy_management.utils import unfreeze_settings
+
+
+class _Downloader(object):
+    def __init__(self):
+        self.fetches = list()
+
+    def fetch(self, request, spider):
+        self.fetches.append((request, Deferred()))
+        return self.fetches[-1][1]
+
+
+class _Engine(object):
+    def __init__(self):
+        self.downloader = _Downloader()
+
+
+class TestBlockInspector(TestCase):
+    def setUp(self):
+        self.crawler = get_crawler(Spider, settings_dict={
+            'HTTPPROXY_PROXY_DM_BLOCK_INSPECTOR': 'scrapy_proxy_management.utils.inspect_block',
+            'HTTPPROXY_DM_RECYCLE_REQUEST': 'scrapy_proxy_management.utils.recycle_request',
+            'HTTPPROXY_DM_IMMEDIATE_RETRY': True,
+            'HTTPPROXY_DM_IMMEDIATE_RETRY_TIMES': 1,
+            'HTTPPROXY_PROXY_INVALIDATED_STATUS_CODES': [403],
+        })
+        self.spider = Spider.from_crawler(self.crawler, name='foo')
+        self.mw = BlockInspectorMiddleware.from_crawler(self.crawler)
+
+    def test_recycle_request(self):
+        self.mw.immediate_retry = False
+        req = Request('http://e.com', meta={'proxy': 'http://proxy:3128'})
+        result = self.successResultOf(self.mw.process_exception(
+            req, ConnectionRefusedError(), self.spider
+        ))
+        self.assertIsInstance(result, Request)
+        self.assertNotIn('proxy', result.meta)
+        self.assertTrue(result.dont_filter)
+
+    def test_immediate_retry(self):
+        self.crawler.engine = _Engine()
+        fetches = self.crawler.engine.downloader.fetches
+
+        req = Request('http://e.com', meta={'proxy': 'http://proxy:3128'})
+        dfd = self.mw.process_exception(
+            req, ConnectionRefusedError(), self.spider
+        )
+        self.assertEqual(len(fetches), 1)
+        retry, retry_dfd = fetches[0]
+        self.assertNotIn('proxy', retry.meta)
+        self.assertEqual(retry.meta['proxy_immediate_retries'], 1)
+        self.assertEqual(
+            self.mw.stats.get_value('block_inspector/immediate_retry'), 1
+        )
+
+        # the response of the retry is the response of the request
+        response = Response('http://e.com', status=403, request=retry)
+        retry_dfd.callback(response)
+        self.assertIs(self.successResultOf(dfd), response)
+
+        # and it is not inspected again for the request
+        self.assertTrue(req.meta['_proxy_immediate_retried'])
+        self.assertNotIn('_proxy_immediate_retried', retry.meta)
+        self.assertIs(self.successResultOf(
+            self.mw.process_response(req, response, self.spider)
+        ), response)
+        self.assertEqual(len(fetches), 1)
+
+        # the retries are spent, so the recycled request is scheduled again
+        result = self.successResultOf(self.mw.process_exception(
+            retry, ConnectionRefusedError(), self.spider
+        ))
+        self.assertIsInstance(result, Request)
+        self.assertEqual(len(fetches), 1)
+
+    def test_recycle_times(self):
+        self.mw.immediate_retry = False
+        with unfreeze_settings(self.mw.settings) as settings:
+            settings.set('HTTPPROXY_RECYCLE_TIMES', 2)
+
+        req = Request('http://e.com', meta={'proxy': 'http://proxy:3128'})
+        for i in range(2):
+            req = self.successResultOf(self.mw.process_exception(
+                req, ConnectionRefusedError(), self.spider
+            ))
+            self.assertEqual(req.meta['proxy_recycle_times'], i + 1)
+
+        # dropped after it is recycled 2 times
+        self.failureResultOf(self.mw.process_exception(
+            req, ConnectionRefusedError(), self.spider
+        ), IgnoreRequest)
+        self.assertEqual(
+            self.mw.stats.get_value('block_inspector/recycle/exhausted'), 1
+        )
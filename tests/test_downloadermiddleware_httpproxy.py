@@ -1,23 +1,91 @@
 import os
+import threading
 from contextlib import contextmanager
 from copy import deepcopy
 from functools import partial
 from typing import Dict
 from urllib.parse import urlparse
 
+from scrapy.core.downloader import Slot
 from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest
 from scrapy.exceptions import NotConfigured
 from scrapy.http import Request
+from scrapy.http import Response
 from scrapy.settings import Settings
 from scrapy.spiders import Spider
+from twisted.internet.defer import Deferred
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.error import TimeoutError
+from twisted.internet.task import Clock
 from twisted.trial.unittest import TestCase
 
 from scrapy_proxy_management.downloadermiddlewares.httpproxy import \
     HttpProxyMiddleware
+from scrapy_proxy_management.storages.settings_storage import \
+    SettingsStorage
+from scrapy_proxy_management.strategies import BaseStrategy
+from scrapy_proxy_management.strategies.default_strategy import \
+    DefaultStrategy
+from scrapy_proxy_management.utils import get_proxy_hash
+from scrapy_proxy_management.utils import recycle_request
 
 _spider = Spider('foo')
 
 
+class ThirdPartyStrategy(BaseStrategy):
+    """A strategy only implementing retrieve_proxy."""
+
+    supported_storage = (
+        'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+    )
+
+    def retrieve_proxy(
+            self, scheme: str, spider: Spider, request: Request = None
+    ):
+        return next(self.storage.proxies_iter[scheme])
+
+
+class RefillableStorage(SettingsStorage):
+    """A storage supplying a new proxy on reload, recording the threads where
+    the reload is queried and applied."""
+
+    refillable = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads: Dict = dict()
+
+    def query_proxies(self):
+        self.threads['query'] = threading.current_thread()
+        return {'http': [(None, 'https://proxy.for.http.2:3128')]}
+
+    def apply_proxies(self, result):
+        self.threads['apply'] = threading.current_thread()
+        return result
+
+
+class DeferredDownloadHandler(object):
+    """A download handler whose downloads are fired by the tests."""
+
+    downloads = list()
+
+    def __init__(self, settings: Settings):
+        pass
+
+    def download_request(self, request: Request, spider: Spider) -> Deferred:
+        self.downloads.append((request, Deferred()))
+        return self.downloads[-1][1]
+
+
+class LegacyStrategy(DefaultStrategy):
+    """A strategy with the signature of retrieve_proxy before the request is
+    passed to it."""
+
+    def retrieve_proxy(self, scheme: str, spider: Spider):
+        return super().retrieve_proxy(scheme, spider)
+
+
 @contextmanager
 def _open_spider(
         spider: Spider,
@@ -459,6 +527,659 @@ class TestSettingsHttpProxyMiddleware(TestCase):
             self.assertIsNone(mw.process_request(req, _spider))
             self.assertEqual(req.meta, {'proxy': 'http://proxy.com'})
 
+    def test_invalidate_proxy(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+        http_proxy_2 = 'https://proxy.for.http.2:3128'
+        http_proxy_3 = 'https://proxy.for.http.3:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {
+                'http': [http_proxy_1, http_proxy_2, http_proxy_3]
+            }
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_1)
+
+            self.assertIsNone(mw.invalidate_proxy(request=req, spider=_spider))
+            self.assertIn(
+                ('http', None, http_proxy_1), mw.storage.proxies_invalidated
+            )
+
+            # the rotation goes on without the invalidated proxy
+            for proxy in (http_proxy_2, http_proxy_3, http_proxy_2):
+                req = Request('http://e.com')
+                mw.process_request(req, _spider)
+                self.assertEqual(req.meta['proxy'], proxy)
+
+    def test_exhausted(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [http_proxy_1]},
+        })
+
+        class _Engine(object):
+            def __init__(self):
+                self.closed = list()
+
+            def close_spider(self, spider, reason='cancelled'):
+                self.closed.append(reason)
+
+        with _open_spider(_spider, settings) as mw:
+            mw.crawler.engine = _Engine()
+
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            # the requests of the exhausted scheme are never downloaded
+            # without a proxy
+            for i in range(2):
+                req = Request('http://e.com')
+                self.assertRaises(
+                    IgnoreRequest, mw.process_request, req, _spider
+                )
+                self.assertNotIn('proxy', req.meta)
+            self.assertEqual(len(mw.crawler.engine.closed), 2)
+
+    def test_legacy_strategy(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [http_proxy_1]},
+            'HTTPPROXY_STRATEGY':
+                'tests.test_downloadermiddleware_httpproxy.LegacyStrategy',
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_1)
+
+    def test_invalidated_ttl_from_command_line(self):
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': ['https://proxy.for.http.1:3128']},
+        })
+        # -s HTTPPROXY_PROXIES_INVALIDATED_TTL=600
+        settings.set('HTTPPROXY_PROXIES_INVALIDATED_TTL', '600', 'cmdline')
+
+        with _open_spider(_spider, settings) as mw:
+            self.assertEqual(mw.storage.proxies_invalidated.ttl, 600.0)
+            mw.storage.proxies_invalidated.add(('http', None, 'foo'))
+            self.assertIn(('http', None, 'foo'), mw.storage.proxies_invalidated)
+
+    def test_quarantine(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+        http_proxy_2 = 'https://proxy.for.http.2:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [http_proxy_1, http_proxy_2]},
+            'HTTPPROXY_QUARANTINE_ENABLED': True,
+            'HTTPPROXY_QUARANTINE_BASE_DELAY': 10,
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            clock = [0.0]
+            mw.strategy.quarantine.timer = lambda: clock[0]
+
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_2)
+
+            # back into the rotation after the quarantine
+            clock[0] = 10
+            for proxy in (http_proxy_2, http_proxy_1, http_proxy_2):
+                req = Request('http://e.com')
+                mw.process_request(req, _spider)
+                self.assertEqual(req.meta['proxy'], proxy)
+            self.assertNotIn(
+                ('http', None, http_proxy_1), mw.storage.proxies_invalidated
+            )
+
+            # all the proxies are in quarantine, wait for the first one
+            mw.invalidate_proxy(request=req, spider=_spider)
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            mw.invalidate_proxy(request=req, spider=_spider)
+            dfd = mw.process_request(Request('http://e.com'), _spider)
+            self.assertIsNotNone(dfd)
+            dfd.cancel()
+            dfd.addErrback(lambda _: None)
+
+            clock[0] = 20
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_2)
+
+    def test_quarantine_bloom_filter(self):
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': ['https://proxy.for.http.1:3128']},
+            'HTTPPROXY_QUARANTINE_ENABLED': True,
+            'HTTPPROXY_PROXIES_INVALIDATED_BLOOM_FILTER': True,
+        })
+
+        with self.assertRaises(ValueError):
+            with _open_spider(_spider, settings):
+                pass
+
+    def test_ban_per_domain(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+        http_proxy_2 = 'https://proxy.for.http.2:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [http_proxy_1, http_proxy_2]},
+            'HTTPPROXY_BAN_PER_DOMAIN': True,
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_1)
+            mw.invalidate_proxy(request=req, spider=_spider)
+            self.assertNotIn(
+                ('http', None, http_proxy_1), mw.storage.proxies_invalidated
+            )
+
+            # skipped only on the banned domain
+            for url, proxy in (('http://e.com', http_proxy_2),
+                               ('http://f.com', http_proxy_1),
+                               ('http://e.com', http_proxy_2)):
+                req = Request(url)
+                mw.process_request(req, _spider)
+                self.assertEqual(req.meta['proxy'], proxy)
+
+            # all the proxies are banned on the domain
+            mw.invalidate_proxy(request=req, spider=_spider)
+            dfd = mw.process_request(Request('http://e.com'), _spider)
+            self.assertIsNotNone(dfd)
+            dfd.cancel()
+            dfd.addErrback(lambda _: None)
+            self.assertEqual(
+                mw.crawler.stats.get_value('proxy/ban/all_banned'), 1
+            )
+
+    def test_max_uses(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+        http_proxy_2 = 'https://proxy.for.http.2:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [http_proxy_1, http_proxy_2]},
+            'HTTPPROXY_MAX_USES': 2,
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            proxies = []
+            for i in range(4):
+                req = Request('http://e.com')
+                mw.process_request(req, _spider)
+                proxies.append(req.meta['proxy'])
+            self.assertEqual(
+                proxies, [http_proxy_1, http_proxy_2] * 2
+            )
+            self.assertIn(
+                ('http', None, http_proxy_1), mw.storage.proxies_invalidated
+            )
+            self.assertEqual(
+                mw.crawler.stats.get_value('proxy/max_uses/retired'), 2
+            )
+
+    def test_max_uses_default_discard(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+        http_proxy_2 = 'https://proxy.for.http.2:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [http_proxy_1, http_proxy_2]},
+            'HTTPPROXY_STRATEGY':
+                'tests.test_downloadermiddleware_httpproxy.ThirdPartyStrategy',
+            'HTTPPROXY_MAX_USES': 1,
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_1)
+
+            # retired out of the proxies of the storage
+            self.assertEqual(
+                mw.storage.proxies['http'], [(None, http_proxy_2)]
+            )
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_2)
+
+    @inlineCallbacks
+    def test_max_uses_refill(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+        http_proxy_2 = 'https://proxy.for.http.2:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [http_proxy_1]},
+            'HTTPPROXY_STORAGE':
+                'tests.test_downloadermiddleware_httpproxy.RefillableStorage',
+            'HTTPPROXY_MAX_USES': 1,
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_1)
+            self.assertIsNotNone(mw.strategy.refilling)
+
+            yield mw.strategy.refilling
+            self.assertIsNone(mw.strategy.refilling)
+            self.assertEqual(
+                mw.crawler.stats.get_value('proxy/max_uses/refilled'), 1
+            )
+
+            # only the query runs in a thread
+            self.assertIsNot(
+                mw.storage.threads['query'], threading.main_thread()
+            )
+            self.assertIs(mw.storage.threads['apply'], threading.main_thread())
+
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_2)
+
+    def test_max_uses_per_domain(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+        http_proxy_2 = 'https://proxy.for.http.2:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [http_proxy_1, http_proxy_2]},
+            'HTTPPROXY_MAX_USES': 1,
+            'HTTPPROXY_MAX_USES_PER_DOMAIN': True,
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            # retired only on the domain where it is used up
+            for url, proxy in (('http://e.com', http_proxy_1),
+                               ('http://e.com', http_proxy_2),
+                               ('http://f.com', http_proxy_1)):
+                req = Request(url)
+                mw.process_request(req, _spider)
+                self.assertEqual(req.meta['proxy'], proxy)
+            self.assertNotIn(
+                ('http', None, http_proxy_1), mw.storage.proxies_invalidated
+            )
+
+            # all the proxies are retired on the domain, which never expire
+            self.assertRaises(
+                IgnoreRequest, mw.process_request, Request('http://e.com'),
+                _spider
+            )
+            self.assertEqual(
+                mw.crawler.stats.get_value('proxy/max_uses/all_retired'), 1
+            )
+
+    def test_max_uses_per_domain_banned(self):
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [
+                'https://proxy.for.http.1:3128', 'https://proxy.for.http.2:3128'
+            ]},
+            'HTTPPROXY_BAN_PER_DOMAIN': True,
+            'HTTPPROXY_MAX_USES': 2,
+            'HTTPPROXY_MAX_USES_PER_DOMAIN': True,
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            mw.invalidate_proxy(request=req, spider=_spider)
+            for _ in range(2):
+                mw.process_request(Request('http://e.com'), _spider)
+
+            # one proxy is retired, but the other one is banned until its
+            # ban expires
+            dfd = mw.process_request(Request('http://e.com'), _spider)
+            self.assertIsNotNone(dfd)
+            dfd.cancel()
+            dfd.addErrback(lambda _: None)
+            self.assertIsNone(
+                mw.crawler.stats.get_value('proxy/max_uses/all_retired')
+            )
+
+    def test_immediate_retried(self):
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': ['https://proxy.for.http.1:3128']},
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            responses = list()
+            mw.strategy.process_response = (
+                lambda request, response, spider: responses.append(response)
+            )
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+
+            # the response of the retry is not counted for the blocked request
+            req.meta['_proxy_immediate_retried'] = True
+            response = Response('http://e.com')
+            self.assertIs(mw.process_response(req, response, _spider), response)
+            self.assertEqual(responses, [])
+
+    @inlineCallbacks
+    def _open_hedge_engine(self, **settings):
+        crawler = Crawler(Spider, Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [
+                'https://proxy.for.http.1:3128', 'https://proxy.for.http.2:3128'
+            ]},
+            'HTTPPROXY_HEDGE_ENABLED': True,
+            'HTTPPROXY_HEDGE_DELAY': 2,
+            'HTTPPROXY_HEDGE_BUDGET': 1,
+            'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.default_strategy.DefaultStrategy',
+            'DOWNLOADER_MIDDLEWARES': {
+                'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware':
+                    None,
+                'scrapy_proxy_management.downloadermiddlewares.httpproxy.HttpProxyMiddleware':
+                    750,
+            },
+            'DOWNLOAD_HANDLERS': {
+                'http': 'tests.test_downloadermiddleware_httpproxy.DeferredDownloadHandler',
+            },
+            **settings,
+        }))
+        spider = crawler.spider = crawler._create_spider('foo')
+        engine = crawler.engine = crawler._create_engine()
+        mw = next(filter(
+            lambda x: isinstance(x, HttpProxyMiddleware),
+            engine.downloader.middleware.middlewares
+        ))
+        mw.clock = Clock()
+        yield engine.open_spider(spider, [], close_if_idle=False)
+        self.addCleanup(engine.close_spider, spider)
+
+        downloads = DeferredDownloadHandler.downloads
+        del downloads[:]
+
+        def fire_downloads():
+            for request, download in downloads:
+                if not download.called:
+                    download.callback(Response(request.url, request=request))
+
+        # before the spider is closed, which waits for the downloads
+        self.addCleanup(fire_downloads)
+        return engine, spider, mw
+
+    @inlineCallbacks
+    def test_hedge_engine(self):
+        engine, spider, mw = yield self._open_hedge_engine()
+        failures = list()
+        mw.strategy.process_exception = (
+            lambda request, exception, spider: failures.append(request)
+        )
+        downloads = DeferredDownloadHandler.downloads
+
+        req = Request('http://e.com')
+        dfd = engine.download(req, spider)
+        # only the copy of the request is active in the downloader
+        self.assertEqual(len(engine.downloader.active), 1)
+        self.assertNotIn(req, engine.downloader.active)
+
+        mw.clock.advance(2)
+        self.assertEqual(len(downloads), 2)
+        (primary, primary_dfd), (hedge, hedge_dfd) = downloads
+        self.assertEqual(primary.meta['proxy'], 'https://proxy.for.http.1:3128')
+        self.assertEqual(hedge.meta['proxy'], 'https://proxy.for.http.2:3128')
+
+        # the transfer of the primary is not aborted, it stays active until
+        # its end, without being charged to its proxy
+        hedge_dfd.callback(Response('http://e.com', request=hedge))
+        response = yield dfd
+        self.assertEqual(response.request, req)
+        self.assertTrue(primary.meta['_proxy_hedge_cancelled'])
+        self.assertEqual(list(engine.downloader.active), [primary])
+        self.assertEqual(mw.stats.get_value('proxy/hedge/won'), 1)
+        self.assertEqual(mw.stats.get_value('proxy/hedge/unaborted'), 1)
+        self.assertEqual(mw.hedges, 1)
+
+        primary_dfd.callback(Response('http://e.com', request=primary))
+        self.assertEqual(failures, [])
+        self.assertEqual(len(engine.downloader.active), 0)
+
+    @inlineCallbacks
+    def test_hedge_engine_queued(self):
+        engine, spider, mw = yield self._open_hedge_engine(
+            CONCURRENT_REQUESTS_PER_DOMAIN=1, HTTPPROXY_DOWNLOAD_SLOT='proxy'
+        )
+        downloads = DeferredDownloadHandler.downloads
+
+        # the slot of the first proxy is taken
+        engine.download(
+            Request('http://e.com', meta={'dont_hedge': True}), spider
+        )
+        req = Request('http://e.com')
+        dfd = engine.download(req, spider)
+        mw.clock.advance(2)
+        # the hedge waits in the queue of the slot of the first proxy
+        self.assertEqual(len(downloads), 2)
+        self.assertEqual(len(engine.downloader.active), 3)
+
+        # the hedge is aborted before its transfer, and given back
+        primary, primary_dfd = downloads[1]
+        primary_dfd.callback(Response('http://e.com', request=primary))
+        yield dfd
+        self.assertFalse(any(map(
+            lambda x: x.queue, engine.downloader.slots.values()
+        )))
+        self.assertEqual(len(engine.downloader.active), 1)
+        self.assertEqual(len(downloads), 2)
+        self.assertEqual(mw.stats.get_value('proxy/hedge/aborted'), 1)
+        self.assertEqual(mw.hedges, 0)
+
+    def test_download_slot(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+        http_proxy_2 = 'https://proxy.for.http.2:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [http_proxy_1, http_proxy_2]},
+            'HTTPPROXY_PROXIES_META': {
+                http_proxy_1: {'concurrency': 2, 'download_delay': 0.5}
+            },
+            'HTTPPROXY_DOWNLOAD_SLOT': 'proxy',
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            mw.crawler.engine = mw.crawler._create_engine()
+            self.addCleanup(mw.crawler.engine.downloader.close)
+            slots = mw.crawler.engine.downloader.slots
+
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            slot = req.meta['download_slot']
+            self.assertEqual(slot, 'proxy-{}'.format(
+                mw.storage.get_proxy_id(('http', None, http_proxy_1))
+            ))
+            self.assertEqual(slots[slot].concurrency, 2)
+            self.assertEqual(slots[slot].delay, 0.5)
+
+            # the slot follows the proxy of the recycled request
+            mw.invalidate_proxy(request=req, spider=_spider)
+            req = recycle_request(mw, req, _spider)
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_2)
+            self.assertNotEqual(req.meta['download_slot'], slot)
+            self.assertNotIn(req.meta['download_slot'], slots)
+
+            # the slot set by others is kept
+            req = Request('http://e.com', meta={'download_slot': 'foo'})
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['download_slot'], 'foo')
+
+    def test_hedge(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+        http_proxy_2 = 'https://proxy.for.http.2:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {'http': [http_proxy_1, http_proxy_2]},
+            'HTTPPROXY_HEDGE_ENABLED': True,
+            'HTTPPROXY_HEDGE_DELAY': 2,
+            'HTTPPROXY_HEDGE_BUDGET': 0.5,
+        })
+
+        class _Downloader(object):
+            active = set()
+            slots = {'e.com': Slot(1, 0, False)}
+
+        class _Engine(object):
+            def __init__(self, mw):
+                self.mw = mw
+                self.downloads = list()
+                self.downloader = _Downloader()
+
+            def download(self, request, spider):
+                self.mw.process_request(request, spider)
+                # transferring at once
+                request.meta['download_slot'] = 'e.com'
+                self.downloader.slots['e.com'].transferring.add(request)
+                self.downloads.append((request, Deferred()))
+                return self.downloads[-1][1]
+
+        with _open_spider(_spider, settings) as mw:
+            mw.clock = Clock()
+            engine = mw.crawler.engine = _Engine(mw)
+
+            # the hedge through the other proxy responds first
+            dfd = mw.process_request(Request('http://e.com'), _spider)
+            self.assertEqual(len(engine.downloads), 1)
+            mw.clock.advance(2)
+            self.assertEqual(len(engine.downloads), 2)
+            (primary, primary_dfd), (hedge, hedge_dfd) = engine.downloads
+            self.assertEqual(primary.meta['proxy'], http_proxy_1)
+            self.assertEqual(hedge.meta['proxy'], http_proxy_2)
+            self.assertEqual(hedge.meta['proxy_excluded'], (
+                get_proxy_hash(('http', None, http_proxy_1)),
+            ))
+            response = Response('http://e.com', request=hedge)
+            hedge_dfd.callback(response)
+            self.assertIs(self.successResultOf(dfd), response)
+            self.assertFalse(primary_dfd.called)
+            primary_dfd.errback(TimeoutError())
+            self.assertEqual(mw.stats.get_value('proxy/hedge/issued'), 1)
+            self.assertEqual(mw.stats.get_value('proxy/hedge/won'), 1)
+
+            # the hedge is over the budget of 1 per 2 requests
+            dfd = mw.process_request(Request('http://e.com'), _spider)
+            mw.clock.advance(2)
+            self.assertEqual(len(engine.downloads), 3)
+            self.assertEqual(mw.stats.get_value('proxy/hedge/over_budget'), 1)
+            engine.downloads[-1][1].callback(
+                Response('http://e.com', request=engine.downloads[-1][0])
+            )
+            self.assertIsInstance(self.successResultOf(dfd), Response)
+
+            # the primary responds in time, without a hedge
+            dfd = mw.process_request(Request('http://e.com'), _spider)
+            engine.downloads[-1][1].callback(
+                Response('http://e.com', request=engine.downloads[-1][0])
+            )
+            self.successResultOf(dfd)
+            self.assertFalse(mw.clock.getDelayedCalls())
+
+            # the latencies of the proxy replace the fixed delay
+            mw.hedge_min_samples = 2
+            for latency in (0.1, 0.3):
+                req = Request('http://e.com', meta={
+                    'proxy': http_proxy_1, 'download_latency': latency
+                })
+                mw.process_response(req, Response('http://e.com'), _spider)
+            self.assertEqual(mw._get_hedge_delay(req), 0.1)
+
+            # a POST is not hedged
+            req = Request('http://e.com', method='POST')
+            self.assertIsNone(mw.process_request(req, _spider))
+            self.assertIn('proxy', req.meta)
+
+    def test_proxy_excluded(self):
+        http_proxy_1 = 'https://proxy.for.http.1:3128'
+        http_proxy_2 = 'https://proxy.for.http.2:3128'
+        http_proxy_3 = 'https://proxy.for.http.3:3128'
+
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_ENABLED': True,
+            'HTTPPROXY_PROXIES': {
+                'http': [http_proxy_1, http_proxy_2, http_proxy_3]
+            },
+            'HTTPPROXY_BAN_PER_DOMAIN': True,
+        })
+
+        with _open_spider(_spider, settings) as mw:
+            proxy_hash_1, proxy_hash_2, proxy_hash_3 = map(
+                lambda x: get_proxy_hash(('http', None, x)),
+                (http_proxy_1, http_proxy_2, http_proxy_3)
+            )
+
+            # the proxy invalidated for the request is excluded for its
+            # recycled copies
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_1)
+            mw.invalidate_proxy(request=req, spider=_spider)
+            self.assertEqual(req.meta['proxy_excluded'], (proxy_hash_1,))
+
+            # the excluded proxy is skipped on the other domains, where it is
+            # not banned
+            req = Request(
+                'http://f.com', meta={'proxy_excluded': (proxy_hash_2,)}
+            )
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_3)
+            self.assertEqual(mw.stats.get_value('proxy/excluded/skipped'), 1)
+
+            # and it is not rotated, so it is the next one for the others
+            for proxy in (http_proxy_2, http_proxy_1, http_proxy_3):
+                req = Request('http://f.com')
+                mw.process_request(req, _spider)
+                self.assertEqual(req.meta['proxy'], proxy)
+
+            # an excluded proxy is reused if all of them are excluded
+            req = Request('http://f.com', meta={
+                'proxy_excluded': (proxy_hash_1, proxy_hash_2, proxy_hash_3)
+            })
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], http_proxy_2)
+            self.assertEqual(mw.stats.get_value('proxy/excluded/reused'), 1)
+
 
 class TestMongoDBHttpProxyMiddleware(TestCase):
     settings = {
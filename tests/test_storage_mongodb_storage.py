@@ -0,0 +1,216 @@
+from contextlib import contextmanager
+from unittest import mock
+
+import mongomock
+from scrapy.crawler import Crawler
+from scrapy.http import Request
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.downloadermiddlewares.httpproxy import \
+    HttpProxyMiddleware
+from scrapy_proxy_management.exceptions import ProxyThrottledException
+
+_spider = Spider('foo')
+
+
+class _Engine(object):
+    def __init__(self):
+        self.closed = list()
+
+    def close_spider(self, spider, reason='cancelled'):
+        self.closed.append(reason)
+
+
+@contextmanager
+def _open_spider(spider: Spider, settings: Settings, client, engine=None):
+    crawler = Crawler(spider, settings)
+    crawler.engine = engine
+    with mock.patch(
+            'scrapy_proxy_management.storages.mongodb_storage.MongoClient',
+            lambda **kwargs: client
+    ):
+        middleware = HttpProxyMiddleware(crawler=crawler)
+        middleware.open_spider(spider)
+
+    try:
+        yield middleware
+    finally:
+        middleware.close_spider(spider)
+
+
+class TestMongoDBSyncStorage(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.mongodb_strategy.MongoDBStrategy',
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.mongodb_storage.MongoDBSyncStorage',
+    }
+
+    def setUp(self):
+        self.client = mongomock.MongoClient()
+        self.coll = self.client['scrapy_proxies']['proxies']
+        self.coll.insert_many([
+            {'scheme': 'http', 'proxy': 'http://proxy.{}:3128'.format(i)}
+            for i in range(3)
+        ])
+
+    def test_shared(self):
+        settings: Settings = Settings({
+            **self.settings, 'HTTPPROXY_MONGODB_SHARED': True
+        })
+
+        with _open_spider(_spider, settings, self.client) as mw_1, \
+                _open_spider(_spider, settings, self.client) as mw_2:
+            self.assertIs(mw_1.storage._shared, mw_2.storage._shared)
+            self.assertEqual(mw_1.storage._shared.refcount, 2)
+            self.assertEqual(mw_1.storage.proxies, mw_2.storage.proxies)
+
+            # the snapshot is shared, but not the lists of the proxies
+            mw_1.storage.proxies['http'].pop()
+            self.assertEqual(len(mw_1.storage.proxies['http']), 2)
+            self.assertEqual(len(mw_2.storage.proxies['http']), 3)
+            self.assertEqual(len(mw_1.storage._shared.proxies['http']), 3)
+
+    def test_shared_refill(self):
+        settings: Settings = Settings({
+            **self.settings, 'HTTPPROXY_MONGODB_SHARED': True
+        })
+
+        with _open_spider(_spider, settings, self.client) as mw_1, \
+                _open_spider(_spider, settings, self.client) as mw_2:
+            shared = mw_1.storage._shared
+            generation = shared.generation
+
+            # the query leaves the storage and the shared snapshot untouched
+            result = mw_1.storage.query_proxies()
+            self.assertEqual(shared.generation, generation)
+            self.assertEqual(len(result[0]['http']), 3)
+
+            # a newer snapshot is loaded by the other storage in the meantime
+            self.coll.delete_one({'proxy': 'http://proxy.0:3128'})
+            self.assertEqual(len(mw_2.storage.load_proxies()['http']), 2)
+            self.assertEqual(shared.generation, generation + 1)
+
+            # so the result of the query is dropped for the newer snapshot
+            self.assertEqual(
+                len(mw_1.storage.apply_proxies(result)['http']), 2
+            )
+            self.assertEqual(shared.generation, generation + 1)
+            self.assertIs(mw_1.storage.proxies_meta, shared.proxies_meta)
+
+    def test_exclude_invalidated(self):
+        settings: Settings = Settings({
+            **self.settings, 'HTTPPROXY_MONGODB_EXCLUDE_CHUNK_SIZE': 1
+        })
+
+        with _open_spider(_spider, settings, self.client) as mw:
+            for proxy in ('http://proxy.0:3128', 'http://proxy.1:3128'):
+                mw.strategy.discard_proxy(('http', None, proxy))
+
+            # the $nin is split into chunks of 1 _id
+            self.assertEqual(
+                len(mw.storage._get_proxy_retriever_args()['filter']['$and']),
+                2
+            )
+            self.assertEqual(
+                mw.storage.load_proxies(),
+                {'http': [(None, 'http://proxy.2:3128')]}
+            )
+
+    def test_query_plan_check(self):
+        engine = _Engine()
+        explain = {'queryPlanner': {'winningPlan': {
+            'stage': 'PROJECTION', 'inputStage': {'stage': 'COLLSCAN'}
+        }}}
+
+        for check, closed in (('warn', []),
+                              ('error', ['proxy_query_collection_scan'])):
+            settings: Settings = Settings({
+                **self.settings, 'HTTPPROXY_MONGODB_QUERY_PLAN_CHECK': check
+            })
+            with mock.patch.object(
+                    mongomock.collection.Cursor, 'explain',
+                    lambda x: explain, create=True
+            ), _open_spider(_spider, settings, self.client, engine) as mw:
+                self.assertEqual(
+                    mw.stats.get_value('proxy/mongodb/query_plan'),
+                    'PROJECTION,COLLSCAN'
+                )
+                self.assertEqual(engine.closed, closed)
+
+    def test_exclude_invalidated_pool(self):
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.weighted_strategy.WeightedStrategy',
+        })
+
+        # the storage records the _id for any strategy
+        with _open_spider(_spider, settings, self.client) as mw:
+            mw.strategy.discard_proxy(('http', None, 'http://proxy.0:3128'))
+            self.assertEqual(len(mw.storage.proxies_invalidated_ids), 1)
+            self.assertEqual(len(mw.storage.load_proxies()['http']), 2)
+
+    def test_project_tag_fields(self):
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.tag_strategy.TagStrategy',
+        })
+        self.coll.update_one(
+            {'proxy': 'http://proxy.0:3128'}, {'$set': {'country': 'de'}}
+        )
+
+        # the tag fields are kept by the default projection
+        with _open_spider(_spider, settings, self.client) as mw:
+            for _ in range(3):
+                req = Request('http://e.com', meta={
+                    'proxy_tags': {'country': 'de'}
+                })
+                mw.process_request(req, _spider)
+                self.assertEqual(req.meta['proxy'], 'http://proxy.0:3128')
+
+            self.assertEqual(
+                mw.storage._project_tag_fields(['proxy']),
+                ['proxy', 'country', 'provider', 'type']
+            )
+            self.assertEqual(
+                mw.storage._project_tag_fields({'_id': 0, 'password': 0}),
+                {'_id': 0, 'password': 0}
+            )
+
+    def test_quarantined_query(self):
+        self.coll.delete_many({'proxy': {'$ne': 'http://proxy.0:3128'}})
+        settings: Settings = Settings({
+            **self.settings,
+            'HTTPPROXY_QUARANTINE_ENABLED': True,
+            'HTTPPROXY_QUARANTINE_BASE_DELAY': 10,
+        })
+
+        with _open_spider(_spider, settings, self.client) as mw:
+            clock = [0.0]
+            mw.strategy.quarantine.timer = lambda: clock[0]
+            mw.strategy.discard_proxy(('http', None, 'http://proxy.0:3128'))
+            mw.strategy.quarantine_proxy(
+                ('http', None, 'http://proxy.0:3128'), _spider
+            )
+            next(mw.storage.proxies_iter['http'])
+
+            queries = list()
+            load_proxies = mw.storage.load_proxies
+            mw.storage.load_proxies = lambda: queries.append(1) or (
+                load_proxies()
+            )
+
+            # the proxy is in quarantine, so the query is run only once
+            for delay in (10, 5):
+                with self.assertRaises(ProxyThrottledException) as cm:
+                    mw.strategy.retrieve_proxy('http', _spider)
+                self.assertEqual(cm.exception.delay, delay)
+                clock[0] += 5
+            self.assertEqual(len(queries), 1)
+
+            self.assertEqual(
+                mw.strategy.retrieve_proxy('http', _spider),
+                (None, 'http://proxy.0:3128')
+            )
+            self.assertEqual(len(queries), 2)
@@ -0,0 +1,94 @@
+from collections import Counter
+
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.internet.error import TimeoutError
+from twisted.trial.unittest import TestCase
+
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+
+
+class TestBanditStrategy(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.bandit_strategy.BanditStrategy',
+        'HTTPPROXY_PROXIES': {
+            'http': [
+                'https://proxy.for.http.1:3128',
+                'https://proxy.for.http.2:3128',
+            ]
+        },
+        'HTTPPROXY_PROXY_INVALIDATED_STATUS_CODES': [403],
+    }
+
+    def _crawl(self, settings, n=100):
+        counter = Counter()
+        with _open_spider(_spider, Settings(settings)) as mw:
+            for _ in range(n):
+                req = Request('http://e.com')
+                mw.process_request(req, _spider)
+                proxy = req.meta['proxy']
+                counter[proxy] += 1
+
+                if proxy == 'https://proxy.for.http.1:3128':
+                    mw.process_response(
+                        req, Response(req.url, request=req), _spider
+                    )
+                elif counter[proxy] % 2:
+                    mw.process_exception(req, TimeoutError(), _spider)
+                else:
+                    mw.process_response(
+                        req, Response(req.url, status=403, request=req),
+                        _spider
+                    )
+        return counter
+
+    def test_thompson(self):
+        counter = self._crawl(self.settings)
+
+        self.assertGreater(counter['https://proxy.for.http.1:3128'], 80)
+        self.assertGreater(counter['https://proxy.for.http.2:3128'], 0)
+
+    def test_ucb1(self):
+        counter = self._crawl(
+            dict(self.settings, HTTPPROXY_BANDIT_ALGORITHM='ucb1')
+        )
+
+        self.assertGreater(counter['https://proxy.for.http.1:3128'], 80)
+        self.assertGreater(counter['https://proxy.for.http.2:3128'], 0)
+
+    def test_invalidated_proxy_not_removed(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            mw.process_response(req, Response(req.url, request=req), _spider)
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            self.assertEqual(len(mw.strategy.pools['http']), 2)
+            key = ('http', None, req.meta['proxy'])
+            self.assertEqual(mw.strategy.proxies_counts[key], [0.0, 1.0])
+
+    def test_ban_per_domain(self):
+        settings = dict(self.settings, HTTPPROXY_BAN_PER_DOMAIN=True)
+        with _open_spider(_spider, Settings(settings)) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            # counted as a failure, and banned only on the domain
+            self.assertEqual(len(mw.strategy.pools['http']), 2)
+            for i in range(10):
+                req_ = Request('http://e.com')
+                mw.process_request(req_, _spider)
+                self.assertNotEqual(req_.meta['proxy'], req.meta['proxy'])
+
+    def test_quarantine(self):
+        settings = dict(self.settings, HTTPPROXY_QUARANTINE_ENABLED=True)
+        with self.assertRaises(ValueError):
+            with _open_spider(_spider, Settings(settings)):
+                pass
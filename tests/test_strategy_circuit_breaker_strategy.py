@@ -0,0 +1,150 @@
+import time
+
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.internet.error import TimeoutError
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.exceptions import ProxyThrottledException
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+
+
+class TestCircuitBreakerStrategy(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.circuit_breaker_strategy.CircuitBreakerStrategy',
+        'HTTPPROXY_PROXIES': {'http': ['https://proxy.for.http:3128']},
+        'HTTPPROXY_CIRCUIT_BREAKER_MIN_REQUESTS': 2,
+        'HTTPPROXY_CIRCUIT_BREAKER_FAILURE_RATIO': 0.6,
+        'HTTPPROXY_CIRCUIT_BREAKER_COOLDOWN': 10,
+        'HTTPPROXY_CIRCUIT_BREAKER_HALF_OPEN_TRIALS': 1,
+    }
+
+    def _fail(self, mw):
+        req = Request('http://e.com')
+        mw.process_request(req, _spider)
+        mw.process_exception(req, TimeoutError(), _spider)
+
+    def test_transitions(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            clock = [time.monotonic()]
+            mw.strategy.timer = lambda: clock[0]
+            stats = mw.crawler.stats
+
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            mw.process_response(req, Response(req.url, request=req), _spider)
+            self._fail(mw)
+            self.assertIsNone(stats.get_value('proxy/circuit_breaker/open'))
+
+            # opened, waiting for the cooldown
+            self._fail(mw)
+            self.assertEqual(stats.get_value('proxy/circuit_breaker/open'), 1)
+            with self.assertRaises(ProxyThrottledException) as cm:
+                mw.strategy.retrieve_proxy('http', _spider)
+            self.assertEqual(cm.exception.delay, 10)
+
+            # half-opened for a trial, but it fails
+            clock[0] += 10
+            self._fail(mw)
+            self.assertEqual(
+                stats.get_value('proxy/circuit_breaker/half_open'), 1
+            )
+            self.assertEqual(stats.get_value('proxy/circuit_breaker/open'), 2)
+
+            # half-opened again, and closed by the trial
+            clock[0] += 10
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            self.assertRaises(
+                ProxyThrottledException,
+                mw.strategy.retrieve_proxy, 'http', _spider
+            )
+            mw.process_response(req, Response(req.url, request=req), _spider)
+            self.assertEqual(
+                stats.get_value('proxy/circuit_breaker/closed'), 1
+            )
+            self.assertEqual(
+                stats.get_value('proxy/circuit_breaker/open_count'), 0
+            )
+            self.assertEqual(
+                mw.strategy.retrieve_proxy('http', _spider)[1],
+                'https://proxy.for.http:3128'
+            )
+
+    def test_invalidate_proxy(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            mw.process_response(req, Response(req.url, request=req), _spider)
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            breaker = mw.strategy.breakers[
+                ('http', None, 'https://proxy.for.http:3128')
+            ]
+            self.assertEqual(list(breaker.outcomes), [False])
+            self.assertEqual(len(mw.strategy.pools['http']), 1)
+
+    def test_ban_per_domain(self):
+        settings = dict(self.settings, HTTPPROXY_BAN_PER_DOMAIN=True)
+        with _open_spider(_spider, Settings(settings)) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            # the only proxy is banned on the domain, not on the others
+            with self.assertRaises(ProxyThrottledException):
+                mw.strategy.retrieve_proxy('http', _spider, Request(req.url))
+            mw.strategy.retrieve_proxy(
+                'http', _spider, Request('http://f.com')
+            )
+
+    def test_quarantine(self):
+        settings = dict(self.settings, HTTPPROXY_QUARANTINE_ENABLED=True)
+        with self.assertRaises(ValueError):
+            with _open_spider(_spider, Settings(settings)):
+                pass
+
+    def test_trial_timeout(self):
+        settings = dict(
+            self.settings, HTTPPROXY_CIRCUIT_BREAKER_TRIAL_TIMEOUT=30
+        )
+        with _open_spider(_spider, Settings(settings)) as mw:
+            clock = [time.monotonic()]
+            mw.strategy.timer = lambda: clock[0]
+            stats = mw.crawler.stats
+
+            self._fail(mw)
+            self._fail(mw)
+            self.assertEqual(mw.strategy.open_count, 1)
+
+            # the trial is dropped without any outcome
+            clock[0] += 10
+            mw.process_request(Request('http://e.com'), _spider)
+            self.assertEqual(mw.strategy.half_open_count['http'], 1)
+            with self.assertRaises(ProxyThrottledException) as cm:
+                mw.strategy.retrieve_proxy('http', _spider)
+            self.assertEqual(cm.exception.delay, 1.0)
+
+            # opened again when the trial times out, and half-opened after the
+            # cooldown
+            clock[0] += 30
+            with self.assertRaises(ProxyThrottledException) as cm:
+                mw.strategy.retrieve_proxy('http', _spider)
+            self.assertEqual(cm.exception.delay, 10)
+            self.assertEqual(
+                stats.get_value('proxy/circuit_breaker/trial_timeout'), 1
+            )
+            self.assertEqual(mw.strategy.half_open_count['http'], 0)
+            self.assertEqual(mw.strategy.open_count, 1)
+
+            clock[0] += 10
+            self.assertEqual(
+                mw.strategy.retrieve_proxy('http', _spider)[1],
+                'https://proxy.for.http:3128'
+            )
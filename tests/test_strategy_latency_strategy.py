@@ -0,0 +1,57 @@
+from collections import Counter
+
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.internet.error import TimeoutError
+from twisted.trial.unittest import TestCase
+
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+
+
+class TestLatencyStrategy(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.latency_strategy.LatencyStrategy',
+        'HTTPPROXY_PROXIES': {
+            'http': [
+                'https://proxy.for.http.1:3128',
+                'https://proxy.for.http.2:3128',
+                'https://proxy.for.http.3:3128',
+            ]
+        },
+        'HTTPPROXY_LATENCY_CANDIDATES': 3,
+        'HTTPPROXY_LATENCY_EXPLORATION': 0,
+    }
+
+    latencies = {
+        'https://proxy.for.http.1:3128': 2.0,
+        'https://proxy.for.http.2:3128': 0.5,
+        'https://proxy.for.http.3:3128': 0.1,
+    }
+
+    def test_fastest_healthy_proxy(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            counter = Counter()
+            for _ in range(20):
+                req = Request('http://e.com')
+                mw.process_request(req, _spider)
+                proxy = req.meta['proxy']
+                counter[proxy] += 1
+
+                req.meta['download_latency'] = self.latencies[proxy]
+                if proxy == 'https://proxy.for.http.3:3128':
+                    mw.process_exception(req, TimeoutError(), _spider)
+                else:
+                    mw.process_response(
+                        req, Response(req.url, request=req), _spider
+                    )
+
+        # each proxy is tried once, then the fastest healthy one is preferred
+        self.assertEqual(counter['https://proxy.for.http.1:3128'], 1)
+        self.assertEqual(counter['https://proxy.for.http.3:3128'], 1)
+        self.assertEqual(counter['https://proxy.for.http.2:3128'], 18)
@@ -0,0 +1,98 @@
+from collections import Counter
+
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.internet.defer import Deferred
+from twisted.trial.unittest import TestCase
+
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+
+
+class TestLeastLoadedStrategy(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.least_loaded_strategy.LeastLoadedStrategy',
+        'HTTPPROXY_PROXIES': {
+            'http': [
+                'https://proxy.for.http.1:3128',
+                'https://proxy.for.http.2:3128',
+            ]
+        },
+        'HTTPPROXY_PROXIES_META': {
+            'https://proxy.for.http.1:3128': {'max_inflight': 1},
+            'https://proxy.for.http.2:3128': {'max_inflight': 3},
+        },
+    }
+
+    def _process_requests(self, mw, n):
+        requests = list(map(lambda x: Request('http://e.com'), range(n)))
+        for req in requests:
+            mw.process_request(req, _spider)
+        return requests
+
+    def test_least_loaded(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            requests = self._process_requests(mw, 4)
+            counter = Counter(map(lambda x: x.meta['proxy'], requests))
+            self.assertEqual(counter, {
+                'https://proxy.for.http.1:3128': 1,
+                'https://proxy.for.http.2:3128': 3,
+            })
+
+            # overcommitted
+            requests += self._process_requests(mw, 1)
+
+            for req in requests:
+                res = Response(req.url, request=req)
+                mw.process_response(req, res, _spider)
+                # released only once
+                mw.process_response(req, res, _spider)
+            self.assertFalse(mw.strategy.proxies_inflight)
+
+    def test_saturated_wait(self):
+        settings = dict(self.settings, HTTPPROXY_LEAST_LOADED_SATURATED='wait')
+        with _open_spider(_spider, Settings(settings)) as mw:
+            self._process_requests(mw, 4)
+
+            req = Request('http://e.com')
+            dfd = mw.process_request(req, _spider)
+            self.assertIsInstance(dfd, Deferred)
+            self.assertNotIn('proxy', req.meta)
+            dfd.cancel()
+            dfd.addErrback(lambda _: None)
+
+    def test_saturated_ignore(self):
+        settings = dict(self.settings, HTTPPROXY_LEAST_LOADED_SATURATED='ignore')
+        with _open_spider(_spider, Settings(settings)) as mw:
+            self._process_requests(mw, 4)
+
+            self.assertRaises(
+                IgnoreRequest, mw.process_request,
+                Request('http://e.com'), _spider
+            )
+
+    def test_ban_per_domain(self):
+        settings = dict(self.settings, HTTPPROXY_BAN_PER_DOMAIN=True)
+        with _open_spider(_spider, Settings(settings)) as mw:
+            req = Request('http://e.com')
+            mw.process_request(req, _spider)
+            proxy = req.meta['proxy']
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            # the banned proxy is the least loaded one, but it is passed over
+            requests = self._process_requests(mw, 2)
+            self.assertNotIn(proxy, map(lambda x: x.meta['proxy'], requests))
+            self.assertEqual(
+                mw.stats.get_value('proxy/ban/all_banned', spider=_spider),
+                None
+            )
+
+            req = Request('http://f.com')
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], proxy)
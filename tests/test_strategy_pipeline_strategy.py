@@ -0,0 +1,125 @@
+from scrapy.http import Request
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.internet.error import TimeoutError
+from twisted.trial.unittest import TestCase
+
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+_stages = 'scrapy_proxy_management.strategies.pipeline_strategy.{}'
+
+
+class TestPipelineStrategy(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.pipeline_strategy.PipelineStrategy',
+        'HTTPPROXY_PROXIES': {
+            'http': [
+                'https://proxy.de.0:3128',
+                'https://proxy.de.1:3128',
+                'https://proxy.fr.0:3128',
+            ]
+        },
+        'HTTPPROXY_PROXIES_META': {
+            'https://proxy.de.0:3128': {'country': 'de', 'weight': 1},
+            'https://proxy.de.1:3128': {'country': 'de', 'weight': 0},
+            'https://proxy.fr.0:3128': {'country': 'fr', 'weight': 1},
+        },
+        'HTTPPROXY_PIPELINE_FILTERS': [
+            _stages.format('TagFilter'), _stages.format('CooldownFilter')
+        ],
+        'HTTPPROXY_PIPELINE_SCORER': _stages.format('WeightScorer'),
+        'HTTPPROXY_PIPELINE_SELECTOR': _stages.format('max_selector'),
+    }
+
+    def test_pipeline(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            req = Request(
+                'http://www.example.de/', meta={'proxy_tags': {'country': 'de'}}
+            )
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], 'https://proxy.de.0:3128')
+            self.assertEqual(
+                mw.stats.get_value(
+                    'proxy/pipeline/TagFilter/rejected', spider=_spider
+                ), 1
+            )
+
+            # the cooled down proxy is rejected by the next filter
+            mw.process_exception(req, TimeoutError(), _spider)
+            req = Request(
+                'http://www.example.de/', meta={'proxy_tags': {'country': 'de'}}
+            )
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], 'https://proxy.de.1:3128')
+            self.assertEqual(
+                mw.stats.get_value(
+                    'proxy/pipeline/CooldownFilter/rejected', spider=_spider
+                ), 1
+            )
+
+    def test_unmatched(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            dfd = mw.process_request(Request(
+                'http://www.example.com/',
+                meta={'proxy_tags': {'country': 'us'}}
+            ), _spider)
+            self.assertIsNotNone(dfd)
+            dfd.cancel()
+            dfd.addErrback(lambda _: None)
+            self.assertEqual(
+                mw.stats.get_value('proxy/pipeline/unmatched', spider=_spider),
+                1
+            )
+
+    def test_full_scan(self):
+        with _open_spider(_spider, Settings({
+            **self.settings,
+            'HTTPPROXY_PROXIES': {'http': [
+                'https://proxy.de.{}:3128'.format(i) for i in range(100)
+            ] + ['https://proxy.fr.0:3128']},
+            'HTTPPROXY_PIPELINE_CANDIDATES': 1,
+        })) as mw:
+            clock = [0.0]
+            mw.strategy.timer = lambda: clock[0]
+
+            # the only proxy with the tag is found beyond the candidates
+            for i in range(3):
+                req = Request(
+                    'http://www.example.fr/',
+                    meta={'proxy_tags': {'country': 'fr'}}
+                )
+                dfd = mw.process_request(req, _spider)
+                if i != 1:
+                    self.assertEqual(
+                        req.meta['proxy'], 'https://proxy.fr.0:3128'
+                    )
+                    continue
+                # unmatched until the next scan, unless it is sampled
+                if dfd is not None:
+                    dfd.cancel()
+                    dfd.addErrback(lambda _: None)
+                clock[0] = 1.0
+            self.assertLessEqual(mw.stats.get_value(
+                'proxy/pipeline/full_scan', spider=_spider
+            ), 2)
+            # the rejections of the scans are not counted
+            self.assertLessEqual(mw.stats.get_value(
+                'proxy/pipeline/TagFilter/rejected', spider=_spider
+            ), 3)
+
+    def test_rate_limit(self):
+        with _open_spider(_spider, Settings({
+            **self.settings,
+            'HTTPPROXY_PIPELINE_FILTERS': [_stages.format('RateLimitFilter')],
+            'HTTPPROXY_PIPELINE_SCORER': None,
+            'HTTPPROXY_RATE_LIMIT_RATE': 0.1,
+        })) as mw:
+            proxies = set()
+            for i in range(3):
+                req = Request('http://www.example.com/')
+                mw.process_request(req, _spider)
+                proxies.add(req.meta['proxy'])
+            self.assertEqual(len(proxies), 3)
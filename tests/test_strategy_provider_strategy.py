@@ -0,0 +1,54 @@
+from collections import Counter
+
+from scrapy.http import Request
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.trial.unittest import TestCase
+
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+
+
+class TestProviderStrategy(TestCase):
+    proxies = [
+        *map(lambda x: 'https://proxy.big.{}:3128'.format(x), range(8)),
+        'https://proxy.small.0:3128',
+    ]
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.provider_strategy.ProviderStrategy',
+        'HTTPPROXY_PROXIES': {'http': proxies},
+        'HTTPPROXY_PROXIES_META': dict(map(
+            lambda x: (x, {'provider': x.split('.')[1]}), proxies
+        )),
+        'HTTPPROXY_PROVIDER_SHARES': {'big': 1, 'small': 3},
+    }
+
+    def test_shares(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            providers = Counter()
+            for i in range(40):
+                req = Request('http://www.example.com/')
+                mw.process_request(req, _spider)
+                providers[req.meta['proxy'].split('.')[1]] += 1
+
+            self.assertEqual(providers, {'big': 10, 'small': 30})
+            self.assertEqual(
+                mw.stats.get_value('proxy/provider/small', spider=_spider), 30
+            )
+
+    def test_invalidate_proxy(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            for i in range(4):
+                req = Request('http://www.example.com/')
+                mw.process_request(req, _spider)
+                if 'small' in req.meta['proxy']:
+                    mw.invalidate_proxy(request=req, spider=_spider)
+                    break
+
+            for i in range(10):
+                req = Request('http://www.example.com/')
+                mw.process_request(req, _spider)
+                self.assertIn('big', req.meta['proxy'])
@@ -0,0 +1,112 @@
+import time
+
+from scrapy.http import Request
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.exceptions import ProxyThrottledException
+from scrapy_proxy_management.utils import get_proxy_hash
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+
+
+class TestRateLimitStrategy(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.rate_limit_strategy.RateLimitStrategy',
+        'HTTPPROXY_PROXIES': {
+            'http': [
+                'https://proxy.for.http.1:3128',
+                'https://proxy.for.http.2:3128',
+            ]
+        },
+        'HTTPPROXY_PROXIES_META': {
+            'https://proxy.for.http.2:3128': {'rate': 2, 'burst': 2},
+        },
+    }
+
+    def _retrieve_proxy(self, mw, url='http://e.com'):
+        return mw.strategy.retrieve_proxy('http', _spider, Request(url))[1]
+
+    def test_rate_limit(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            clock = [time.monotonic()]
+            mw.strategy.timer = lambda: clock[0]
+
+            proxies = list(map(lambda x: self._retrieve_proxy(mw), range(3)))
+            self.assertEqual(proxies.count('https://proxy.for.http.1:3128'), 1)
+            self.assertEqual(proxies.count('https://proxy.for.http.2:3128'), 2)
+
+            with self.assertRaises(ProxyThrottledException) as cm:
+                self._retrieve_proxy(mw)
+            self.assertLess(abs(cm.exception.delay - 0.5), 1e-6)
+
+            clock[0] += 0.5
+            self.assertEqual(
+                self._retrieve_proxy(mw), 'https://proxy.for.http.2:3128'
+            )
+
+    def test_domain_rate_limit(self):
+        settings = dict(self.settings, HTTPPROXY_RATE_LIMIT_DOMAIN_RATE=0.1)
+        with _open_spider(_spider, Settings(settings)) as mw:
+            clock = [time.monotonic()]
+            mw.strategy.timer = lambda: clock[0]
+
+            self.assertEqual(
+                {self._retrieve_proxy(mw), self._retrieve_proxy(mw)},
+                {
+                    'https://proxy.for.http.1:3128',
+                    'https://proxy.for.http.2:3128',
+                }
+            )
+
+            # the proxy 2 is still ready, but not for the same domain
+            with self.assertRaises(ProxyThrottledException) as cm:
+                self._retrieve_proxy(mw)
+            self.assertLess(abs(cm.exception.delay - 10), 1e-6)
+
+            self.assertEqual(
+                self._retrieve_proxy(mw, 'http://f.com'),
+                'https://proxy.for.http.2:3128'
+            )
+
+    def test_excluded(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            clock = [time.monotonic()]
+            mw.strategy.timer = lambda: clock[0]
+
+            proxy_hash: int = get_proxy_hash(
+                ('http', None, 'https://proxy.for.http.2:3128')
+            )
+            req = Request(
+                'http://e.com', meta={'proxy_excluded': (proxy_hash,)}
+            )
+            self.assertEqual(
+                mw.strategy.retrieve_proxy('http', _spider, req)[1],
+                'https://proxy.for.http.1:3128'
+            )
+
+            # the tokens of the excluded proxy are not consumed
+            for i in range(2):
+                self.assertEqual(
+                    self._retrieve_proxy(mw), 'https://proxy.for.http.2:3128'
+                )
+
+    def test_no_limit(self):
+        settings = dict(self.settings, HTTPPROXY_PROXIES_META={
+            'https://proxy.for.http.1:3128': {'rate': 0},
+            'https://proxy.for.http.2:3128': {'rate': None},
+        })
+        with _open_spider(_spider, Settings(settings)) as mw:
+            clock = [time.monotonic()]
+            mw.strategy.timer = lambda: clock[0]
+
+            # a rate of 0 or None never throttles the proxies
+            for i in range(6):
+                self._retrieve_proxy(mw)
+            for bucket in mw.strategy.proxies_bucket.values():
+                self.assertIsNone(bucket.rate)
+                self.assertEqual(bucket.next_available(clock[0]), clock[0])
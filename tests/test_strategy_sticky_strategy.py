@@ -0,0 +1,76 @@
+from scrapy.http import Request
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.trial.unittest import TestCase
+
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+
+
+class TestStickyStrategy(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.sticky_strategy.StickyStrategy',
+        'HTTPPROXY_PROXIES': {
+            'http': list(map(
+                lambda x: 'https://proxy.for.http.{}:3128'.format(x), range(5)
+            ))
+        },
+    }
+
+    def test_sticky(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            proxies = set()
+            for i in range(10):
+                req = Request('http://www.example.com/{}'.format(i))
+                mw.process_request(req, _spider)
+                proxies.add(req.meta['proxy'])
+            self.assertEqual(len(proxies), 1)
+
+            # the session key in the meta is preferred to the hostname
+            proxies = set()
+            for i in range(10):
+                req = Request(
+                    'http://www.example.com/',
+                    meta={'proxy_session': 'user-{}'.format(i)}
+                )
+                mw.process_request(req, _spider)
+                proxies.add(req.meta['proxy'])
+            self.assertGreater(len(proxies), 1)
+
+    def test_invalidate_proxy(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            req = Request('http://www.example.com/')
+            mw.process_request(req, _spider)
+            proxy = req.meta['proxy']
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            req = Request('http://www.example.com/')
+            mw.process_request(req, _spider)
+            self.assertNotEqual(req.meta['proxy'], proxy)
+
+    def test_ban_per_domain(self):
+        settings = dict(self.settings, HTTPPROXY_BAN_PER_DOMAIN=True)
+        with _open_spider(_spider, Settings(settings)) as mw:
+            req = Request('http://www.example.com/')
+            mw.process_request(req, _spider)
+            proxy = req.meta['proxy']
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            # the session is moved to the next proxy on the ring, and stays
+            # there while its proxy is banned on the domain
+            proxies = set()
+            for i in range(5):
+                req = Request('http://www.example.com/{}'.format(i))
+                mw.process_request(req, _spider)
+                proxies.add(req.meta['proxy'])
+            self.assertEqual(len(proxies), 1)
+            self.assertNotIn(proxy, proxies)
+
+            req = Request('http://www.example.org/', meta={
+                'proxy_session': 'www.example.com'
+            })
+            mw.process_request(req, _spider)
+            self.assertEqual(req.meta['proxy'], proxy)
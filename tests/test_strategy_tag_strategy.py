@@ -0,0 +1,87 @@
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Request
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.trial.unittest import TestCase
+
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+
+
+class TestTagStrategy(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.tag_strategy.TagStrategy',
+        'HTTPPROXY_PROXIES': {
+            'http': [
+                'https://proxy.de.residential:3128',
+                'https://proxy.de.datacenter:3128',
+                'https://proxy.fr.residential:3128',
+            ]
+        },
+        'HTTPPROXY_PROXIES_META': {
+            'https://proxy.de.residential:3128': {
+                'country': 'de', 'type': 'residential'
+            },
+            'https://proxy.de.datacenter:3128': {
+                'country': 'de', 'type': 'datacenter'
+            },
+            'https://proxy.fr.residential:3128': {
+                'country': 'fr', 'type': 'residential'
+            },
+        },
+    }
+
+    def test_tags(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            proxies = set()
+            for i in range(50):
+                req = Request(
+                    'http://www.example.de/',
+                    meta={'proxy_tags': {'country': 'de'}}
+                )
+                mw.process_request(req, _spider)
+                proxies.add(req.meta['proxy'])
+            self.assertEqual(proxies, {
+                'https://proxy.de.residential:3128',
+                'https://proxy.de.datacenter:3128',
+            })
+
+            req = Request(
+                'http://www.example.de/checkout',
+                meta={'proxy_tags': {'country': 'de', 'type': 'residential'}}
+            )
+            mw.process_request(req, _spider)
+            self.assertEqual(
+                req.meta['proxy'], 'https://proxy.de.residential:3128'
+            )
+
+    def test_unmatched(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            req = Request(
+                'http://www.example.de/checkout',
+                meta={'proxy_tags': {'country': 'de', 'type': 'residential'}}
+            )
+            mw.process_request(req, _spider)
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            req = Request(
+                'http://www.example.de/checkout',
+                meta={'proxy_tags': {'country': 'de', 'type': 'residential'}}
+            )
+            self.assertRaises(IgnoreRequest, mw.process_request, req, _spider)
+            self.assertEqual(
+                mw.stats.get_value('proxy/tag/unmatched', spider=_spider), 1
+            )
+
+        with _open_spider(
+                _spider,
+                Settings({**self.settings, 'HTTPPROXY_TAG_UNMATCHED': 'any'})
+        ) as mw:
+            req = Request(
+                'http://www.example.com/', meta={'proxy_tags': {'country': 'us'}}
+            )
+            mw.process_request(req, _spider)
+            self.assertIn('proxy', req.meta)
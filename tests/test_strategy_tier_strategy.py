@@ -0,0 +1,72 @@
+from scrapy.http import Request
+from scrapy.http import Response
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils import recycle_request
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+
+
+class TestTierStrategy(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.tier_strategy.TierStrategy',
+        'HTTPPROXY_PROXIES': {
+            'http': [
+                'https://proxy.datacenter.0:3128',
+                'https://proxy.datacenter.1:3128',
+                'https://proxy.residential.0:3128',
+            ]
+        },
+        'HTTPPROXY_PROXIES_META': {
+            'https://proxy.residential.0:3128': {'type': 'residential'},
+        },
+    }
+
+    def test_escalate(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            req = Request('http://www.example.com/')
+            mw.process_request(req, _spider)
+            self.assertIn('datacenter', req.meta['proxy'])
+            mw.process_response(req, Response(req.url, body=b'abc'), _spider)
+
+            mw.invalidate_proxy(request=req, spider=_spider)
+            req = recycle_request(mw, req, _spider)
+            mw.process_request(req, _spider)
+            self.assertEqual(
+                req.meta['proxy'], 'https://proxy.residential.0:3128'
+            )
+
+            # the other requests stay on the cheapest tier
+            req = Request('http://www.example.com/')
+            mw.process_request(req, _spider)
+            self.assertIn('datacenter', req.meta['proxy'])
+
+            stats = mw.stats.get_stats(_spider)
+            self.assertEqual(stats['proxy/tier/datacenter/requests'], 2)
+            self.assertEqual(stats['proxy/tier/datacenter/blocked'], 1)
+            self.assertEqual(stats['proxy/tier/datacenter/bytes'], 3)
+            self.assertEqual(stats['proxy/tier/residential/requests'], 1)
+            self.assertEqual(stats['proxy/tier/escalated'], 1)
+
+    def test_domain_memory(self):
+        with _open_spider(_spider, Settings({
+            **self.settings, 'HTTPPROXY_TIER_DOMAIN_MEMORY': True
+        })) as mw:
+            req = Request('http://www.example.com/')
+            mw.process_request(req, _spider)
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            req = Request('http://www.example.com/')
+            mw.process_request(req, _spider)
+            self.assertEqual(
+                req.meta['proxy'], 'https://proxy.residential.0:3128'
+            )
+
+            req = Request('http://www.example.org/')
+            mw.process_request(req, _spider)
+            self.assertIn('datacenter', req.meta['proxy'])
@@ -0,0 +1,72 @@
+from scrapy.http import Request
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from twisted.internet.error import TimeoutError
+from twisted.trial.unittest import TestCase
+
+from tests.test_downloadermiddleware_httpproxy import _open_spider
+
+_spider = Spider('foo')
+
+
+class TestVectorStrategy(TestCase):
+    settings = {
+        'HTTPPROXY_ENABLED': True,
+        'HTTPPROXY_STORAGE': 'scrapy_proxy_management.storages.settings_storage.SettingsStorage',
+        'HTTPPROXY_STRATEGY': 'scrapy_proxy_management.strategies.vector_strategy.VectorStrategy',
+        'HTTPPROXY_PROXIES': {
+            'http': list(map(
+                lambda x: 'https://proxy.for.http.{}:3128'.format(x), range(3)
+            ))
+        },
+        'HTTPPROXY_VECTOR_COOLDOWN': 10,
+    }
+
+    def test_cooldown(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            clock = [0.0]
+            mw.strategy.timer = lambda: clock[0]
+
+            req = Request('http://www.example.com/')
+            mw.process_request(req, _spider)
+            proxy = req.meta['proxy']
+            mw.process_exception(req, TimeoutError(), _spider)
+
+            # skipped while it cools down, though it is sampled before
+            for i in range(20):
+                req = Request('http://www.example.com/')
+                mw.process_request(req, _spider)
+                self.assertNotEqual(req.meta['proxy'], proxy)
+
+            clock[0] = 10.0
+            proxies = set()
+            for i in range(50):
+                req = Request('http://www.example.com/')
+                mw.process_request(req, _spider)
+                proxies.add(req.meta['proxy'])
+            self.assertIn(proxy, proxies)
+
+    def test_invalidate_proxy(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            req = Request('http://www.example.com/')
+            mw.process_request(req, _spider)
+            proxy = req.meta['proxy']
+            mw.invalidate_proxy(request=req, spider=_spider)
+
+            for i in range(20):
+                req = Request('http://www.example.com/')
+                mw.process_request(req, _spider)
+                self.assertNotEqual(req.meta['proxy'], proxy)
+
+    def test_reload(self):
+        with _open_spider(_spider, Settings(self.settings)) as mw:
+            pool = mw.strategy.pools['http']
+            proxy = (None, 'https://proxy.for.http.0:3128')
+            pool.record(proxy, False)
+
+            # the pool is updated in place, keeping the health of the proxies
+            proxies = mw.storage.proxies['http']
+            mw.strategy.update_proxies({'http': proxies[:2]})
+            self.assertIs(mw.strategy.pools['http'], pool)
+            self.assertEqual(len(pool), 2)
+            self.assertLess(pool.success[pool.ids[proxy]], 1.0)
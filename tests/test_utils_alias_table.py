@@ -0,0 +1,30 @@
+from collections import Counter
+
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils.alias_table import AliasTable
+
+
+class TestAliasTable(TestCase):
+    def test_sample(self):
+        alias_table = AliasTable(['a', 'b', 'c'], [6, 3, 1])
+        counter = Counter(alias_table.sample() for _ in range(10000))
+
+        for item, probability in (('a', 0.6), ('b', 0.3), ('c', 0.1)):
+            self.assertLess(abs(counter[item] / 10000 - probability), 0.05)
+
+    def test_discard(self):
+        alias_table = AliasTable(['a', 'b', 'c'], [1, 1, 2])
+
+        alias_table.discard('a')
+        self.assertEqual(len(alias_table), 2)
+        self.assertNotIn('a', alias_table)
+        self.assertNotIn('a', {alias_table.sample() for _ in range(100)})
+
+        # rebuilt without the discarded items once they carry half the weight
+        alias_table.discard('b')
+        self.assertEqual(alias_table.items, ['c'])
+        self.assertEqual(alias_table.sample(), 'c')
+
+        alias_table.discard('c')
+        self.assertRaises(IndexError, alias_table.sample)
@@ -0,0 +1,61 @@
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils.ban_matrix import BanMatrix
+
+
+class TestBanMatrix(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.bans = BanMatrix(maxsize=2, ttl=10, timer=lambda: self.now)
+
+    def test_ban(self):
+        self.bans.ban('a.com', 0)
+        self.bans.ban('a.com', 70)
+
+        self.assertTrue(self.bans.is_banned('a.com', 0))
+        self.assertTrue(self.bans.is_banned('a.com', 70))
+        self.assertFalse(self.bans.is_banned('a.com', 1))
+        self.assertFalse(self.bans.is_banned('b.com', 0))
+        self.assertEqual(self.bans.count('a.com'), 2)
+        self.assertEqual(self.bans.count('b.com'), 0)
+
+    def test_ttl(self):
+        self.bans.ban('a.com', 0)
+        self.now = 5
+        self.bans.ban('a.com', 1)
+        self.assertEqual(self.bans.expire_in('a.com'), 5)
+
+        # each ban expires on its own
+        self.now = 10
+        self.assertFalse(self.bans.is_banned('a.com', 0))
+        self.assertTrue(self.bans.is_banned('a.com', 1))
+        self.assertEqual(self.bans.expire_in('a.com'), 5)
+
+        self.now = 15
+        self.assertFalse(self.bans.is_banned('a.com', 1))
+        self.assertNotIn('a.com', self.bans)
+        self.assertIsNone(self.bans.expire_in('a.com'))
+
+    def test_reban(self):
+        self.bans.ban('a.com', 0)
+        self.now = 5
+        self.bans.ban('a.com', 1)
+
+        # the ban is renewed, and moved after the other one
+        self.now = 8
+        self.bans.ban('a.com', 0)
+        self.assertEqual(self.bans.expire_in('a.com'), 7)
+
+        self.now = 15
+        self.assertTrue(self.bans.is_banned('a.com', 0))
+        self.assertFalse(self.bans.is_banned('a.com', 1))
+
+    def test_maxsize(self):
+        self.bans.ban('a.com', 0)
+        self.bans.ban('b.com', 0)
+        self.bans.ban('a.com', 1)
+        self.bans.ban('c.com', 0)
+
+        self.assertEqual(len(self.bans), 2)
+        self.assertNotIn('b.com', self.bans)
+        self.assertIn('a.com', self.bans)
@@ -0,0 +1,52 @@
+from collections import Counter
+from itertools import islice
+
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils.deficit_round_robin import DeficitRoundRobin
+
+
+class TestDeficitRoundRobin(TestCase):
+    def setUp(self):
+        self.drr = DeficitRoundRobin({'a': 2.5, 'b': 1})
+        for i in range(10):
+            self.drr.add('a{}'.format(i), 'a')
+        self.drr.add('b0', 'b')
+        self.drr.add('c0', 'c')
+
+    def test_shares(self):
+        counts = Counter(map(lambda x: x[0], islice(self.drr, 900)))
+        self.assertEqual(counts, {'a': 500, 'b': 200, 'c': 200})
+
+    def test_rotation_within_group(self):
+        items = list(filter(
+            lambda x: x.startswith('a'), islice(self.drr, 45)
+        ))
+        self.assertEqual(len(set(items)), 10)
+
+    def test_next_matching(self):
+        items = list(map(
+            lambda x: self.drr.next_matching(lambda y: y != 'a0'), range(45)
+        ))
+        self.assertNotIn('a0', items)
+        self.assertEqual(
+            Counter(map(lambda x: x[0], items)), {'a': 25, 'b': 10, 'c': 10}
+        )
+
+        # the groups without a matching item are passed over
+        self.assertEqual(self.drr.next_matching(lambda x: x == 'c0'), 'c0')
+        self.assertIsNone(self.drr.next_matching(lambda x: False))
+        self.assertEqual(len(set(islice(self.drr, 45))), 12)
+
+    def test_discard(self):
+        self.drr.discard('b0')
+        self.assertNotIn('b0', self.drr)
+        self.assertNotIn('b', self.drr.active)
+        counts = Counter(map(lambda x: x[0], islice(self.drr, 700)))
+        self.assertEqual(counts, {'a': 500, 'c': 200})
+
+        for i in range(10):
+            self.drr.discard('a{}'.format(i))
+        self.drr.discard('c0')
+        self.assertEqual(len(self.drr), 0)
+        self.assertRaises(StopIteration, next, self.drr)
@@ -0,0 +1,71 @@
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils.expiring_set import BloomFilter
+from scrapy_proxy_management.utils.expiring_set import ExpiringBloomFilter
+from scrapy_proxy_management.utils.expiring_set import ExpiringSet
+
+
+class _Timer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestExpiringSet(TestCase):
+    def test_maxsize(self):
+        expiring_set = ExpiringSet(maxsize=2)
+        for proxy in ('proxy1', 'proxy2', 'proxy3'):
+            expiring_set.add(('http', None, proxy))
+
+        self.assertEqual(len(expiring_set), 2)
+        self.assertNotIn(('http', None, 'proxy1'), expiring_set)
+        self.assertIn(('http', None, 'proxy3'), expiring_set)
+
+    def test_ttl(self):
+        timer = _Timer()
+        expiring_set = ExpiringSet(ttl=10, timer=timer)
+
+        expiring_set.add('proxy1')
+        expiring_set.add('proxy2', ttl=30)
+
+        timer.now = 20
+        self.assertNotIn('proxy1', expiring_set)
+        self.assertIn('proxy2', expiring_set)
+        self.assertEqual(list(expiring_set), ['proxy2'])
+
+        timer.now = 30
+        expiring_set.purge()
+        self.assertEqual(len(expiring_set), 0)
+
+
+class TestBloomFilter(TestCase):
+    def test_bloom_filter(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom_filter.add(('http', None, 'proxy{}'.format(i)))
+
+        for i in range(1000):
+            self.assertIn(('http', None, 'proxy{}'.format(i)), bloom_filter)
+
+        false_positives = sum(
+            ('https', None, 'proxy{}'.format(i)) in bloom_filter
+            for i in range(1000)
+        )
+        self.assertLess(false_positives, 50)
+
+    def test_expiring_bloom_filter(self):
+        timer = _Timer()
+        bloom_filter = ExpiringBloomFilter(
+            capacity=100, error_rate=0.01, ttl=10, timer=timer
+        )
+
+        bloom_filter.add('proxy1')
+        timer.now = 10
+        bloom_filter.add('proxy2')
+        self.assertIn('proxy1', bloom_filter)
+
+        timer.now = 20
+        self.assertNotIn('proxy1', bloom_filter)
+        self.assertIn('proxy2', bloom_filter)
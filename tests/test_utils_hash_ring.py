@@ -0,0 +1,53 @@
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils.hash_ring import HashRing
+
+
+class TestHashRing(TestCase):
+    keys = list(map(lambda x: 'www.{}.com'.format(x), range(1000)))
+
+    def test_get(self):
+        ring = HashRing(['a', 'b', 'c'])
+        assigned = dict(map(lambda x: (x, ring.get(x)), self.keys))
+
+        self.assertEqual(set(assigned.values()), {'a', 'b', 'c'})
+        self.assertEqual(
+            assigned, dict(map(lambda x: (x, ring.get(x)), self.keys))
+        )
+
+    def test_discard_moves_only_affected_keys(self):
+        ring = HashRing(['a', 'b', 'c'])
+        assigned = dict(map(lambda x: (x, ring.get(x)), self.keys))
+
+        ring.discard('b')
+        for key in self.keys:
+            if assigned[key] == 'b':
+                self.assertIn(ring.get(key), ('a', 'c'))
+            else:
+                self.assertEqual(ring.get(key), assigned[key])
+
+        # the item is restored to its own nodes
+        ring.add('b')
+        self.assertEqual(
+            assigned, dict(map(lambda x: (x, ring.get(x)), self.keys))
+        )
+
+    def test_walk(self):
+        ring = HashRing(['a', 'b', 'c'])
+        ring.discard('c')
+        for key in self.keys[:100]:
+            items = list(ring.walk(key))
+            self.assertEqual(items[0], ring.get(key))
+            self.assertEqual(sorted(items), ['a', 'b'])
+
+    def test_rebuild(self):
+        ring = HashRing(['a', 'b', 'c'])
+        ring.discard('a')
+        ring.discard('b')
+
+        self.assertFalse(ring.dead)
+        self.assertEqual(len(ring.nodes), ring.replicas)
+        self.assertEqual(ring.get('www.example.com'), 'c')
+
+        ring.discard('c')
+        self.assertRaises(IndexError, ring.get, 'www.example.com')
@@ -0,0 +1,58 @@
+import random
+
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils.indexed_heap import IndexedMinHeap
+
+
+class TestIndexedMinHeap(TestCase):
+    def test_peek(self):
+        heap = IndexedMinHeap([('a', 3), ('b', 1), ('c', 2)])
+        self.assertEqual(heap.peek(), (1, 'b'))
+
+        heap.update('b', 4)
+        self.assertEqual(heap.peek(), (2, 'c'))
+
+        heap.update('a', 0)
+        self.assertEqual(heap.peek(), (0, 'a'))
+        self.assertEqual(heap.priority('b'), 4)
+
+    def test_discard(self):
+        heap = IndexedMinHeap([('a', 3), ('b', 1), ('c', 2)])
+        heap.discard('b')
+        heap.discard('d')
+
+        self.assertEqual(len(heap), 2)
+        self.assertNotIn('b', heap)
+        self.assertEqual(heap.peek(), (2, 'c'))
+
+        heap.discard('c')
+        heap.discard('a')
+        self.assertRaises(IndexError, heap.peek)
+
+    def test_iter_sorted(self):
+        priorities = dict(map(lambda x: (x, random.random()), range(100)))
+        heap = IndexedMinHeap(priorities.items())
+
+        self.assertEqual(
+            list(map(lambda x: x[1], heap.iter_sorted())),
+            sorted(priorities, key=priorities.__getitem__)
+        )
+        self.assertEqual(list(IndexedMinHeap().iter_sorted()), [])
+
+    def test_random_operations(self):
+        priorities = dict(map(lambda x: (x, random.random()), range(100)))
+        heap = IndexedMinHeap(priorities.items())
+
+        for _ in range(500):
+            item = random.randrange(100)
+            if item in priorities and random.random() < 0.3:
+                heap.discard(item)
+                del priorities[item]
+            else:
+                priorities[item] = random.random()
+                heap.push(item, priorities[item])
+
+            if priorities:
+                self.assertEqual(heap.peek()[0], min(priorities.values()))
+        self.assertEqual(len(heap), len(priorities))
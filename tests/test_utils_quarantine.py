@@ -0,0 +1,60 @@
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils.quarantine import Quarantine
+
+
+class TestQuarantine(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.quarantine = Quarantine(
+            base_delay=10, factor=2, max_delay=30, strike_ttl=100,
+            timer=lambda: self.now
+        )
+
+    def test_backoff(self):
+        self.assertEqual(self.quarantine.add('a'), 10)
+        self.assertIn('a', self.quarantine)
+        self.assertEqual(self.quarantine.release(), [])
+
+        self.now = 10
+        self.assertEqual(self.quarantine.release(), ['a'])
+        self.assertNotIn('a', self.quarantine)
+
+        self.assertEqual(self.quarantine.add('a'), 20)
+        self.assertEqual(self.quarantine.add('a'), 30)
+
+        # the strikes are forgotten
+        self.now = 200
+        self.assertEqual(self.quarantine.add('a'), 10)
+
+    def test_prune(self):
+        self.quarantine.add('a')
+        self.now = 50
+        self.quarantine.add('b')
+        self.now = 90
+        self.quarantine.add('a')
+        self.assertEqual(list(self.quarantine.strikes), ['b', 'a'])
+
+        # the strikes of b are forgotten, not those of a
+        self.now = 160
+        self.quarantine.release()
+        self.assertEqual(list(self.quarantine.strikes), ['a'])
+
+        self.now = 200
+        self.quarantine.release()
+        self.assertEqual(self.quarantine.strikes, {})
+
+    def test_reschedule(self):
+        self.quarantine.add('a')
+        self.quarantine.add('b')
+        self.now = 5
+        self.quarantine.add('a')
+
+        self.now = 10
+        self.assertEqual(self.quarantine.release(), ['b'])
+        self.assertEqual(self.quarantine.next_release(), 25)
+
+        self.now = 25
+        self.assertEqual(self.quarantine.release(), ['a'])
+        self.assertIsNone(self.quarantine.next_release())
+        self.assertEqual(len(self.quarantine), 0)
@@ -0,0 +1,48 @@
+from itertools import islice
+
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils.rotation_ring import RotationRing
+
+
+class TestRotationRing(TestCase):
+    def test_rotation(self):
+        ring = RotationRing(['a', 'b', 'c'])
+        self.assertEqual(list(islice(ring, 7)), list('abcabca'))
+
+    def test_discard_and_add(self):
+        ring = RotationRing(['a', 'b', 'c'])
+        self.assertEqual(next(ring), 'a')
+
+        ring.discard('b')
+        self.assertEqual(len(ring), 2)
+        self.assertEqual(list(islice(ring, 4)), list('caca'))
+
+        # reinserted at the end of the current round
+        ring.add('b')
+        self.assertEqual(list(islice(ring, 6)), list('cabcab'))
+
+    def test_empty(self):
+        ring = RotationRing(['a'])
+        ring.discard('a')
+        self.assertRaises(StopIteration, next, ring)
+
+        ring.add('b')
+        self.assertEqual(list(islice(ring, 2)), list('bb'))
+        self.assertEqual(ring.free, [])
+
+    def test_next_matching(self):
+        ring = RotationRing(['a', 'b', 'c', 'd'])
+        self.assertEqual(next(ring), 'a')
+
+        # the skipped items keep their places at the cursor
+        self.assertEqual(ring.next_matching(lambda x: x == 'd'), 'd')
+        self.assertEqual(ring.next_matching(lambda x: x != 'd'), 'b')
+        self.assertIsNone(ring.next_matching(lambda x: False))
+        self.assertEqual(list(islice(ring, 8)), list('cadbcadb'))
+
+        ring.discard('a')
+        ring.discard('b')
+        ring.discard('c')
+        ring.discard('d')
+        self.assertRaises(StopIteration, ring.next_matching, bool)
@@ -0,0 +1,63 @@
+import random
+from collections import Counter
+
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils.tag_index import TagIndex
+
+
+class TestTagIndex(TestCase):
+    def setUp(self):
+        self.index = TagIndex(['country', 'type'])
+        self.index.add('a', {'country': 'de', 'type': 'residential'})
+        self.index.add('b', {'country': 'de', 'type': 'datacenter'})
+        self.index.add('c', {'country': 'fr', 'type': ['residential', 'mobile']})
+        self.index.add('d', {})
+
+    def test_match(self):
+        self.assertEqual(self.index.match(), 0b1111)
+        self.assertEqual(self.index.match({'country': 'de'}), 0b11)
+        self.assertEqual(
+            self.index.match({'country': 'de', 'type': 'residential'}), 0b1
+        )
+        self.assertEqual(self.index.match({'type': 'mobile'}), 0b100)
+        self.assertEqual(
+            self.index.match({'country': ['de', 'fr'], 'type': 'residential'}),
+            0b101
+        )
+        self.assertEqual(self.index.match({'country': 'us'}), 0)
+
+    def test_choice(self):
+        bits = self.index.match({'type': 'residential'})
+        self.assertEqual(
+            set(map(lambda x: self.index.choice(bits), range(100))),
+            {'a', 'c'}
+        )
+        self.assertRaises(IndexError, self.index.choice, 0)
+
+    def test_choice_uniform(self):
+        random.seed(0)
+        index = TagIndex()
+        for i in range(62):
+            index.add(i)
+
+        # a set bit after a long gap is not favored
+        bits = 1 | 1 << 60 | 1 << 61
+        for tries in (8, 0):
+            counts = Counter(map(
+                lambda x: index.choice(bits, tries=tries), range(3000)
+            ))
+            self.assertEqual(set(counts), {0, 60, 61})
+            self.assertTrue(all(map(
+                lambda x: 800 < x < 1200, counts.values()
+            )))
+
+    def test_discard(self):
+        self.index.discard('a')
+        self.assertNotIn('a', self.index)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.match({'country': 'de'}), 0b10)
+
+        # the item is added back with its own id and tags
+        self.index.add('a')
+        self.assertEqual(self.index.match({'country': 'de'}), 0b11)
@@ -0,0 +1,64 @@
+from twisted.trial.unittest import TestCase
+
+from scrapy_proxy_management.utils.vector_pool import VectorPool
+
+
+class TestVectorPool(TestCase):
+    def test_sample(self):
+        pool = VectorPool(['a', 'b', 'c'], alpha=1.0, capacity=2)
+        pool.record('a', True, 1.0)
+        pool.record('b', True, 4.0)
+        pool.record('c', False, 1.0)
+        pool.rescore(0)
+
+        samples = pool.sample(1000)
+        self.assertGreater(samples.count('a'), samples.count('b'))
+        self.assertLess(samples.count('c'), 5)
+
+    def test_discard_and_cooldown(self):
+        pool = VectorPool(['a', 'b', 'c'])
+        pool.discard('a')
+        pool.cooldown('b', 10)
+        pool.rescore(0)
+
+        self.assertEqual(len(pool), 2)
+        self.assertEqual(set(pool.sample(100)), {'c'})
+        self.assertFalse(pool.is_ready('b', 5))
+        self.assertTrue(pool.is_ready('b', 10))
+
+        pool.discard('c')
+        pool.rescore(0)
+        self.assertRaises(IndexError, pool.sample)
+        self.assertEqual(pool.next_ready(), 10)
+
+    def test_compact(self):
+        pool = VectorPool(['a', 'b', 'c', 'd'], alpha=1.0)
+        pool.record('d', True, 2.0)
+        pool.discard('a')
+        pool.discard('b')
+        pool.rescore(0)
+        self.assertEqual(len(pool.items), 4)
+
+        # compacted once the removed items outnumber the alive ones
+        pool.discard('c')
+        pool.rescore(0)
+        self.assertEqual(pool.items, ['d'])
+        self.assertEqual(pool.ids, {'d': 0})
+        self.assertEqual(pool.latency[0], 2.0)
+        self.assertEqual(pool.sample(10), ['d'] * 10)
+
+        pool.add('a')
+        pool.rescore(0)
+        self.assertEqual(pool.items, ['d', 'a'])
+        self.assertEqual(len(pool), 2)
+
+    def test_update(self):
+        pool = VectorPool(['a', 'b', 'c'], alpha=1.0)
+        pool.record('a', True, 2.0)
+        pool.update(['a', 'c', 'd'])
+
+        # the rows are kept, with the health of the items
+        self.assertEqual(pool.items, ['a', 'b', 'c', 'd'])
+        self.assertNotIn('b', pool)
+        self.assertEqual(len(pool), 3)
+        self.assertEqual(pool.latency[0], 2.0)